@@ -0,0 +1,32 @@
+"""
+Config gunicorn (otomatis kebaca kalau gunicorn dijalankan dari folder ini):
+
+    gunicorn hr.wsgi --workers 4
+
+Prometheus multiprocess: tiap worker nulis metric ke file mmap di
+PROMETHEUS_MULTIPROC_DIR, /metrics/ ngegabung semua worker (lihat
+hr_dump/views.py). Env-nya wajib ada sebelum prometheus_client di-import,
+makanya di-set di sini, bukan di settings.py.
+"""
+from pathlib import Path
+
+import os
+import shutil
+
+BASE_DIR = Path(__file__).resolve().parent
+
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", str(BASE_DIR / "spool" / "prometheus"))
+
+
+def on_starting(server):
+    # file metric dari run sebelumnya (pid lama) jangan ikut dijumlah
+    path = Path(os.environ["PROMETHEUS_MULTIPROC_DIR"])
+    shutil.rmtree(path, ignore_errors=True)
+    path.mkdir(parents=True, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    # live gauge worker ini dibuang, counter / histogram tetap dijumlah
+    multiprocess.mark_process_dead(worker.pid)
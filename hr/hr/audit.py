@@ -0,0 +1,271 @@
+"""
+Write-behind audit trail buat HRDump (DB alias hr_dump).
+
+- enqueue() cuma append satu baris JSON ke spool file lokal, tidak ada write
+  ke hr_dump di dalam request
+- Background worker (satu thread per proses, dibuat ulang habis fork) tiap
+  AUDIT_FLUSH_INTERVAL detik / tiap AUDIT_BATCH_SIZE record rotate spool jadi
+  segment `.ready`, lalu bulk_create ke hr_dump
+- Segment baru dihapus setelah bulk_create sukses. Kalau hr_dump down, segment
+  tetap di disk dan dicoba lagi di flush berikutnya
+- Segment yang ditolak DB (IntegrityError / DataError) di-bisect pakai
+  savepoint, cuma record yang ditolak yang dipindah ke `.dead`
+- Spool dari proses yang sudah mati (crash / restart worker) ikut di-replay
+- Nama file = hostname + pid. Spool aktif & segment yang lagi di-flush dipegang
+  flock selama dipakai, jadi "sudah mati" = flock-nya bisa diambil (jalan juga
+  antar container / cron yang share spool, beda dengan cek pid)
+- Claim segment pakai os.rename (atomic), jadi antar worker tidak dobel insert
+"""
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, transaction, IntegrityError, DataError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from pathlib import Path
+from itertools import count
+
+import os
+import json
+import fcntl
+import atexit
+import socket
+import logging
+import threading
+
+DUMP_DB = "hr_dump"
+
+logger = logging.getLogger(__name__)
+
+_state = {"pid": None, "owner": None, "file": None, "pending": 0, "worker": None}
+_seq = count()
+_lock = threading.Lock()        # spool file aktif
+_flush_lock = threading.Lock()  # satu flush per proses
+_wake = threading.Event()
+
+
+def get_spool_dir():
+    path = Path(getattr(settings, "AUDIT_SPOOL_DIR", Path(settings.BASE_DIR, "spool", "audit")))
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def lock_file(path, mode="r+b"):
+    """
+    Buka path + flock exclusive non-blocking. None kalau file sudah tidak ada
+    atau lock-nya lagi dipegang proses lain (yang berarti masih hidup).
+    """
+    try:
+        handle = open(path, mode)
+    except FileNotFoundError:
+        return None
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        # keduluan rename / unlink waktu nunggu open → inode beda
+        if os.fstat(handle.fileno()).st_ino != os.stat(path).st_ino:
+            raise FileNotFoundError(path)
+    except (BlockingIOError, FileNotFoundError):
+        handle.close()
+        return None
+    return handle
+
+
+def ensure_process():
+    """Reset state kalau PID berubah, file handle & thread tidak ikut ke child."""
+    pid = os.getpid()
+    if _state["pid"] != pid:
+        if _state["file"] is not None:
+            _state["file"].close()  # copy fd dari parent, lock-nya tetap punya parent
+        _state.update(pid=pid, owner=f"{socket.gethostname()}-{pid}", file=None, pending=0, worker=None)
+
+
+def open_spool(spool):
+    """Spool aktif, di-flock selama proses ini masih nulis ke situ."""
+    while True:
+        handle = open(spool, "a", encoding="utf-8")
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            if os.fstat(handle.fileno()).st_ino == os.stat(spool).st_ino:
+                return handle
+        except FileNotFoundError:
+            pass
+        handle.close()  # sisa proses lama (pid sama) keburu di-claim, buka file baru
+
+
+def enqueue(user_id, path, method, payload):
+    """Catat satu audit record ke spool, flush ke hr_dump belakangan."""
+    record = json.dumps({
+        "user_id": user_id,
+        "path": path,
+        "method": method,
+        "payload": payload,
+        "created_at": timezone.now().isoformat(),
+    }, cls=DjangoJSONEncoder)
+
+    with _lock:
+        ensure_process()
+        spool = get_spool_dir() / f"audit-{_state['owner']}.jsonl"
+        if _state["file"] is not None and _state["file"].name != str(spool):
+            # AUDIT_SPOOL_DIR berubah, spool lama ditutup jadi segment di dir lamanya
+            close_spool()
+        if _state["file"] is None:
+            _state["file"] = open_spool(spool)
+        _state["file"].write(record + "\n")
+        _state["file"].flush()
+        if getattr(settings, "AUDIT_FSYNC", False):
+            os.fsync(_state["file"].fileno())
+        _state["pending"] += 1
+        pending = _state["pending"]
+
+    if getattr(settings, "AUDIT_WORKER", True):
+        start_worker()
+        if pending >= getattr(settings, "AUDIT_BATCH_SIZE", 500):
+            _wake.set()
+
+
+def close_spool():
+    handle = _state["file"]
+    if handle is None:
+        return
+    _state.update(file=None, pending=0)
+    spool = Path(handle.name)
+    try:
+        # rename selagi lock masih dipegang, baru close
+        spool.rename(spool.with_name(f"audit-{_state['owner']}-{next(_seq)}.ready"))
+    except FileNotFoundError:
+        logger.warning("Audit spool %s disappeared before flush", spool)
+    finally:
+        handle.close()
+
+
+def rotate():
+    """Tutup spool aktif → segment `.ready` yang siap di-flush."""
+    with _lock:
+        ensure_process()
+        close_spool()
+
+
+def claim_segments(spool_dir):
+    """
+    Ambil alih semua segment yang boleh di-flush proses ini: `.ready`, plus
+    `.jsonl` / `.claim` yang flock-nya bebas (writer / flusher-nya sudah mati).
+    Return [(path, handle)], handle (pemegang lock) ditutup setelah selesai.
+    """
+    claimed = []
+    for segment in sorted(spool_dir.glob("audit-*")):
+        if segment.suffix not in (".ready", ".jsonl", ".claim"):
+            continue
+        handle = lock_file(segment)
+        if handle is None:
+            continue  # masih dipakai, atau keduluan worker lain
+        target = segment.with_name(f"audit-{_state['owner']}-{next(_seq)}.claim")
+        try:
+            segment.rename(target)
+        except FileNotFoundError:
+            handle.close()
+            continue
+        claimed.append((target, handle))
+    return claimed
+
+
+def load_segment(segment):
+    """[(baris json, HRDump)], baris aslinya disimpan buat `.dead`."""
+    from hr_dump.models import HRDump
+
+    rows = []
+    with open(segment, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # baris terakhir kepotong waktu crash
+            record["created_at"] = parse_datetime(record["created_at"])
+            rows.append((line, HRDump(**record)))
+    return rows
+
+
+def insert_rows(rows):
+    """
+    bulk_create dalam savepoint. Ditolak DB → bisect, return baris yang
+    ditolak (record lain tetap masuk).
+    """
+    from hr_dump.models import HRDump
+
+    try:
+        with transaction.atomic(using=DUMP_DB):
+            HRDump.objects.using(DUMP_DB).bulk_create(
+                [obj for _, obj in rows], batch_size=getattr(settings, "AUDIT_BATCH_SIZE", 500)
+            )
+        return []
+    except (IntegrityError, DataError):
+        if len(rows) == 1:
+            return [rows[0][0]]
+        middle = len(rows) // 2
+        return insert_rows(rows[:middle]) + insert_rows(rows[middle:])
+
+
+def flush():
+    """Rotate spool aktif lalu bulk_create semua segment ke hr_dump. Return jumlah row."""
+    with _flush_lock:
+        rotate()
+        segments = claim_segments(get_spool_dir())
+        written = 0
+        try:
+            for i, (segment, _) in enumerate(segments):
+                rows = load_segment(segment)
+                try:
+                    # transaction luar: kalau hr_dump down di tengah bisect, tidak ada yang ke-commit
+                    with transaction.atomic(using=DUMP_DB):
+                        rejected = insert_rows(rows)
+                except Exception:
+                    # hr_dump lagi down: balikin jadi .ready, dicoba lagi nanti
+                    logger.exception("Audit flush failed, keeping %d segment(s)", len(segments) - i)
+                    for pending, _ in segments[i:]:
+                        pending.rename(pending.with_suffix(".ready"))
+                    break
+                if rejected:
+                    # record-nya yang rusak, jangan sampai nahan record / segment lain
+                    dead = segment.with_suffix(".dead")
+                    with open(dead, "w", encoding="utf-8") as f:
+                        f.writelines(rejected)
+                    logger.error("%d audit record(s) rejected by hr_dump, moved to %s", len(rejected), dead.name)
+                segment.unlink()
+                written += len(rows) - len(rejected)
+        finally:
+            for _, handle in segments:
+                handle.close()
+        return written
+
+
+def run_worker():
+    interval = getattr(settings, "AUDIT_FLUSH_INTERVAL", 2)
+    while True:
+        _wake.wait(interval)
+        _wake.clear()
+        try:
+            flush()
+        except Exception:
+            logger.exception("Audit worker error")
+        finally:
+            connections[DUMP_DB].close_if_unusable_or_obsolete()
+
+
+def start_worker():
+    if _state["worker"] is not None:
+        return
+    with _lock:
+        ensure_process()
+        if _state["worker"] is None:
+            worker = threading.Thread(target=run_worker, name="audit-writer", daemon=True)
+            worker.start()
+            _state["worker"] = worker
+
+
+@atexit.register
+def flush_on_exit():
+    # best effort, yang gagal tetap aman di spool
+    if _state["worker"] is not None:
+        try:
+            flush()
+        except Exception:
+            logger.exception("Audit flush on exit failed")
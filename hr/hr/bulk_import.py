@@ -0,0 +1,591 @@
+"""
+Bulk import engine buat BaseViewSet.insert_bulk.
+
+- Validasi per kolom (vectorized pandas), bukan per row lewat serializer
+- FK / M2M boleh pakai code: `branch_code`, `company_code` (M2M dipisah koma),
+  atau id: `branch` / `branch_id`, `company` (dipisah koma).
+  Satu query per tabel buat resolve semuanya
+- `parent_code` boleh nunjuk row lain di file yang sama
+- Tulis pakai bulk_create per chunk, termasuk row through table M2M
+- created_by / updated_by diisi dari user yang upload
+- Semua atau tidak sama sekali: ada error → tidak ada yang ditulis,
+  kecuali lewat run_chunked (iter_upload): per chunk, chunk yang error di-skip
+- upsert_keys (mode=upsert): row yang sudah ada di-diff per chunk, cuma yang
+  berubah yang di-bulk_update, sisanya di-skip
+"""
+from django.conf import settings
+from django.db import connections, models, router, transaction
+from django.utils import timezone
+
+import numpy as np
+import pandas as pd
+
+AUDIT_FIELDS = {"created_by", "updated_by", "deleted_by", "created_at", "updated_at", "deleted_at"}
+CHUNK_SIZE = 1000
+MAX_ERRORS = 100
+BOOL_VALUES = {"1": True, "true": True, "yes": True, "y": True, "0": False, "false": False, "no": False, "n": False}
+
+
+class BulkImportError(Exception):
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__(f"{len(errors)} invalid value(s)")
+
+
+def normalize(df):
+    df.columns = [str(c).strip() for c in df.columns]
+    df = df.apply(lambda col: col.str.strip())
+    return df.replace("", np.nan)
+
+
+def read_upload(file_obj):
+    """csv / xlsx → DataFrame string semua (code '001' tidak jadi 1), cell kosong = NaN."""
+    if file_obj.name.endswith(".csv"):
+        df = pd.read_csv(file_obj, dtype=str)
+    else:
+        df = pd.read_excel(file_obj, dtype=str)
+    return normalize(df)
+
+
+def xlsx_cell(value):
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))  # code / nik numerik jangan jadi '1.0'
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return str(value)
+
+
+def iter_upload(file_obj, chunk_size=CHUNK_SIZE):
+    """
+    Sama dengan read_upload tapi per chunk row, memory tidak ikut besar file.
+    Index tiap chunk = nomor row absolut, jadi nomor row di error tetap benar.
+    """
+    if file_obj.name.endswith(".csv"):
+        for df in pd.read_csv(file_obj, dtype=str, chunksize=chunk_size):
+            yield normalize(df)
+        return
+
+    from openpyxl import load_workbook  # sama dengan engine pd.read_excel
+
+    workbook = load_workbook(file_obj, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        offset, buffer = 0, []
+        for row in rows:
+            buffer.append([xlsx_cell(value) for value in row])
+            if len(buffer) == chunk_size:
+                yield normalize(pd.DataFrame(buffer, columns=header, index=range(offset, offset + len(buffer)), dtype=object))
+                offset, buffer = offset + len(buffer), []
+        if buffer:
+            yield normalize(pd.DataFrame(buffer, columns=header, index=range(offset, offset + len(buffer)), dtype=object))
+    finally:
+        workbook.close()
+
+
+def run_chunked(model, chunks, max_errors=MAX_ERRORS, progress=None, **kwargs):
+    """
+    Validasi + tulis per chunk (transaksi sendiri-sendiri). Chunk yang error di-skip,
+    chunk lain tetap masuk. Return (report, changes buat audit).
+    progress(report, changes chunk ini) dipanggil tiap chunk selesai, changes-nya
+    tidak ikut dikumpulkan (import job, file bisa besar sekali).
+    """
+    report = {"inserted": 0, "updated": 0, "unchanged": 0, "failed_rows": 0, "chunks": []}
+    changes = []
+    for df in chunks:
+        first, last = int(df.index[0]) + 2, int(df.index[-1]) + 2
+        importer = BulkImporter(model, **kwargs)
+        try:
+            result = importer.run(df)
+        except BulkImportError as e:
+            report["failed_rows"] += len(df)
+            report["chunks"].append({"rows": [first, last], "status": "failed", "errors": e.errors[:max_errors]})
+            if progress:
+                progress(report, [])
+            continue
+
+        for key in ("inserted", "updated", "unchanged"):
+            report[key] += result[key]
+        report["chunks"].append({"rows": [first, last], "status": "ok", **result})
+        if progress:
+            progress(report, importer.changes)
+        else:
+            changes.extend(importer.changes)
+    return report, changes
+
+
+def split_list(raw):
+    """'A, B' → ['A', 'B'] per row, dalam bentuk exploded Series (index = row)."""
+    items = raw.dropna().str.split(",").explode().str.strip()
+    return items[items != ""]
+
+
+class BulkImporter:
+    def __init__(self, model, user_id=None, using=None, chunk_size=CHUNK_SIZE, upsert_keys=None):
+        self.model = model
+        self.user_id = user_id
+        self.using = using or router.db_for_write(model)
+        self.chunk_size = chunk_size
+        # upsert: row yang cocok (by key, urut prioritas) di-update, sisanya insert
+        self.upsert_keys = tuple(upsert_keys or ())
+        # MySQL: bulk_create tidak balikin id, row baru diambil lagi lewat kolom unique
+        self.returns_pks = connections[self.using].features.can_return_rows_from_bulk_insert
+        self.refetch_key = None
+        self.matched = None
+        self.existing = {}
+        self.errors = []
+        self.changes = []  # (method, payload) buat audit, cuma di mode upsert
+        self.m2m_touched = set()
+        self.inserted = self.updated = self.unchanged = 0
+
+    # ------------------------------------------------------------------
+    # errors
+    # ------------------------------------------------------------------
+    def add_error(self, mask, column, message, raw=None):
+        for index in mask[mask].index:
+            value = None if raw is None else raw.get(index)
+            self.errors.append({
+                "row": int(index) + 2,  # header = baris 1 di Excel
+                "column": column,
+                "value": None if pd.isna(value) else value,
+                "error": message,
+            })
+
+    # ------------------------------------------------------------------
+    # columns
+    # ------------------------------------------------------------------
+    def import_fields(self):
+        for field in self.model._meta.concrete_fields:
+            if field.primary_key or field.name in AUDIT_FIELDS or isinstance(field, models.FileField):
+                continue
+            yield field
+
+    def is_required(self, field):
+        return not field.null and not field.blank and not field.has_default()
+
+    def convert(self, field, raw):
+        """Series string → Series value python sesuai tipe field + mask yang invalid."""
+        present = raw.notna()
+
+        if isinstance(field, models.BooleanField):
+            values = raw.str.lower().map(BOOL_VALUES)
+            bad = present & values.isna()
+        elif isinstance(field, (models.IntegerField, models.AutoField)):
+            values = pd.to_numeric(raw, errors="coerce")
+            bad = present & (values.isna() | (values % 1 != 0))
+            values = values.astype("Int64", errors="ignore")
+        elif isinstance(field, (models.DecimalField, models.FloatField)):
+            values = pd.to_numeric(raw, errors="coerce")
+            bad = present & values.isna()
+        elif isinstance(field, models.DateTimeField):
+            values = pd.to_datetime(raw, errors="coerce", format="mixed")
+            bad = present & values.isna()
+            if settings.USE_TZ and values.dt.tz is None:
+                values = values.dt.tz_localize(timezone.get_current_timezone(), ambiguous="NaT", nonexistent="NaT")
+        elif isinstance(field, models.DateField):
+            parsed = pd.to_datetime(raw, errors="coerce", format="mixed")
+            bad = present & parsed.isna()
+            values = parsed.dt.date
+        elif isinstance(field, models.TimeField):
+            parsed = pd.to_datetime(raw, errors="coerce", format="mixed")
+            bad = present & parsed.isna()
+            values = parsed.dt.time
+        else:
+            values = raw
+            bad = pd.Series(False, index=raw.index)
+            if field.max_length:
+                too_long = present & (raw.str.len() > field.max_length)
+                self.add_error(too_long, field.name, f"Ensure this field has no more than {field.max_length} characters.", raw)
+
+        self.add_error(bad, field.name, "Invalid value.", raw)
+
+        if field.choices:
+            valid = {key for key, _ in field.flatchoices}
+            invalid_choice = present & ~bad & ~values.isin(valid)
+            self.add_error(invalid_choice, field.name, "Not a valid choice.", raw)
+
+        return values.astype(object).where(present & ~bad, None)
+
+    def check_unique(self, field, values):
+        present = values.notna()
+        duplicated = present & values.duplicated(keep=False)
+        self.add_error(duplicated, field.name, "Duplicate value in file.", values)
+
+        # _base_manager: row soft delete juga kena unique constraint
+        existing = dict(
+            self.model._base_manager.using(self.using)
+            .filter(**{f"{field.attname}__in": values[present].unique().tolist()})
+            .values_list(field.attname, "pk")
+        )
+        if existing:
+            owner = values.map(existing)
+            taken = present & owner.notna()
+            if self.matched is not None:
+                # upsert: boleh kalau value itu punya row yang lagi di-update sendiri
+                taken &= owner != self.matched
+            self.add_error(taken, field.name, "Already exists.", values)
+
+    def resolve(self, related, raw, by_code):
+        """Satu query per tabel: code / id → pk, hasilnya Series pk (NaN kalau tidak ketemu)."""
+        if by_code:
+            keys = raw
+            lookup = "code"
+        else:
+            keys = pd.to_numeric(raw, errors="coerce")
+            keys = keys.where(keys % 1 == 0)
+            lookup = "pk"
+
+        wanted = keys.dropna().unique().tolist()
+        found = dict(
+            related._default_manager.using(self.using)
+            .filter(**{f"{lookup}__in": wanted}).values_list(lookup, "pk")
+        )
+        return keys.map(found)
+
+    def convert_fk(self, field, df, own_codes):
+        for column, by_code in ((f"{field.name}_code", True), (f"{field.name}_id", False), (field.name, False)):
+            if column in df:
+                break
+        else:
+            if self.is_required(field):
+                self.errors.append({"row": None, "column": field.name, "value": None, "error": "Missing column."})
+            return None, None
+
+        raw = df[column]
+        related = field.related_model
+        ids = self.resolve(related, raw, by_code)
+        missing = raw.notna() & ids.isna()
+
+        deferred = None
+        if by_code and related is self.model and own_codes:
+            # parent di file yang sama, di-set setelah semua row ke-insert
+            in_file = missing & raw.isin(own_codes)
+            if in_file.any():
+                deferred = raw.where(in_file, None)
+                missing = missing & ~in_file
+
+        self.add_error(missing, column, f"{related.__name__} not found.", raw)
+        if self.is_required(field):
+            self.add_error(raw.isna(), column, "This field is required.")
+        return ids.astype(object).where(ids.notna(), None), deferred
+
+    def convert_m2m(self, field, df):
+        for column, by_code in ((f"{field.name}_code", True), (field.name, False)):
+            if column in df:
+                break
+        else:
+            if not field.blank:
+                self.errors.append({"row": None, "column": field.name, "value": None, "error": "Missing column."})
+            return None
+
+        raw = df[column]
+        items = split_list(raw)
+        ids = self.resolve(field.related_model, items, by_code)
+
+        unknown = pd.Series(False, index=df.index)
+        unknown[items[ids.isna()].index.unique()] = True
+        self.add_error(unknown, column, f"{field.related_model.__name__} not found.", raw)
+        if not field.blank:
+            self.add_error(raw.isna(), column, "This field is required.")
+
+        grouped = ids.dropna().astype(int).groupby(level=0).agg(list)
+        return pd.Series([grouped.get(i, []) for i in df.index], index=df.index, dtype=object)
+
+    # ------------------------------------------------------------------
+    # upsert
+    # ------------------------------------------------------------------
+    def match(self, df, columns):
+        """
+        Cocokkan row file ke row DB lewat upsert_keys, satu query per chunk.
+        Hasil: self.matched (index → pk / None) & self.existing (pk → value lama).
+        """
+        keys = [key for key in self.upsert_keys if key in columns]
+        if not keys:
+            self.errors.append({"row": None, "column": self.upsert_keys[0], "value": None, "error": "Missing column."})
+            return
+
+        self.matched = pd.Series([None] * len(df), index=df.index, dtype=object)
+        owners = {}
+        for start in range(0, len(df), self.chunk_size):
+            index = df.index[start:start + self.chunk_size]
+            query = models.Q()
+            for key in keys:
+                wanted = columns[key][index].dropna().unique().tolist()
+                if wanted:
+                    query |= models.Q(**{f"{key}__in": wanted})
+            if not query:
+                continue
+
+            lookup = {key: {} for key in keys}
+            for row in self.model._base_manager.using(self.using).filter(query).values("pk", *columns, *self.soft_delete_fields):
+                self.existing[row["pk"]] = row
+                for key in keys:
+                    lookup[key].setdefault(row[key], set()).add(row["pk"])
+
+            for i in index:
+                hits = set()
+                for key in keys:
+                    value = columns[key][i]
+                    if value is not None:
+                        hits |= lookup[key].get(value, set())
+                if len(hits) > 1:
+                    self.errors.append({"row": int(i) + 2, "column": ",".join(keys), "value": None,
+                                        "error": "Matches more than one existing row."})
+                elif hits:
+                    pk = hits.pop()
+                    if pk in owners:
+                        self.errors.append({"row": int(i) + 2, "column": ",".join(keys), "value": None,
+                                            "error": f"Matches the same row as row {owners[pk] + 2}."})
+                    owners[pk] = int(i)
+                    self.matched[i] = pk
+
+    def diff(self, pk, row, m2m_row, m2m_old):
+        """Field yang berubah dibanding value lama, {} kalau sama persis."""
+        old = self.existing[pk]
+        changed = {}
+        for name, value in row.items():
+            field = self.model._meta.get_field(name)
+            if field.to_python(value) != old[name]:
+                changed[name] = (old[name], value)
+        for field, related in m2m_row.items():
+            before = m2m_old[field].get(pk, set())
+            if set(related) != before:
+                changed[field.name] = (sorted(before), sorted(set(related)))
+        if old.get("deleted_at") is not None:
+            # cocok ke row yang sudah soft delete: di-restore, walau value lain sama
+            for name in self.soft_delete_fields:
+                changed[name] = (old[name], None)
+        return changed
+
+    @property
+    def soft_delete_fields(self):
+        names = [field.attname for field in self.model._meta.concrete_fields]
+        return [name for name in ("deleted_at", "deleted_by") if name in names]
+
+    @property
+    def writer(self):
+        """Manager buat bulk_update, termasuk row yang sudah soft delete (biar bisa di-restore)."""
+        manager = getattr(self.model, "all_objects", self.model._default_manager)
+        return manager.db_manager(self.using)
+
+    # ------------------------------------------------------------------
+    # run
+    # ------------------------------------------------------------------
+    def validate(self, df):
+        columns, m2m, deferred = {}, {}, {}
+        own_codes = set(df["code"].dropna()) if "code" in df else None
+        unique = []
+
+        for field in self.import_fields():
+            if isinstance(field, models.ForeignKey):
+                values, deferred_codes = self.convert_fk(field, df, own_codes)
+                if values is not None:
+                    columns[field.attname] = values
+                if deferred_codes is not None:
+                    deferred[field.attname] = deferred_codes
+                continue
+
+            if field.name not in df:
+                if self.is_required(field):
+                    self.errors.append({"row": None, "column": field.name, "value": None, "error": "Missing column."})
+                continue
+
+            values = self.convert(field, df[field.name])
+            if self.is_required(field):
+                self.add_error(df[field.name].isna(), field.name, "This field is required.")
+            if field.unique:
+                unique.append(field)
+            if not field.null and field.blank and isinstance(field, (models.CharField, models.TextField)):
+                values = values.where(values.notna(), "")
+            columns[field.attname] = values
+
+        for field in self.model._meta.many_to_many:
+            values = self.convert_m2m(field, df)
+            if values is not None:
+                m2m[field] = values
+
+        if self.upsert_keys:
+            self.match(df, columns)
+        for field in unique:
+            self.check_unique(field, columns[field.attname])
+        if not self.returns_pks:
+            self.check_refetch_key(unique, columns)
+
+        return columns, m2m, deferred
+
+    def check_refetch_key(self, unique, columns):
+        """Row baru wajib punya value di salah satu kolom unique (code, nik, ...) buat ambil id-nya lagi."""
+        if not unique:
+            self.errors.append({"row": None, "column": None, "value": None,
+                                "error": "Import needs a unique column (e.g. code) on this database."})
+            return
+        self.refetch_key = unique[0].attname
+        missing = columns[self.refetch_key].isna()
+        if self.matched is not None:
+            missing &= self.matched.isna()
+        self.add_error(missing, unique[0].name, "This field is required (used to identify new rows).")
+
+    def run(self, df):
+        if not df.index.is_unique:
+            df = df.reset_index(drop=True)
+        columns, m2m, deferred = self.validate(df)
+        if self.errors:
+            raise BulkImportError(self.errors)
+
+        names = list(columns)
+        rows = list(zip(*(columns[name].tolist() for name in names))) if names else [()] * len(df)
+
+        with transaction.atomic(using=self.using):
+            pks = []
+            for start in range(0, len(rows), self.chunk_size):
+                pks.extend(self.write_chunk(df, names, rows, start, m2m))
+            if deferred:
+                self.write_deferred(df, pks, deferred)
+
+        return {"inserted": self.inserted, "updated": self.updated, "unchanged": self.unchanged}
+
+    def write_chunk(self, df, names, rows, start, m2m):
+        chunk = rows[start:start + self.chunk_size]
+        index = df.index[start:start + len(chunk)]
+        matched = self.matched[index].tolist() if self.matched is not None else [None] * len(chunk)
+        pks = list(matched)
+
+        new = [pos for pos, pk in enumerate(matched) if pk is None]
+        if new:
+            inserted = self.insert_rows(names, [chunk[pos] for pos in new], index[new], m2m)
+            for pos, pk in zip(new, inserted):
+                pks[pos] = pk
+
+        old = [pos for pos, pk in enumerate(matched) if pk is not None]
+        if old:
+            self.update_rows(names, [chunk[pos] for pos in old], index[old], [matched[pos] for pos in old], m2m)
+        return pks
+
+    def insert_rows(self, names, chunk, index, m2m):
+        objs = [
+            self.model(**dict(zip(names, values)), created_by=self.user_id, updated_by=self.user_id)
+            for values in chunk
+        ]
+        self.model._default_manager.db_manager(self.using).bulk_create(objs)
+
+        pks = [obj.pk for obj in objs]
+        if None in pks:
+            # MySQL tidak balikin id dari bulk_create, ambil lagi lewat kolom unique (check_refetch_key)
+            keys = [getattr(obj, self.refetch_key) for obj in objs]
+            by_key = dict(
+                self.model._base_manager.using(self.using)
+                .filter(**{f"{self.refetch_key}__in": keys}).values_list(self.refetch_key, "pk")
+            )
+            pks = [by_key[key] for key in keys]
+
+        for field, values in m2m.items():
+            self.add_through(field, zip(pks, values[index].tolist()))
+
+        self.inserted += len(objs)
+        if self.upsert_keys:
+            for pk, values in zip(pks, chunk):
+                self.changes.append(("POST", {"id": pk, **dict(zip(names, values))}))
+        return pks
+
+    def update_rows(self, names, chunk, index, pks, m2m):
+        # relasi M2M lama: satu query per field per chunk
+        m2m_old = {}
+        for field in m2m:
+            through = field.remote_field.through
+            source = f"{field.m2m_field_name()}_id"
+            target = f"{field.m2m_reverse_field_name()}_id"
+            current = {}
+            for pk, related_id in through.objects.using(self.using).filter(**{f"{source}__in": pks}).values_list(source, target):
+                current.setdefault(pk, set()).add(related_id)
+            m2m_old[field] = current
+
+        objs, fields, now = [], set(), timezone.now()
+        for pk, values, i in zip(pks, chunk, index):
+            row = dict(zip(names, values))
+            m2m_row = {field: values_[i] for field, values_ in m2m.items()}
+            changed = self.diff(pk, row, m2m_row, m2m_old)
+            if not changed:
+                self.unchanged += 1
+                continue
+
+            for field, related in m2m_row.items():
+                if field.name in changed:
+                    self.set_through(field, pk, related, m2m_old[field].get(pk, set()))
+            restored = "deleted_at" in changed
+            column_changes = [name for name in changed if name in row]
+            if restored:
+                row.update(dict.fromkeys(self.soft_delete_fields))
+                column_changes += self.soft_delete_fields
+            if column_changes:
+                objs.append(self.model(pk=pk, **row, updated_by=self.user_id, updated_at=now))
+                fields.update(column_changes)
+
+            self.updated += 1
+            self.changes.append(("RESTORE" if restored else "PATCH", {
+                "id": pk,
+                "before": {name: before for name, (before, _) in changed.items()},
+                "after": {name: after for name, (_, after) in changed.items()},
+            }))
+
+        if objs:
+            # cuma kolom yang beneran berubah (gabungan satu chunk) yang di-SET
+            self.writer.bulk_update(
+                objs, sorted(fields | {"updated_by", "updated_at"}), batch_size=self.chunk_size
+            )
+
+    def touch_m2m(self, field):
+        """
+        Write langsung ke through table tidak kirim m2m_changed, generation kedua
+        sisi (count cache, response cache) di-bump manual, sekali per field.
+        """
+        if field in self.m2m_touched:
+            return
+        self.m2m_touched.add(field)
+        from .config import bump_generation  # config import modul ini
+
+        bump_generation(self.model, using=self.using)
+        bump_generation(field.related_model, using=self.using)
+
+    def add_through(self, field, pairs):
+        through = field.remote_field.through
+        source = f"{field.m2m_field_name()}_id"
+        target = f"{field.m2m_reverse_field_name()}_id"
+        objs = [
+            through(**{source: pk, target: related_id})
+            for pk, related in pairs
+            for related_id in dict.fromkeys(related)
+        ]
+        if objs:
+            through.objects.using(self.using).bulk_create(objs, batch_size=self.chunk_size)
+            self.touch_m2m(field)
+
+    def set_through(self, field, pk, related, before):
+        through = field.remote_field.through
+        source = f"{field.m2m_field_name()}_id"
+        target = f"{field.m2m_reverse_field_name()}_id"
+        removed = before - set(related)
+        if removed:
+            through.objects.using(self.using).filter(**{source: pk, f"{target}__in": removed}).delete()
+            self.touch_m2m(field)
+        self.add_through(field, [(pk, [r for r in related if r not in before])])
+
+    def write_deferred(self, df, pks, deferred):
+        by_code = dict(zip(df["code"].tolist(), pks))
+        objs = []
+        for pk, index in zip(pks, df.index):
+            obj = self.model(pk=pk)
+            changed = False
+            for attname, codes in deferred.items():
+                code = codes[index]
+                if code is not None and not pd.isna(code):
+                    setattr(obj, attname, by_code[code])
+                    changed = True
+            if changed:
+                objs.append(obj)
+        self.writer.bulk_update(
+            objs, list(deferred), batch_size=self.chunk_size
+        )
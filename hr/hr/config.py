@@ -109,7 +109,7 @@ Once thy hand commits, thy soul belongs here.
 ──────────────────────────────────────────────────────────────────────────────
 """
 
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import PageNumberPagination, CursorPagination
 from rest_framework.views import exception_handler
 from rest_framework.response import Response
 from rest_framework.decorators import action
@@ -119,9 +119,16 @@ from rest_framework.filters import SearchFilter
 from hr_dump.models import *
 
 from django.utils import timezone
-from django.db import models
+from django.db import models, connections, transaction
 from django.db.models import Q
+from django.db.models.signals import m2m_changed
+from django.dispatch import receiver
+from django.core.exceptions import FieldDoesNotExist, EmptyResultSet
 from django.core.cache import cache
+from django.urls import reverse
+from django.http import HttpResponse, HttpResponseNotModified, StreamingHttpResponse, FileResponse
+from django.utils.http import quote_etag, parse_etags
+from django.core.paginator import Paginator as DjangoPaginator, Page, EmptyPage, PageNotAnInteger
 
 from django_filters.rest_framework import FilterSet, DjangoFilterBackend
 
@@ -137,27 +144,250 @@ from drf_spectacular.types import OpenApiTypes
 
 from .thread_locals import get_current_user_id
 from .local_settings import AUTH_SERVICE
+from . import http_client
+from . import audit
+from . import import_jobs
+from .export import (
+    select_columns, export_queryset, stream_rows, iter_csv, iter_ndjson, write_xlsx,
+    FILE_TYPES as EXPORT_FILE_TYPES,
+)
+from .bulk_import import (
+    BulkImporter, BulkImportError, read_upload, iter_upload, run_chunked,
+    MAX_ERRORS as BULK_MAX_ERRORS, CHUNK_SIZE as BULK_CHUNK_SIZE,
+)
 
 import django_filters
 import pandas as pd
+import hashlib
 import math
 import requests
+import threading
+
+from functools import cached_property, partial
+from time import time, monotonic, sleep
 
 from drf_spectacular.utils import extend_schema, OpenApiParameter
+from prometheus_client import Counter
 
 dump_data = 'hr_dump'
 model_dump = HRDump
 
+USER_CACHE_TIMEOUT = 60
+USER_NOT_FOUND = "__not_found__"  # penanda negative cache user:{id}
+USER_MAX_PAGES = 10  # batas follow `next` kalau Auth tetap paginate
+USER_CACHE_LOOKUP = Counter('user_cache_lookup', 'Lookup user:{id} cache', ['result'])
+
+COUNT_CACHE_TIMEOUT = 30
+COUNT_MODES = ("exact", "estimate", "none")
+
+RESPONSE_CACHE_TIMEOUT = 300
+RESPONSE_CACHE_LOOKUP = Counter('response_cache_lookup', 'Lookup resp:* cache (BaseViewSet.response_cache)', ['result'])
+
+EXTERNAL_STALE_TIMEOUT = 86400  # data lama masih boleh dipakai segini lama setelah soft expiry
+EXTERNAL_LOCK_TIMEOUT = 30      # satu refresher per key, sekaligus jeda retry kalau upstream down
+EXTERNAL_LOCK_WAIT = 5          # cache kosong: tunggu refresher lain maksimal segini
+EXTERNAL_REFRESH_FAILED = "failed"
+EXTERNAL_CACHE_LOOKUP = Counter('external_cache_lookup', 'Lookup fetch_external_data cache', ['service', 'result'])
+
+def get_generation(model):
+    """Generation data per model, naik tiap ada write (lihat bump_generation)."""
+    return cache.get(f"gen:{model._meta.label_lower}", 0)
+
+def bump_generation(model, using=None):
+    """
+    Invalidate semua cache turunan data model ini (count, dll) dengan
+    naikin generation-nya. Jalan setelah commit biar reader tidak
+    nge-cache data lama di generation baru.
+    """
+    key = f"gen:{model._meta.label_lower}"
+
+    def bump():
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, timeout=None)
+
+    transaction.on_commit(bump, using=using)
+
+def get_generations(models_):
+    """Generation beberapa model sekaligus (satu round trip cache)."""
+    keys = [f"gen:{model._meta.label_lower}" for model in models_]
+    found = cache.get_many(keys)
+    return [found.get(key, 0) for key in keys]
+
+def serializer_models(serializer, found=None):
+    """Model serializer + semua nested ModelSerializer-nya."""
+    found = set() if found is None else found
+    found.add(serializer.Meta.model)
+    for field in serializer.fields.values():
+        child = field.child if isinstance(field, serializers.ListSerializer) else field
+        if isinstance(child, serializers.ModelSerializer) and child.Meta.model not in found:
+            serializer_models(child, found)
+    return found
+
+def cached_count(queryset):
+    """
+    COUNT(*) di-cache per (model, filter) selama COUNT_CACHE_TIMEOUT.
+    Key-nya SQL count yang sudah dinormalisasi (tanpa ordering / select /
+    only), jadi filter yang sama dari query param manapun dapat key yang sama.
+    """
+    try:
+        sql, params = queryset.order_by().values("pk").query.sql_with_params()
+    except EmptyResultSet:
+        return 0
+
+    digest = hashlib.md5(f"{queryset.db}:{sql}:{params!r}".encode()).hexdigest()
+    key = f"count:{queryset.model._meta.label_lower}:{get_generation(queryset.model)}:{digest}"
+
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, timeout=COUNT_CACHE_TIMEOUT)
+    return count
+
+def estimate_count(queryset):
+    """
+    Estimasi jumlah row dari statistik tabel MySQL (information_schema),
+    cuma buat list yang tidak difilter. None kalau tidak bisa diestimasi.
+    """
+    model = queryset.model
+    connection = connections[queryset.db]
+    if connection.vendor != "mysql" or queryset.query.where != model.objects.all().query.where:
+        return None
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT TABLE_ROWS FROM information_schema.TABLES "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+            [model._meta.db_table],
+        )
+        row = cursor.fetchone()
+    return int(row[0]) if row and row[0] is not None else None
+
+class CountPage(Page):
+    def has_next(self):
+        if self.paginator.count is None:
+            return self.has_more
+        return super().has_next()
+
+class CountPaginator(DjangoPaginator):
+    """
+    Paginator Django dengan count yang bisa dipilih (?count=):
+    - exact: COUNT(*) di-cache (cached_count)
+    - estimate: statistik tabel MySQL buat list tanpa filter, selain itu exact
+    - none: tidak count sama sekali, has_next dari ambil page_size + 1 row
+    """
+    def __init__(self, object_list, per_page, count_mode="exact", **kwargs):
+        self.count_mode = count_mode
+        self.known_pages = 1
+        super().__init__(object_list, per_page, **kwargs)
+
+    @cached_property
+    def count(self):
+        if self.count_mode == "none":
+            return None
+        if self.count_mode == "estimate":
+            estimate = estimate_count(self.object_list)
+            if estimate is not None:
+                return estimate
+        return cached_count(self.object_list)
+
+    @property
+    def num_pages(self):
+        if self.count is None:
+            return self.known_pages
+        return super().num_pages
+
+    def validate_number(self, number):
+        if self.count is not None:
+            return super().validate_number(number)
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger("That page number is not an integer")
+        if number < 1:
+            raise EmptyPage("That page number is less than 1")
+        return number
+
+    def page(self, number):
+        if self.count is not None:
+            return super().page(number)
+
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            raise EmptyPage("That page contains no results")
+
+        page = self._get_page(rows[:self.per_page], number, self)
+        page.has_more = len(rows) > self.per_page
+        self.known_pages = number + 1 if page.has_more else number
+        return page
+
+    def _get_page(self, *args, **kwargs):
+        return CountPage(*args, **kwargs)
+
+def keyset_fields(model):
+    """Field yang aman buat keyset ordering: pk / unique / ter-index dan NOT NULL."""
+    indexed = {index.fields[0].lstrip('-') for index in model._meta.indexes}
+    return {
+        f.attname for f in model._meta.concrete_fields
+        if not f.null and (f.primary_key or f.unique or f.db_index or f.name in indexed)
+    }
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor (keyset) pagination: WHERE id < <posisi> ORDER BY -id LIMIT n,
+    tanpa OFFSET dan tanpa COUNT(*), jadi page ke-1000 sama cepatnya dengan page 1.
+    ?ordering= boleh pakai field ter-index lain (lihat keyset_fields).
+    """
+    page_size = 10
+    page_size_query_param = 'page_size'
+    ordering = '-id'
+
+    def get_ordering(self, request, queryset, view):
+        ordering = request.query_params.get('ordering')
+        if ordering and ordering.lstrip('-') in keyset_fields(queryset.model):
+            return (ordering,)
+        return (self.ordering,)
+
 class CustomPagination(PageNumberPagination) :
     page_size = 10
     page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        # opt-in keyset mode: ?cursor= (kosong buat page pertama)
+        self.keyset = None
+        if self.cursor_query_param in request.query_params:
+            self.keyset = KeysetPagination()
+            return self.keyset.paginate_queryset(queryset, request, view)
+
+        # ?count=exact|estimate|none
+        count_mode = request.query_params.get(self.count_query_param, "exact")
+        if count_mode not in COUNT_MODES:
+            count_mode = "exact"
+        self.django_paginator_class = partial(CountPaginator, count_mode=count_mode)
+        return super().paginate_queryset(queryset, request, view)
 
     def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return Response({
+                'count': None,
+                'total_pages': None,
+                'current_page': None,
+                'next': self.keyset.get_next_link(),
+                'previous': self.keyset.get_previous_link(),
+                'results': data,
+            })
+
         page_size = self.get_page_size(self.request) or 2
-        total_pages = math.ceil(self.page.paginator.count / page_size)
+        count = self.page.paginator.count
+        total_pages = math.ceil(count / page_size) if count is not None else None
 
         return Response({
-            'count': self.page.paginator.count,
+            'count': count,
             'total_pages': total_pages,
             'current_page': self.page.number,
             'next': self.get_next_link(),
@@ -168,14 +398,31 @@ class CustomPagination(PageNumberPagination) :
 class SoftDeleteQuerySet(models.QuerySet):
     def delete(self, user_id=None):
         """Soft delete semua record dalam queryset"""
-        return super().update(
+        return self.update(
             deleted_at=timezone.now(),
             deleted_by=user_id or get_current_user_id()
         )
 
     def hard_delete(self):
         """Hard delete langsung dari DB"""
-        return super().delete()
+        result = super().delete()
+        bump_generation(self.model, using=self.db)
+        return result
+
+    def update(self, **kwargs):
+        result = super().update(**kwargs)
+        bump_generation(self.model, using=self.db)
+        return result
+
+    def bulk_create(self, objs, *args, **kwargs):
+        result = super().bulk_create(objs, *args, **kwargs)
+        bump_generation(self.model, using=self.db)
+        return result
+
+    def bulk_update(self, objs, *args, **kwargs):
+        result = super().bulk_update(objs, *args, **kwargs)
+        bump_generation(self.model, using=self.db)
+        return result
 
     def alive(self):
         return self.filter(deleted_at__isnull=True)
@@ -231,6 +478,7 @@ class BaseModel(models.Model):
             self.updated_by = user_id
 
         super().save(*args, **kwargs)
+        bump_generation(type(self), using=self._state.db)
 
     def delete(self, hard=False, user_id=None):
         """
@@ -239,7 +487,10 @@ class BaseModel(models.Model):
         """
         user_id = user_id or get_current_user_id()
         if hard:
-            return super().delete()
+            using = self._state.db
+            result = super().delete()
+            bump_generation(type(self), using=using)
+            return result
         else:
             self.deleted_by = user_id
             self.deleted_at = timezone.now()
@@ -255,6 +506,13 @@ class BaseModel(models.Model):
         self.updated_by = user_id
         self.save()
 
+@receiver(m2m_changed)
+def bump_generation_on_m2m(sender, instance, action, model, using, **kwargs):
+    # filter M2M (company_id__in, dll) ikut berubah kalau relasinya berubah
+    if action in ("post_add", "post_remove", "post_clear") and isinstance(instance, BaseModel):
+        bump_generation(type(instance), using=using)
+        bump_generation(model, using=using)
+
 class CharInFilter(django_filters.BaseInFilter, django_filters.CharFilter):
     pass
 
@@ -401,6 +659,120 @@ class NameCodeSearchFilter(SearchFilter):
 
         return queryset.filter(q)
 
+def plan_related(serializer, prefix="", nested=False, include_tree=True):
+    """
+    Susun (select_related, prefetch_related) dari nested ModelSerializer yang
+    masih aktif, jadi field yang di-drop ?fields / ?exclude tidak ikut di-join.
+    - FK / OneToOne → select_related (kalau belum di bawah prefetch)
+    - M2M / reverse FK → prefetch_related
+    - Serializer pohon (punya tree_lookups) → children / parent chain per level,
+      plus relasi nested tiap node yang di-render penuh
+    """
+    select, prefetch = [], []
+    model = serializer.Meta.model
+
+    for field in serializer.fields.values():
+        child = field.child if isinstance(field, serializers.ListSerializer) else field
+        if field.write_only or not isinstance(child, serializers.ModelSerializer):
+            continue
+        try:
+            model_field = model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            continue
+        if not model_field.is_relation:
+            continue
+
+        path = prefix + field.source
+        if nested or model_field.many_to_many or model_field.one_to_many:
+            prefetch.append(path)
+            sub_select, sub_prefetch = plan_related(child, f"{path}__", nested=True)
+        else:
+            select.append(path)
+            sub_select, sub_prefetch = plan_related(child, f"{path}__", nested=nested)
+        select += sub_select
+        prefetch += sub_prefetch
+
+    tree_lookups = getattr(serializer, "tree_lookups", None)
+    if include_tree and tree_lookups:
+        _, node_paths = plan_related(serializer, nested=True, include_tree=False)
+        for lookup in tree_lookups():
+            prefetch.append(prefix + lookup)
+            segments = lookup.split("__")
+            # level terakhir cuma stub {id, name}, relasinya tidak di-render
+            for level in range(1, len(segments)):
+                level_prefix = prefix + "__".join(segments[:level]) + "__"
+                prefetch += [level_prefix + path for path in node_paths]
+
+    return select, prefetch
+
+def plan_only(serializer, prefix=""):
+    """
+    Kolom yang beneran dipakai serializer, buat .only() → ?fields / ?exclude
+    jadi column pruning di SQL, bukan cuma di-drop setelah row full ke-fetch.
+    - Field biasa / FK → kolomnya sendiri (FK perlu buat select_related / prefetch)
+    - Nested FK (select_related) → kolom tabel join-nya juga di-prune
+    - M2M / reverse FK → tidak butuh kolom (prefetch pakai pk)
+    Return None kalau ada field yang tidak bisa dipetakan ke kolom
+    (method field, source '*', property, dll) → jangan di-prune.
+    """
+    model = serializer.Meta.model
+    columns = [prefix + model._meta.pk.name]
+
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+        try:
+            model_field = model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            return None
+
+        if model_field.many_to_many or model_field.one_to_many:
+            continue
+        if not model_field.concrete:
+            return None
+
+        path = prefix + field.source
+        columns.append(path)
+        if model_field.is_relation and isinstance(field, serializers.ModelSerializer):
+            nested = plan_only(field, f"{path}__")
+            if nested is None:
+                return None
+            columns += nested
+
+    return columns
+
+class LazyUsersMap(dict):
+    """
+    users_map buat UserField yang di-resolve belakangan.
+    - get(uid) balikin placeholder {"id": uid} dan dicatat
+    - resolve() ambil semua user yang dicatat sekaligus (cache → Auth Service),
+      lalu placeholder di-update in place
+    Jadi user yang diambil cuma dari object yang beneran di-serialize
+    (termasuk nested serializer), bukan dari seluruh queryset.
+    """
+    def __init__(self, request=None):
+        super().__init__()
+        self.request = request
+        self._pending = {}
+
+    def get(self, uid, default=None):
+        if uid in self:
+            return self[uid]
+        return self._pending.setdefault(uid, {"id": uid})
+
+    def resolve(self):
+        if not self._pending:
+            return self
+
+        pending, self._pending = self._pending, {}
+        users_map = get_users(pending, token=getattr(self.request, 'internal_token', ''))
+
+        for uid, placeholder in pending.items():
+            placeholder.update(users_map.get(uid, {}))
+            self[uid] = placeholder
+
+        return self
+
 # ==============================
 # BASE VIEWSET
 # ==============================
@@ -411,104 +783,142 @@ class BaseViewSet(viewsets.ModelViewSet):
     - Filter backend (DjangoFilterBackend, SearchFilter)
     - Search: `name` (icontains), `code` (iexact)
     - Softdelete support (include_deleted, only_deleted, restore)
-    - Audit trail (model_dump)
+    - Audit trail (model_dump, write-behind lewat hr/audit.py)
+    - response_cache = True: list / retrieve di-cache + ETag (lihat cached_response)
     """
     pagination_class = CustomPagination
     filter_backends = [DjangoFilterBackend, NameCodeSearchFilter]
+    upsert_keys = ("code",)  # insert-bulk?mode=upsert, urut prioritas
+    response_cache = False  # list / retrieve di-cache, buat master data yang jarang berubah
+    _response_cache_models = {}
     
     def get_serializer_context(self):
         context = super().get_serializer_context()
-        request = self.request
-
-        # Ambil queryset ringan hanya field *_by
-        queryset = self.filter_queryset(self.get_queryset())
-        model = queryset.model
-
-        # cari field *_by yg ada di model
-        by_fields = [
-            f for f in ["created_by", "updated_by", "deleted_by"]
-            if f in [x.name for x in model._meta.fields]
-        ]
-
-        user_ids = set()
-        if by_fields:
-            values = queryset.values_list(*by_fields, flat=False)
-            for row in values:
-                for val in row:
-                    if val:
-                        user_ids.add(val)
-
-        users_map = {}
-        if user_ids:
-            missing_ids = []
-            for uid in user_ids:
-                cached = cache.get(f"user:{uid}")
-                if cached:
-                    users_map[uid] = cached
-                else:
-                    missing_ids.append(uid)
-
-            if missing_ids:
-                try:
-                    resp = requests.get(
-                        f"{AUTH_SERVICE}/api/users/",
-                        params={
-                            "id__in": ",".join(map(str, missing_ids)),
-                            "exclude": "groups,user_permissions,last_login,date_joined"
-                        },
-                        headers={"Authorization": f"Bearer {getattr(request, 'internal_token', '')}"},
-                        timeout=5
-                    )
-                    resp.raise_for_status()
-                    data = resp.json()
-
-                    # kalau hasilnya array langsung
-                    if isinstance(data, list):
-                        data_list = data
-                    else:
-                        data_list = data.get("results", [])
-
-                    for u in data_list:
-                        users_map[u["id"]] = u
-                        cache.set(f"user:{u['id']}", u, 60)  # cache dict lengkap
-
-                except Exception as e:
-                    # fallback jangan cache minimal
-                    for uid in missing_ids:
-                        users_map[uid] = {"id": uid}
-
-        context["users_map"] = users_map
+
+        # users_map di-resolve belakangan (lihat finalize_response), jadi
+        # cuma user dari object yang beneran di-serialize yang diambil.
+        if getattr(self, "_users_map", None) is None:
+            self._users_map = LazyUsersMap(self.request)
+        context["users_map"] = self._users_map
         return context
 
+    def resolve_users(self):
+        """Isi semua placeholder user yang sudah dipakai serializer."""
+        users_map = getattr(self, "_users_map", None)
+        if users_map is not None:
+            users_map.resolve()
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        # response.data masih pegang dict placeholder yang sama,
+        # jadi cukup di-update in place sebelum di-render
+        self.resolve_users()
+        response = super().finalize_response(request, response, *args, **kwargs)
+
+        key = getattr(self, "_response_cache_key", None)
+        if key and isinstance(response, Response) and response.status_code == 200:
+            self._response_cache_key = None
+            response.render()
+            etag = quote_etag(hashlib.md5(response.content).hexdigest())
+            cache.set(key, {
+                "body": response.content.decode(),
+                "etag": etag,
+                "content_type": response["Content-Type"],
+            }, timeout=RESPONSE_CACHE_TIMEOUT)
+            response["ETag"] = etag
+            if etag in parse_etags(request.headers.get("If-None-Match", "")):
+                return HttpResponseNotModified(headers={"ETag": etag})
+        return response
+
+    def response_cache_key(self, request):
+        """
+        resp:<model>:<generation semua model di serializer>:<md5 path + query>.
+        Write ke model mana pun (save, bulk_create / bulk_update, M2M) naikin
+        generation-nya, jadi key lama otomatis tidak kepakai lagi.
+        """
+        models_ = self._response_cache_models.get(type(self))
+        if models_ is None:
+            models_ = sorted(serializer_models(self.get_serializer_class()()), key=lambda m: m._meta.label_lower)
+            self._response_cache_models[type(self)] = models_
+
+        generation = ".".join(str(gen) for gen in get_generations(models_))
+        params = sorted((name, sorted(values)) for name, values in request.query_params.lists())
+        digest = hashlib.md5(f"{request.path}?{params!r}".encode()).hexdigest()
+        return f"resp:{self.queryset.model._meta.label_lower}:{generation}:{digest}"
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        """
+        Response JSON yang sudah di-render diambil dari cache (tanpa query DB,
+        tanpa Auth Service), plus ETag / If-None-Match → 304.
+        """
+        if not self.response_cache or request.accepted_renderer.format != "json":
+            return handler(request, *args, **kwargs)
+
+        key = self.response_cache_key(request)
+        cached = cache.get(key)
+        if cached is None:
+            RESPONSE_CACHE_LOOKUP.labels(result="miss").inc()
+            self._response_cache_key = key  # disimpan di finalize_response setelah render
+            return handler(request, *args, **kwargs)
+
+        RESPONSE_CACHE_LOOKUP.labels(result="hit").inc()
+        if cached["etag"] in parse_etags(request.headers.get("If-None-Match", "")):
+            return HttpResponseNotModified(headers={"ETag": cached["etag"]})
+        return HttpResponse(cached["body"], content_type=cached["content_type"], headers={"ETag": cached["etag"]})
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
+
     def get_queryset(self):
         qs = self.queryset
         include_deleted = self.request.query_params.get("include_deleted")
         only_deleted = self.request.query_params.get("only_deleted")
 
         if include_deleted in ["1", "true", "True"]:
-            return self.queryset.model.all_objects.all()
+            qs = self.queryset.model.all_objects.all()
         elif only_deleted in ["1", "true", "True"]:
-            return self.queryset.model.objects.dead()
-        return qs
+            qs = self.queryset.model.objects.dead()
+        return self.plan_queryset(qs)
+
+    def plan_queryset(self, queryset):
+        """
+        select_related / prefetch_related otomatis dari nested serializer,
+        biar render satu page tidak jadi N+1. Buat GET, kolom juga di-prune
+        sesuai field yang aktif (.only()).
+        """
+        serializer = self.get_serializer()
+        select, prefetch = plan_related(serializer)
+        if select:
+            queryset = queryset.select_related(*select)
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+
+        # column pruning cuma buat read, instance deferred jangan sampai di-save
+        if self.request.method in ("GET", "HEAD"):
+            columns = plan_only(serializer)
+            if columns is not None:
+                queryset = queryset.only(*columns)
+        return queryset
 
     def perform_create(self, serializer):
         user_id = get_current_user_id()
-        dump_obj = None
         instance = None
 
         try:
             # simpan ke main DB dulu
             instance = serializer.save()
             full_payload = self.get_serializer(instance).data
+            self.resolve_users()
 
-            # baru simpan dump pake full data
-            dump_obj = model_dump.objects.using(dump_data).create(
+            # baru simpan dump pake full data (write-behind, lihat hr/audit.py)
+            audit.enqueue(
                 user_id=user_id,
                 path=self.request.path,
                 method=self.request.method,
                 payload=full_payload,
             )
-            dump_obj.save()
 
             return Response({
                 'detail': 'Successfully created data.',
@@ -518,8 +928,6 @@ class BaseViewSet(viewsets.ModelViewSet):
         except Exception as e:
             if instance:  # rollback main jika gagal dump
                 instance.delete()
-            if dump_obj:
-                dump_obj.delete()
             return Response(
                 {"detail": f"Failed on create: {str(e)}"},
                 status=status.HTTP_400_BAD_REQUEST
@@ -529,14 +937,14 @@ class BaseViewSet(viewsets.ModelViewSet):
         user_id = get_current_user_id()
         instance = self.get_object()
         old_data = self.get_serializer(instance).data
-        dump_obj = None
         updated_instance = None
 
         try:
             updated_instance = serializer.save()
             full_payload = self.get_serializer(updated_instance).data
+            self.resolve_users()
 
-            dump_obj = model_dump.objects.using(dump_data).create(
+            audit.enqueue(
                 user_id=user_id,
                 path=self.request.path,
                 method=self.request.method,
@@ -545,7 +953,6 @@ class BaseViewSet(viewsets.ModelViewSet):
                     "after": full_payload
                 },
             )
-            dump_obj.save()
 
             return Response({
                 'detail': f'Successfully updated data',
@@ -558,8 +965,6 @@ class BaseViewSet(viewsets.ModelViewSet):
         except Exception as e:
             if updated_instance:
                 updated_instance.delete()
-            if dump_obj:
-                dump_obj.delete()
             return Response(
                 {'detail': f'Failed update: {str(e)}'},
                 status=status.HTTP_400_BAD_REQUEST
@@ -568,28 +973,24 @@ class BaseViewSet(viewsets.ModelViewSet):
     def destroy(self, request, *args, **kwargs):
         user_id = get_current_user_id()
         instance = self.get_object()
-        dump_obj = None
 
         try:
             full_data = self.get_serializer(instance).data
+            self.resolve_users()
 
-            dump_obj = model_dump.objects.using(dump_data).create(
+            instance.delete(user_id=user_id)
+            audit.enqueue(
                 user_id=user_id,
                 path=self.request.path,
                 method="DELETE",
                 payload={"deleted": full_data},
             )
-            dump_obj.save()
-
-            instance.delete(user_id=user_id)
             return Response({
                 'detail': 'Successfully deleted data.',
                 'data': full_data
             }, status=status.HTTP_200_OK)
 
         except Exception as e:
-            if dump_obj:
-                dump_obj.delete()
             return Response(
                 {'detail': f'Failed delete: {str(e)}'},
                 status=status.HTTP_400_BAD_REQUEST
@@ -598,7 +999,6 @@ class BaseViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=["post"], url_path="restore")
     def restore(self, request, pk=None):
         user_id = get_current_user_id()
-        dump_obj = None
 
         try:
             obj = self.queryset.model.all_objects.get(pk=pk)
@@ -611,79 +1011,227 @@ class BaseViewSet(viewsets.ModelViewSet):
         try:
             full_data = self.serializer_class(obj).data
 
-            dump_obj = model_dump.objects.using(dump_data).create(
+            obj.restore(user_id=user_id)
+            audit.enqueue(
                 user_id=user_id,
                 path=self.request.path,
                 method="RESTORE",
                 payload=full_data,
             )
-            dump_obj.save()
-
-            obj.restore(user_id=user_id)
             return Response({
                 'detail': 'Successfully restoring data.',
                 'data': self.serializer_class(obj).data
             }, status=status.HTTP_200_OK)
 
         except Exception as e:
-            if dump_obj:
-                dump_obj.delete()
             return Response(
                 {'detail': f'Failed restore: {str(e)}'},
                 status=status.HTTP_400_BAD_REQUEST
             )
             
+    @extend_schema(
+        description="Export semua data (filter, search, include_deleted / only_deleted sama dengan list) sebagai file, di-stream.\n\n"
+                    "Kolom mengikuti format insert-bulk (branch_code, company_code, ...), jadi hasil export bisa di-upload lagi.",
+        parameters=[
+            OpenApiParameter("file_type", OpenApiTypes.STR, OpenApiParameter.QUERY, enum=tuple(EXPORT_FILE_TYPES),
+                             description="csv (default), ndjson or xlsx"),
+            OpenApiParameter("fields", OpenApiTypes.STR, OpenApiParameter.QUERY,
+                             description="Only export these columns\n\nexample:\n\n?fields=code,name,branch_code"),
+            OpenApiParameter("exclude", OpenApiTypes.STR, OpenApiParameter.QUERY,
+                             description="Columns to leave out\n\nexample:\n\n?exclude=created_at,updated_at"),
+        ],
+        responses={(200, "text/csv"): OpenApiTypes.BINARY, 400: OpenApiResponse(OpenApiTypes.OBJECT)},
+    )
+    @action(detail=False, methods=["get"], url_path="export")
+    def export(self, request):
+        """
+        Stream seluruh queryset hasil filter (hr/export.py): satu query,
+        server-side cursor, memory konstan.
+        """
+        file_type = request.query_params.get("file_type", "csv")
+        if file_type not in EXPORT_FILE_TYPES:
+            return Response({"detail": f"file_type must be one of {', '.join(EXPORT_FILE_TYPES)}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        def param_list(name):
+            value = request.query_params.get(name)
+            return [f.strip() for f in value.split(",") if f.strip()] if value else None
+
+        model = self.queryset.model
+        columns = select_columns(model, param_list("fields"), param_list("exclude"))
+        if not columns:
+            return Response({"detail": "No columns to export"}, status=status.HTTP_400_BAD_REQUEST)
+
+        header = [name for name, _ in columns]
+        rows = stream_rows(export_queryset(self.filter_queryset(self.get_queryset()), columns))
+        filename = f"{model._meta.model_name}.{file_type}"
+
+        if file_type == "xlsx":
+            try:
+                output = write_xlsx(header, rows)
+            except ImportError:
+                return Response({"detail": "xlsx export needs openpyxl"}, status=status.HTTP_400_BAD_REQUEST)
+            return FileResponse(output, as_attachment=True, filename=filename,
+                                content_type=EXPORT_FILE_TYPES[file_type])
+
+        content = iter_csv(header, rows) if file_type == "csv" else iter_ndjson(header, rows)
+        response = StreamingHttpResponse(content, content_type=EXPORT_FILE_TYPES[file_type])
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
     @extend_schema(
     request=inline_serializer(
         name="BulkUploadRequest",
         fields={
             "file": serializers.FileField(),
         },
-    ), responses={
+    ), parameters=[
+        OpenApiParameter("mode", OpenApiTypes.STR, OpenApiParameter.QUERY,
+                         description="insert (default) or upsert: rows matching an existing code are updated when something changed, unchanged rows are skipped."),
+        OpenApiParameter("chunked", OpenApiTypes.BOOL, OpenApiParameter.QUERY,
+                         description="Stream the file in chunks, each chunk committed on its own. Failed chunks are reported per chunk instead of failing the whole upload."),
+        OpenApiParameter("async", OpenApiTypes.BOOL, OpenApiParameter.QUERY,
+                         description="Queue the upload as a background job and return 202 right away. Poll /api/hr/jobs/{id}/ for progress."),
+        OpenApiParameter("chunk_size", OpenApiTypes.INT, OpenApiParameter.QUERY,
+                         description="Rows per chunk when chunked=true or async=true (default 1000)."),
+    ], responses={
+            200: OpenApiResponse(OpenApiTypes.OBJECT),
             201: OpenApiResponse(OpenApiTypes.OBJECT),
+            207: OpenApiResponse(OpenApiTypes.OBJECT, description="Some chunks failed"),
+            202: OpenApiResponse(OpenApiTypes.OBJECT, description="Queued as an import job"),
             400: OpenApiResponse(OpenApiTypes.OBJECT),
         },
     )
     @action(detail=False, methods=["post"], url_path="insert-bulk")
     def insert_bulk(self, request):
         """
-        Upload Excel (xlsx/csv) untuk bulk insert.
+        Upload Excel (xlsx/csv) untuk bulk insert (lihat hr/bulk_import.py).
         - Auto isi created_by & updated_by dari request.user.id
+        - FK / M2M boleh pakai code: branch_code, company_code (dipisah koma)
+        - ?mode=upsert: row yang cocok dengan upsert_keys di-update kalau berubah
         - Rollback kalau ada yang gagal
+        - ?chunked=true: file dibaca & ditulis per chunk_size row (file besar),
+          chunk yang error di-skip, response = report per chunk
+        - ?async=true: sama dengan chunked tapi di background (hr/import_jobs.py),
+          langsung 202 + job, progress di GET /api/hr/jobs/<id>/
         """
         file_obj = request.FILES.get("file")
         if not file_obj:
             return Response({"detail": "File not provided"}, status=status.HTTP_400_BAD_REQUEST)
 
-        try:
-            # load pakai pandas
-            if file_obj.name.endswith(".csv"):
-                df = pd.read_csv(file_obj)
-            else:
-                df = pd.read_excel(file_obj)
+        mode = request.query_params.get("mode", "insert")
+        if mode not in ("insert", "upsert"):
+            return Response({"detail": "mode must be insert or upsert"}, status=status.HTTP_400_BAD_REQUEST)
 
-            data = df.to_dict(orient="records")
-            user_id = get_current_user_id()
+        user_id = get_current_user_id()
+        upsert_keys = self.upsert_keys if mode == "upsert" else None
+
+        run_async = request.query_params.get("async", "").lower() in ("1", "true", "yes")
+        if run_async or request.query_params.get("chunked", "").lower() in ("1", "true", "yes"):
+            try:
+                chunk_size = int(request.query_params.get("chunk_size", BULK_CHUNK_SIZE))
+            except ValueError:
+                return Response({"detail": "chunk_size must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+            if chunk_size < 1:
+                return Response({"detail": "chunk_size must be positive"}, status=status.HTTP_400_BAD_REQUEST)
+
+            if run_async:
+                job = import_jobs.submit(
+                    self.queryset.model, file_obj, user_id, self.request.path,
+                    mode=mode, upsert_keys=upsert_keys, chunk_size=chunk_size,
+                )
+                return Response(
+                    {"detail": "Import queued", "data": job},
+                    status=status.HTTP_202_ACCEPTED,
+                    headers={"Location": reverse("jobs-detail", args=[job["id"]])},
+                )
+            return self.insert_bulk_chunked(file_obj, mode, user_id, upsert_keys, chunk_size)
 
-            # isi otomatis kolom audit
-            for row in data:
-                row["created_by"] = user_id
-                row["updated_by"] = user_id
+        try:
+            df = read_upload(file_obj)
+            importer = BulkImporter(self.queryset.model, user_id=user_id, upsert_keys=upsert_keys)
+            result = importer.run(df)
 
-            serializer = self.get_serializer(data=data, many=True)
+            if mode == "insert":
+                return Response(
+                    {"detail": f"Successfully inserted {result['inserted']} rows"},
+                    status=status.HTTP_201_CREATED,
+                )
 
-            with transaction.atomic():
-                serializer.is_valid(raise_exception=True)
-                serializer.save(user_id=user_id)  # dikirim ke BaseModel.save()
+            # satu audit per row yang beneran berubah
+            for method, payload in importer.changes:
+                audit.enqueue(user_id=user_id, path=self.request.path, method=method, payload=payload)
 
-            return Response(
-                {"detail": f"Successfully inserted {len(data)} rows"},
-                status=status.HTTP_201_CREATED,
-            )
+            return Response({
+                "detail": f"Successfully upserted {result['inserted']} new, {result['updated']} changed, {result['unchanged']} unchanged rows",
+                "data": result,
+            }, status=status.HTTP_200_OK)
 
+        except BulkImportError as e:
+            return Response({
+                "detail": f"Bulk insert failed: {str(e)}",
+                "errors": e.errors[:BULK_MAX_ERRORS],
+            }, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             return Response({"detail": f"Bulk insert failed: {str(e)}"}, status=status.HTTP_400_BAD_REQUEST)
 
+    def insert_bulk_chunked(self, file_obj, mode, user_id, upsert_keys, chunk_size):
+        path = self.request.path
+        report = None
+
+        def progress(current, changes):
+            # audit per chunk yang sudah commit, jangan nunggu semua chunk selesai
+            nonlocal report
+            report = current
+            for method, payload in changes:
+                audit.enqueue(user_id=user_id, path=path, method=method, payload=payload)
+
+        try:
+            report, _ = run_chunked(
+                self.queryset.model,
+                iter_upload(file_obj, chunk_size),
+                progress=progress,
+                user_id=user_id,
+                upsert_keys=upsert_keys,
+                chunk_size=chunk_size,
+            )
+        except Exception as e:
+            written = report["inserted"] + report["updated"] + report["unchanged"] if report else 0
+            if not written:
+                return Response({"detail": f"Bulk insert failed: {str(e)}", "data": report}, status=status.HTTP_400_BAD_REQUEST)
+            # chunk sebelum error sudah commit (dan sudah masuk audit), jangan bilang tidak ada yang masuk
+            return Response({
+                "detail": f"Processed {written} rows, then stopped: {str(e)}",
+                "data": report,
+            }, status=status.HTTP_207_MULTI_STATUS)
+
+        written = report["inserted"] + report["updated"] + report["unchanged"]
+        if not report["failed_rows"]:
+            code = status.HTTP_201_CREATED if mode == "insert" else status.HTTP_200_OK
+        elif written:
+            code = status.HTTP_207_MULTI_STATUS  # sebagian chunk masuk
+        else:
+            code = status.HTTP_400_BAD_REQUEST
+        return Response({
+            "detail": f"Processed {written} rows, {report['failed_rows']} rows in failed chunks",
+            "data": report,
+        }, status=code)
+
+@extend_schema(tags=["Jobs"])
+class ImportJobViewSet(viewsets.ViewSet):
+    """Status import job (insert-bulk?async=true), state-nya di disk, lihat hr/import_jobs.py."""
+
+    @extend_schema(
+        description="Progress bulk import job: state (queued, running, done, partial, failed), row counts, rows/sec, failed chunks.",
+        parameters=[OpenApiParameter("id", OpenApiTypes.STR, OpenApiParameter.PATH, description="Job id from insert-bulk?async=true")],
+        responses={200: OpenApiResponse(OpenApiTypes.OBJECT), 404: OpenApiResponse(OpenApiTypes.OBJECT)},
+    )
+    def retrieve(self, request, pk=None):
+        job = import_jobs.get_job(pk)
+        if job is None:
+            return Response({"detail": "Job not found"}, status=status.HTTP_404_NOT_FOUND)
+        return Response({"data": job}, status=status.HTTP_200_OK)
+
 def custom_exception_handler(exc, context):
     response = exception_handler(exc, context)
 
@@ -708,59 +1256,157 @@ def custom_exception_handler(exc, context):
 
     return response
 
-def get_users_from_auth(user_ids, timeout=300):
+def get_users(user_ids, token=None, timeout=USER_CACHE_TIMEOUT):
     """
-    Ambil detail user dari Auth Service sekali saja.
-    Cache hasilnya biar ga bolak-balik hit Auth.
+    User directory bersama: user_id → dict user dari Auth Service.
+    - Cek cache sekali jalan pakai get_many (bukan cache.get per id)
+    - Yang miss diambil sekaligus dari Auth, lalu ditulis balik pakai set_many
+    - Id yang tidak dikenal Auth di-negative cache, biar ga nembak Auth terus
+    - Hit / miss dicatat di Prometheus (USER_CACHE_LOOKUP)
     """
-    users_map = {}
-    missing_ids = []
+    user_ids = list(dict.fromkeys(uid for uid in user_ids if uid))
+    if not user_ids:
+        return {}
 
-    # cek cache dulu
-    for uid in user_ids:
-        cached = cache.get(f"user:{uid}")
-        if cached:
-            users_map[uid] = cached
-        else:
-            missing_ids.append(uid)
+    keys = {f"user:{uid}": uid for uid in user_ids}
+    cached = cache.get_many(list(keys))
 
-    # kalau ada yang belum di-cache, fetch dari Auth Service
-    if missing_ids:
-        try:
-            resp = requests.get(f"{AUTH_SERVICE}/api/users/?id__in={','.join(map(str, missing_ids))}", timeout=5)
-            if resp.status_code == 200:
-                for u in resp.json():
-                    users_map[u["id"]] = u
-                    cache.set(f"user:{u['id']}", u, timeout=timeout)
-        except requests.RequestException:
-            # fallback: return id only kalau Auth error
-            for uid in missing_ids:
-                users_map[uid] = {"id": uid}
+    users_map = {}
+    for key, value in cached.items():
+        uid = keys[key]
+        if value.get(USER_NOT_FOUND):
+            users_map[uid] = {"id": uid}
+            USER_CACHE_LOOKUP.labels(result="negative").inc()
+        else:
+            users_map[uid] = value
+            USER_CACHE_LOOKUP.labels(result="hit").inc()
+
+    missing_ids = [uid for key, uid in keys.items() if key not in cached]
+    if not missing_ids:
+        return users_map
+    USER_CACHE_LOOKUP.labels(result="miss").inc(len(missing_ids))
+
+    headers = {"Authorization": f"Bearer {token}"} if token is not None else {}
+    try:
+        url = f"{AUTH_SERVICE}/api/users/"
+        params = {
+            "id__in": ",".join(map(str, missing_ids)),
+            "exclude": "groups,user_permissions,last_login,date_joined",
+            "page_size": len(missing_ids),
+        }
+        found = {}
+        complete = False
+        for _ in range(USER_MAX_PAGES):
+            resp = http_client.get(url, params=params, headers=headers, timeout=5)
+            resp.raise_for_status()
+            data = resp.json()
+
+            # kalau hasilnya array langsung
+            data_list = data if isinstance(data, list) else data.get("results", [])
+            found.update((u["id"], u) for u in data_list)
+
+            url = None if isinstance(data, list) else data.get("next")
+            if not url:
+                complete = True
+                break
+            params = None  # url `next` sudah bawa query-nya
+
+        to_cache = {}
+        for uid in missing_ids:
+            if uid in found:
+                users_map[uid] = found[uid]
+                to_cache[f"user:{uid}"] = found[uid]  # cache dict lengkap
+            elif complete:
+                # cuma kalau hasil Auth lengkap, kalau tidak bisa jadi user-nya di halaman berikutnya
+                to_cache[f"user:{uid}"] = {"id": uid, USER_NOT_FOUND: True}
+        cache.set_many(to_cache, timeout=timeout)
+
+    except Exception:
+        # Auth error: jangan di-cache, biar request berikutnya coba lagi
+        pass
+
+    # fallback: return id only kalau user tidak ketemu / Auth error
+    for uid in missing_ids:
+        users_map.setdefault(uid, {"id": uid})
 
     return users_map
 
-def fetch_external_data(service_name, endpoint, key_suffix, timeout=3600, retries=2, fallback=True):
-    cache_key = f"{service_name}:{key_suffix}"
-    cached = cache.get(cache_key)
-    if cached:
-        return cached
+def get_users_from_auth(user_ids, timeout=300):
+    """
+    Ambil detail user dari Auth Service sekali saja.
+    Cache hasilnya biar ga bolak-balik hit Auth.
+    """
+    return get_users(user_ids, timeout=timeout)
 
+def request_external_data(service_name, endpoint, retries=2):
+    """GET ke upstream, None kalau gagal."""
     last_exception = None
     for attempt in range(retries):
         try:
-            response = requests.get(endpoint, timeout=5)
+            response = http_client.get(endpoint, timeout=5)
             if response.status_code == 200:
-                data = response.json()
-                cache.set(cache_key, data, timeout=timeout)
-                return data
+                return response.json()
+            last_exception = f"HTTP {response.status_code}"
         except Exception as e:
             last_exception = e
 
-    if fallback:
-        stale = cache.get(cache_key)
-        if stale:
-            print(f"[WARN] Service {service_name} down, using stale cache")
-            return stale
-
     print(f"[ERROR] fetch_external_data({service_name}) failed: {last_exception}")
-    return None
\ No newline at end of file
+    return None
+
+def refresh_external_data(service_name, endpoint, cache_key, timeout, stale_timeout, retries):
+    """
+    Dipanggil cuma oleh pemegang lock:<key>. Sukses → simpan + lepas lock.
+    Gagal → lock ditandai failed sampai expire, jadi yang lain tidak ikut
+    nembak upstream dan tidak perlu nunggu.
+    """
+    lock_key = f"lock:{cache_key}"
+    data = request_external_data(service_name, endpoint, retries)
+    if data is None:
+        cache.set(lock_key, EXTERNAL_REFRESH_FAILED, timeout=EXTERNAL_LOCK_TIMEOUT)
+        return None
+
+    cache.set(cache_key, {"data": data, "fresh_until": time() + timeout}, timeout=timeout + stale_timeout)
+    cache.delete(lock_key)
+    return data
+
+def fetch_external_data(service_name, endpoint, key_suffix, timeout=3600, retries=2, fallback=True,
+                        stale_timeout=EXTERNAL_STALE_TIMEOUT):
+    """
+    Cache stale-while-revalidate buat data Finance / Auth Service.
+    - timeout = soft expiry (fresh), timeout + stale_timeout = hard expiry
+    - Fresh → langsung dari cache
+    - Stale → data lama langsung dibalikin, refresh di background, satu per key
+      (lock:<key> pakai cache.add = SET NX di Redis)
+    - Kosong → satu worker fetch, yang lain nunggu hasilnya (maks EXTERNAL_LOCK_WAIT)
+    - Upstream gagal → data lama tetap dipakai, retry paling cepat tiap EXTERNAL_LOCK_TIMEOUT
+    - fallback=False → data stale tidak dipakai, refresh-nya ditunggu
+    """
+    cache_key = f"{service_name}:{key_suffix}"
+    lock_key = f"lock:{cache_key}"
+    refresh = (service_name, endpoint, cache_key, timeout, stale_timeout, retries)
+
+    entry = cache.get(cache_key)
+    if not isinstance(entry, dict) or "fresh_until" not in entry:
+        entry = None  # kosong / format lama
+    if entry and entry["fresh_until"] > time():
+        EXTERNAL_CACHE_LOOKUP.labels(service=service_name, result="fresh").inc()
+        return entry["data"]
+
+    if entry and fallback:
+        EXTERNAL_CACHE_LOOKUP.labels(service=service_name, result="stale").inc()
+        if cache.add(lock_key, 1, timeout=EXTERNAL_LOCK_TIMEOUT):
+            threading.Thread(target=refresh_external_data, args=refresh, daemon=True).start()
+        return entry["data"]
+
+    EXTERNAL_CACHE_LOOKUP.labels(service=service_name, result="miss").inc()
+    deadline = monotonic() + EXTERNAL_LOCK_WAIT
+    while not cache.add(lock_key, 1, timeout=EXTERNAL_LOCK_TIMEOUT):
+        # worker lain lagi fetch key yang sama, tunggu hasilnya
+        if cache.get(lock_key) == EXTERNAL_REFRESH_FAILED or monotonic() >= deadline:
+            return None
+        sleep(0.05)
+        entry = cache.get(cache_key)
+        if isinstance(entry, dict) and entry.get("fresh_until", 0) > time():
+            return entry["data"]
+
+    return refresh_external_data(*refresh)
\ No newline at end of file
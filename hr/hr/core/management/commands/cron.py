@@ -2,6 +2,10 @@ import datetime
 from django.core.management.base import BaseCommand
 from .dump_data import Command as HRDump
 from .server_check import Command as ServerCheck
+from .flush_audit import Command as FlushAudit
+from .run_import_jobs import Command as ImportJobs
+from .partition_hr_dump import Command as PartitionHRDump
+from django.db import connections
 
 
 class Command(BaseCommand):
@@ -13,9 +17,23 @@ class Command(BaseCommand):
 
         self.stdout.write(f"[scheduler] Running {now.isoformat()}")
 
+        # spool audit yang ketinggalan (worker mati / hr_dump sempat down)
+        FlushAudit.run_flush(self)
+
+        # job import yang ketinggalan (IMPORT_JOB_WORKERS=0 / worker mati)
+        ImportJobs.run_once(self)
+
         if day == 1 and hour == 0 and minute <= 30:
-            self.stdout.write("[scheduler] Running dump data()...")
-            HRDump.run_dump()
+            if connections["hr_dump"].vendor == "mysql":
+                # hr_dump dipartisi per bulan: archive = export lalu DROP PARTITION, bukan DELETE per PK
+                partitioner = PartitionHRDump(stdout=self.stdout)
+                self.stdout.write("[scheduler] Pre-creating hr_dump partitions...")
+                partitioner.ensure(connections["hr_dump"], ahead=3, dry_run=False)
+                self.stdout.write("[scheduler] Archiving closed hr_dump partition...")
+                partitioner.archive_closed(connections["hr_dump"])
+            else:
+                self.stdout.write("[scheduler] Running dump data()...")
+                HRDump.run_dump()
         
         if hour == 3 and minute <= 30:
             self.stdout.write("[scheduler] Checking server resource and performance...")
@@ -1,76 +1,198 @@
+import os
+import gzip
 import json
+import zlib
 import datetime
+from itertools import count
+from time import perf_counter
 from pathlib import Path
 from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
 
 from hr_dump.models import HRDump
+from hr_dump.archive import ColumnarWriter, get_archive_dir
+from hr import audit
 
 from hr.local_settings import TELEGRAM_TOKEN, CHAT_IDS
 
 import requests
 
+CHUNK_SIZE = 2000
+DELETE_BATCH = 1000
+EXTENSIONS = {"none": "", "gzip": ".gz", "zstd": ".zst"}
+
+
+class DumpWriter:
+    """
+    NDJSON writer (plain / gzip / zstd). sync() = flush kompresor + fsync,
+    setelah itu baris yang sudah ditulis aman buat dihapus dari DB.
+    File yang sudah ada tidak pernah ditimpa (FileExistsError), row-nya
+    sudah tidak ada di hr_dump.
+    """
+    def __init__(self, filepath, compress="gzip"):
+        if compress == "zstd":
+            try:
+                import zstandard
+            except ImportError:
+                raise CommandError("zstd compression needs the `zstandard` package")
+        self.raw = open(filepath, "xb")
+        self.compress = compress
+        if compress == "gzip":
+            self.stream = gzip.GzipFile(fileobj=self.raw, mode="wb")
+        elif compress == "zstd":
+            self.stream = zstandard.ZstdCompressor().stream_writer(self.raw, closefd=False)
+        else:
+            self.stream = self.raw
+
+    @classmethod
+    def create(cls, dumps_dir, stem, compress="gzip"):
+        """
+        hr_YYYY_MM.ndjson.gz, kalau sudah ada (cron ke-2 di window yang sama,
+        retry habis crash) → hr_YYYY_MM.1.ndjson.gz, .2, dst.
+        Return (filepath, writer).
+        """
+        suffix = f".ndjson{EXTENSIONS[compress]}"
+        for seq in count():
+            filepath = Path(dumps_dir) / (f"{stem}{suffix}" if not seq else f"{stem}.{seq}{suffix}")
+            try:
+                return filepath, cls(filepath, compress)
+            except FileExistsError:
+                continue
+
+    def write(self, row):
+        self.stream.write(json.dumps(row, ensure_ascii=False).encode("utf-8") + b"\n")
+
+    def sync(self):
+        if self.compress == "gzip":
+            self.stream.flush(zlib.Z_SYNC_FLUSH)
+        elif self.compress == "zstd":
+            import zstandard
+            self.stream.flush(zstandard.FLUSH_BLOCK)
+        self.raw.flush()
+        os.fsync(self.raw.fileno())
+
+    def close(self):
+        if self.stream is not self.raw:
+            self.stream.close()  # raw file tidak ikut ditutup
+        self.raw.flush()
+        os.fsync(self.raw.fileno())
+        self.raw.close()
+
+
 class Command(BaseCommand):
-    help = "Dump data HR_DUMP to JSON (monthly), then delete all data from database."
+    help = "Dump data HR_DUMP to NDJSON or columnar archive (monthly, streaming), then delete dumped rows in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", choices=("ndjson", "columnar"), default="ndjson", help="ndjson = satu file hr_{MM}.ndjson, columnar = dumps/archive/year=/month=/ (lihat hr_dump/archive.py)")
+        parser.add_argument("--compress", choices=list(EXTENSIONS), default="gzip", help="Kompresi file dump")
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="Jumlah row per chunk yang dibaca & di-fsync")
+        parser.add_argument("--delete-batch", type=int, default=DELETE_BATCH, help="Maksimal PK per DELETE")
 
     def handle(self, *args, **options):
-        self.run_dump()
+        self.run_dump(
+            fmt=options["format"],
+            compress=options["compress"],
+            chunk_size=options["chunk_size"],
+            delete_batch=options["delete_batch"],
+        )
 
     @staticmethod
-    def run_dump():
-        """Ambil semua HR_DUMP bulan ini → simpan JSON → hapus DB"""
-        now = datetime.datetime.now()
-        month_str = now.strftime("%m")
-        year_str = now.strftime("%Y")
+    def run_dump(fmt="ndjson", compress="gzip", chunk_size=CHUNK_SIZE, delete_batch=DELETE_BATCH,
+                 start=None, end=None, delete=True):
+        """
+        Stream HR_DUMP bulan ini → NDJSON per chunk → hapus chunk yang sudah
+        di-fsync, jadi memory & lock DB tetap kecil berapapun isi bulannya.
+
+        start/end: range created_at lain (mis. satu partisi, lihat
+        partition_hr_dump), delete=False kalau row-nya dibuang lewat DROP PARTITION.
+        """
+        # pastikan audit yang masih di spool ikut ke-dump
+        audit.flush()
+
+        # range created_at (bukan __year/__month) biar index kepakai
+        if start is None:
+            now = datetime.datetime.now()
+            start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+            end = (start + datetime.timedelta(days=32)).replace(day=1)
+            if settings.USE_TZ:
+                start, end = timezone.make_aware(start), timezone.make_aware(end)
+        month_str = start.strftime("%m")
+        year_str = start.strftime("%Y")
 
         # ambil data dari DB alias hr_dump
-        qs = HRDump.objects.using("hr_dump").filter(
-            created_at__year=year_str,
-            created_at__month=month_str,
-        )
+        qs = HRDump.objects.using("hr_dump").filter(created_at__gte=start, created_at__lt=end)
 
         if not qs.exists():
             print(f"[HR_DUMP] There's no record for {month_str}/{year_str}")
             return None
 
-        # bentuk list data
-        data = [
-            {
-                "id": obj.id,
-                "user_id": obj.user_id,
-                "path": obj.path,
-                "method": obj.method,
-                "payload": obj.payload,
-                "created_at": obj.created_at.isoformat(),
-            }
-            for obj in qs
-        ]
-
-        # simpan file ke folder dumps/
-        dumps_dir = Path(settings.BASE_DIR) / "dumps"
-        dumps_dir.mkdir(parents=True, exist_ok=True)
-        filename = f"hr_{month_str}.json"
-        filepath = dumps_dir / filename
-
-        with open(filepath, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-
+        if fmt == "columnar":
+            # satu part file per chunk, --compress tidak dipakai (npz sudah deflate per kolom)
+            writer = ColumnarWriter(get_archive_dir(), year_str, month_str)
+            filepath = writer.path
+        else:
+            # simpan file ke folder dumps/
+            dumps_dir = Path(getattr(settings, "DUMP_DIR", Path(settings.BASE_DIR) / "dumps"))
+            dumps_dir.mkdir(parents=True, exist_ok=True)
+            filepath, writer = DumpWriter.create(dumps_dir, f"hr_{year_str}_{month_str}", compress)
+
+        started = perf_counter()
+        written = deleted = 0
+        last_pk = 0
+        try:
+            while True:
+                # keyset per PK: mysqlclient nge-buffer seluruh result .iterator(),
+                # jadi chunk-nya dibatasi di query-nya sendiri
+                chunk = qs.filter(pk__gt=last_pk).order_by("pk")[:chunk_size]
+                pks = []
+                for obj in chunk.iterator(chunk_size=chunk_size):
+                    writer.write({
+                        "id": obj.id,
+                        "user_id": obj.user_id,
+                        "path": obj.path,
+                        "method": obj.method,
+                        "payload": obj.payload,
+                        "created_at": obj.created_at.isoformat(),
+                    })
+                    pks.append(obj.pk)
+                if not pks:
+                    break
+
+                # chunk sudah aman di disk, baru boleh dihapus
+                writer.sync()
+                written += len(pks)
+                last_pk = pks[-1]
+                if not delete:
+                    continue
+                for i in range(0, len(pks), delete_batch):
+                    count, _ = HRDump.objects.using("hr_dump").filter(pk__in=pks[i:i + delete_batch]).delete()
+                    deleted += count
+        finally:
+            writer.close()
+
+        elapsed = perf_counter() - started
+        files = filepath.glob("part-*.npz") if filepath.is_dir() else [filepath]
+        size_mb = sum(f.stat().st_size for f in files) / (1024 ** 2)
         print(f"[HR_DUMP] Data saved successfully at {filepath}")
+        print(
+            f"[HR_DUMP] {written} rows written, {deleted} records deleted in {elapsed:.2f}s "
+            f"({written / elapsed if elapsed else 0:.0f} rows/s, {size_mb:.2f} MB)"
+        )
+
+        if fmt == "columnar":
+            return filepath
 
         for i in CHAT_IDS:
             send_json(
                 file_path=filepath,
                 token=TELEGRAM_TOKEN,
                 chat_id=i,
-                row_count=len(data),
+                row_count=written,
                 month_str=month_str,
                 year_str=year_str
             )
 
-        # hapus data setelah dump
-        count, _ = qs.delete()
-        print(f"[HR_DUMP] {count} records deleted after dump")
-
         return filepath
     
 def send_json(file_path, token, chat_id, row_count=0, month_str="", year_str=""):
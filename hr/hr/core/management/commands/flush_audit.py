@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from hr import audit
+
+
+class Command(BaseCommand):
+    help = "Flush audit spool (hr/audit.py) to hr_dump, including spool left by dead workers."
+
+    def handle(self, *args, **options):
+        self.run_flush()
+
+    def run_flush(self):
+        written = audit.flush()
+        self.stdout.write(f"[AUDIT] {written} records flushed to hr_dump")
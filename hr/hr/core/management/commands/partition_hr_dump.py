@@ -0,0 +1,161 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+
+from hr_dump.models import HRDump
+from .dump_data import Command as DumpData
+
+DB = "hr_dump"
+TABLE = HRDump._meta.db_table
+FUTURE = "p_future"
+
+
+def month_start(value):
+    return datetime.datetime(value.year, value.month, 1)
+
+
+def next_month(value):
+    return (value + datetime.timedelta(days=32)).replace(day=1)
+
+
+def closed_month(now):
+    """Bulan (UTC) terakhir yang sudah selesai, partisinya aman di-archive."""
+    return month_start(month_start(now) - datetime.timedelta(days=1))
+
+
+def partition_name(month):
+    return f"p{month:%Y%m}"
+
+
+def parse_partition(name):
+    return datetime.datetime.strptime(name[1:], "%Y%m")
+
+
+def partition_sql(months):
+    """PARTITION pYYYYMM VALUES LESS THAN ('<awal bulan berikutnya>') ..., p_future."""
+    parts = [
+        f"PARTITION {partition_name(month)} VALUES LESS THAN ('{next_month(month):%Y-%m-%d}')"
+        for month in months
+    ]
+    parts.append(f"PARTITION {FUTURE} VALUES LESS THAN (MAXVALUE)")
+    return ", ".join(parts)
+
+
+def months_between(first, last):
+    months = []
+    month = month_start(first)
+    while month <= last:
+        months.append(month)
+        month = next_month(month)
+    return months
+
+
+def plan_partitions(existing, first_month, now, ahead):
+    """
+    SQL buat bikin / nambah partisi sampai `ahead` bulan ke depan.
+    existing: nama partisi sekarang (kosong = tabel belum dipartisi).
+    """
+    last = month_start(now)
+    for _ in range(ahead):
+        last = next_month(last)
+
+    if not existing:
+        months = months_between(min(first_month, month_start(now)), last)
+        return [
+            # MySQL: semua unique key (termasuk PK) wajib ada kolom partisinya
+            f"ALTER TABLE {TABLE} DROP PRIMARY KEY, ADD PRIMARY KEY (id, created_at)",
+            f"ALTER TABLE {TABLE} PARTITION BY RANGE COLUMNS(created_at) ({partition_sql(months)})",
+        ]
+
+    named = sorted(parse_partition(name) for name in existing if name != FUTURE)
+    months = months_between(next_month(named[-1]), last) if named else months_between(month_start(now), last)
+    if not months:
+        return []
+    # p_future harusnya kosong, jadi REORGANIZE-nya murah
+    return [f"ALTER TABLE {TABLE} REORGANIZE PARTITION {FUTURE} INTO ({partition_sql(months)})"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Keep hr_dump range-partitioned by month (MySQL): pre-create upcoming partitions, "
+        "or archive a month with export-then-DROP PARTITION."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--ahead", type=int, default=3, help="Jumlah bulan ke depan yang disiapkan")
+        parser.add_argument("--archive", metavar="YYYY-MM", help="Export bulan ini (dump_data) lalu DROP PARTITION")
+        parser.add_argument("--format", choices=("ndjson", "columnar"), default="ndjson", help="Format export --archive")
+        parser.add_argument("--dry-run", action="store_true", help="Cuma print SQL")
+
+    def handle(self, *args, **options):
+        connection = connections[DB]
+        if connection.vendor != "mysql":
+            raise CommandError(f"Range partitioning is only supported on MySQL, {DB} is {connection.vendor}.")
+
+        if options["archive"]:
+            self.archive(connection, options["archive"], options["format"], options["dry_run"])
+        self.ensure(connection, options["ahead"], options["dry_run"])
+
+    def get_partitions(self, connection):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT PARTITION_NAME FROM information_schema.PARTITIONS "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL "
+                "ORDER BY PARTITION_ORDINAL_POSITION",
+                [TABLE],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def run_sql(self, connection, statements, dry_run):
+        for sql in statements:
+            self.stdout.write(f"[PARTITION] {sql}")
+            if not dry_run:
+                with connection.cursor() as cursor:
+                    cursor.execute(sql)
+
+    def ensure(self, connection, ahead, dry_run):
+        existing = self.get_partitions(connection)
+        first = HRDump.objects.using(DB).order_by("created_at").values_list("created_at", flat=True).first()
+        now = timezone.now()  # partisi pakai UTC, sama dengan isi kolom (USE_TZ)
+        first_month = month_start(first) if first else month_start(now)
+
+        statements = plan_partitions(existing, first_month, now, ahead)
+        if not existing and statements:
+            self.stdout.write("[PARTITION] hr_dump is not partitioned yet, this rebuilds the table")
+        self.run_sql(connection, statements, dry_run)
+        if not statements:
+            self.stdout.write(f"[PARTITION] Partitions already cover the next {ahead} month(s)")
+
+    def archive_closed(self, connection, fmt="ndjson"):
+        """
+        Dipanggil cron tiap awal bulan: archive bulan UTC yang sudah selesai.
+        Partisinya sudah tidak ada (cron ke-2 di window yang sama) → skip.
+        """
+        month = closed_month(timezone.now())
+        if partition_name(month) not in self.get_partitions(connection):
+            self.stdout.write(f"[PARTITION] {month:%Y-%m} already archived")
+            return False
+        self.archive(connection, f"{month:%Y-%m}", fmt, dry_run=False)
+        return True
+
+    def archive(self, connection, value, fmt, dry_run):
+        try:
+            month = datetime.datetime.strptime(value, "%Y-%m")
+        except ValueError:
+            raise CommandError("--archive must be YYYY-MM")
+
+        name = partition_name(month)
+        if name not in self.get_partitions(connection):
+            raise CommandError(f"Partition {name} does not exist")
+
+        if dry_run:
+            self.stdout.write(f"[PARTITION] would export {value} then DROP PARTITION {name}")
+            return
+
+        # batas partisi = awal bulan UTC, export harus range yang persis sama
+        start = month.replace(tzinfo=datetime.timezone.utc)
+        end = next_month(month).replace(tzinfo=datetime.timezone.utc)
+        DumpData.run_dump(fmt=fmt, start=start, end=end, delete=False)
+        self.run_sql(connection, [f"ALTER TABLE {TABLE} DROP PARTITION {name}"], dry_run)
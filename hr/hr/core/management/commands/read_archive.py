@@ -0,0 +1,33 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from hr_dump.archive import COLUMNS, read_archive
+
+
+class Command(BaseCommand):
+    help = "Query HR_DUMP columnar archive (dump_data --format columnar), output NDJSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--year", type=int)
+        parser.add_argument("--month", type=int)
+        parser.add_argument("--user-id", type=int)
+        parser.add_argument("--path")
+        parser.add_argument("--method")
+        parser.add_argument("--columns", default=",".join(COLUMNS), help="Kolom yang dibaca, dipisah koma")
+        parser.add_argument("--limit", type=int)
+
+    def handle(self, *args, **options):
+        frame = read_archive(
+            year=options["year"],
+            month=options["month"],
+            user_id=options["user_id"],
+            path=options["path"],
+            method=options["method"],
+            columns=[c.strip() for c in options["columns"].split(",") if c.strip()],
+        )
+        if options["limit"]:
+            frame = frame.head(options["limit"])
+
+        for row in frame.to_dict(orient="records"):
+            self.stdout.write(json.dumps(row, default=str, ensure_ascii=False))
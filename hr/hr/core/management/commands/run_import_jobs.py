@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from hr import import_jobs
+
+import time
+
+
+class Command(BaseCommand):
+    help = "Process queued bulk import jobs (insert-bulk?async=true), see hr/import_jobs.py."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Kerjakan antrian sekarang lalu keluar")
+        parser.add_argument("--interval", type=float, default=5, help="Jeda polling antrian (detik)")
+
+    def handle(self, *args, **options):
+        if options["once"]:
+            self.run_once()
+            return
+
+        self.stdout.write("[IMPORT] Waiting for jobs...")
+        while True:
+            if import_jobs.run_pending():
+                self.stdout.write("[IMPORT] Queue drained")
+            time.sleep(options["interval"])
+
+    def run_once(self):
+        processed = import_jobs.run_pending()
+        removed = import_jobs.purge()
+        self.stdout.write(f"[IMPORT] {processed} job(s) processed, {removed} old job(s) purged")
@@ -0,0 +1,147 @@
+"""
+Shared HTTP client buat semua call keluar (Auth Service, Finance Service).
+
+- Satu requests.Session per proses (per gunicorn worker), dibuat ulang kalau
+  PID berubah (habis fork) biar socket tidak ke-share antar worker
+- Connection pool + keep-alive, ukuran pool diatur lewat HTTP_POOL_SIZE
+- Retry + backoff buat error koneksi dan 502/503/504
+- Circuit breaker per host: kalau gagal terus, langsung raise CircuitOpenError
+  tanpa nunggu timeout
+"""
+from django.conf import settings
+
+from http.cookiejar import DefaultCookiePolicy
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlsplit
+from urllib3.util.retry import Retry
+from time import monotonic
+
+import os
+import threading
+import requests
+
+from . import timing
+
+DEFAULT_TIMEOUT = 5
+
+_state = {"pid": None, "session": None}
+_breakers = {}
+_lock = threading.Lock()
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """Host lagi di-skip karena circuit breaker terbuka."""
+
+
+class CircuitBreaker:
+    """
+    - closed: request jalan normal, gagal dihitung
+    - open: setelah `failure_threshold` kali gagal berturut-turut, semua request
+      ditolak selama `reset_timeout` detik
+    - half-open: setelah itu satu request dikasih lewat buat nyoba,
+      sukses → closed, gagal → open lagi
+    """
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if monotonic() - self.opened_at >= self.reset_timeout:
+                # half-open: tahan yang lain sampai percobaan ini selesai
+                self.opened_at = monotonic()
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = monotonic()
+
+
+def build_session():
+    retries = getattr(settings, "HTTP_RETRIES", 2)
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=getattr(settings, "HTTP_BACKOFF", 0.2),
+        status_forcelist=(502, 503, 504),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=getattr(settings, "HTTP_POOL_CONNECTIONS", 4),
+        pool_maxsize=getattr(settings, "HTTP_POOL_SIZE", 10),
+        max_retries=retry,
+    )
+
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    # jangan simpan cookie dari response, session ini dipakai semua user
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    return session
+
+
+def get_session():
+    pid = os.getpid()
+    if _state["pid"] != pid:
+        with _lock:
+            if _state["pid"] != pid:
+                _state["session"] = build_session()
+                _state["pid"] = pid
+                _breakers.clear()
+    return _state["session"]
+
+
+def get_breaker(url):
+    host = urlsplit(url).netloc
+    breaker = _breakers.get(host)
+    if breaker is None:
+        with _lock:
+            breaker = _breakers.setdefault(host, CircuitBreaker(
+                failure_threshold=getattr(settings, "HTTP_CIRCUIT_FAILURES", 5),
+                reset_timeout=getattr(settings, "HTTP_CIRCUIT_RESET", 30),
+            ))
+    return breaker
+
+
+def request(method, url, **kwargs):
+    session = get_session()
+    breaker = get_breaker(url)
+    if not breaker.allow():
+        raise CircuitOpenError(f"Circuit open for {urlsplit(url).netloc}")
+
+    kwargs.setdefault("timeout", DEFAULT_TIMEOUT)
+    try:
+        with timing.track("http"):
+            resp = session.request(method, url, **kwargs)
+    except requests.RequestException:
+        breaker.record_failure()
+        raise
+
+    if resp.status_code >= 500:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+    return resp
+
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request("POST", url, **kwargs)
@@ -0,0 +1,262 @@
+"""
+Bulk import async (insert-bulk?async=true).
+
+- Request cuma nyimpan file upload ke IMPORT_JOB_DIR lalu balikin 202 + job id,
+  worker gunicorn langsung bebas lagi
+- File diproses proses terpisah `manage.py run_import_jobs` (default), atau
+  thread di proses web kalau IMPORT_JOB_WORKERS > 0 (dev / runserver). Prosesnya
+  lewat run_chunked, jadi per chunk commit sendiri-sendiri dan memory tidak ikut
+  besar file
+- State job = `<id>.json` (tmp → os.replace, atomic), dibaca GET /api/hr/jobs/<id>/
+  dari worker mana pun. IMPORT_JOB_DIR harus shared kalau lebih dari satu node
+- Antrian = marker `<id>.queued`, di-claim pakai os.rename (atomic) jadi satu job
+  cuma dikerjakan satu worker
+- Marker `<id>.running` di-flock worker selama job jalan. Lock-nya lepas sendiri
+  kalau prosesnya mati, jadi node mana pun bisa tahu job itu ditinggal (tanpa
+  cek pid, yang cuma valid di host / container yang sama)
+- Job yang workernya mati di tengah jalan ditandai failed, tidak di-retry otomatis
+  (chunk yang sudah commit tidak di-rollback)
+"""
+from django.apps import apps
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+from pathlib import Path
+from time import monotonic
+
+import os
+import re
+import datetime
+import json
+import uuid
+import logging
+import threading
+
+from . import audit
+from .audit import lock_file
+from .bulk_import import iter_upload, run_chunked, CHUNK_SIZE, MAX_ERRORS
+
+logger = logging.getLogger(__name__)
+
+JOB_ID = re.compile(r"[0-9a-f]{32}")
+
+_state = {"pid": None, "workers": []}
+_lock = threading.Lock()
+_wake = threading.Event()
+
+
+def get_job_dir():
+    path = Path(getattr(settings, "IMPORT_JOB_DIR", Path(settings.BASE_DIR, "spool", "jobs")))
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def write_state(job):
+    target = get_job_dir() / f"{job['id']}.json"
+    tmp = target.with_name(f"{job['id']}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(job, f)
+    os.replace(tmp, target)
+
+
+def get_job(job_id):
+    if not JOB_ID.fullmatch(str(job_id)):
+        return None
+    try:
+        with open(get_job_dir() / f"{job_id}.json", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def submit(model, file_obj, user_id, path, mode="insert", upsert_keys=None, chunk_size=CHUNK_SIZE):
+    """Spool file upload ke disk + antrikan job. Return state awal job."""
+    job_dir = get_job_dir()
+    job_id = uuid.uuid4().hex
+    upload = job_dir / f"{job_id}{'.csv' if file_obj.name.endswith('.csv') else '.xlsx'}"
+
+    tmp = upload.with_suffix(".upload")
+    with open(tmp, "wb") as f:
+        for chunk in file_obj.chunks():
+            f.write(chunk)
+    os.replace(tmp, upload)
+
+    job = {
+        "id": job_id,
+        "state": "queued",
+        "resource": model._meta.label,
+        "mode": mode,
+        "upsert_keys": list(upsert_keys) if upsert_keys else None,
+        "chunk_size": chunk_size,
+        "file": upload.name,
+        "file_name": file_obj.name,
+        "path": path,
+        "created_by": user_id,
+        "created_at": timezone.now().isoformat(),
+        "started_at": None,
+        "finished_at": None,
+        "rows": 0,
+        "inserted": 0,
+        "updated": 0,
+        "unchanged": 0,
+        "failed_rows": 0,
+        "rows_per_sec": None,
+        "errors": [],
+        "detail": None,
+    }
+    write_state(job)
+    (job_dir / f"{job_id}.queued").touch()
+
+    if getattr(settings, "IMPORT_JOB_WORKERS", 0) > 0:
+        start_workers()
+        _wake.set()
+    return job
+
+
+def discard(job_dir, job_id, job, marker, handle):
+    """Hapus file upload (spool) + marker job, lalu lepas lock-nya."""
+    try:
+        names = [job["file"]] if job else [f"{job_id}.csv", f"{job_id}.xlsx"]
+        for name in names:
+            (job_dir / name).unlink(missing_ok=True)
+        marker.unlink(missing_ok=True)
+    finally:
+        handle.close()
+
+
+def reap(job_dir):
+    """Job `.running` yang lock-nya bebas (workernya sudah mati, di node mana pun) → failed."""
+    for marker in job_dir.glob("*.running"):
+        handle = lock_file(marker)
+        if handle is None:
+            continue  # masih dikerjakan, atau keduluan worker lain
+        job = get_job(marker.stem)
+        try:
+            if job:
+                job.update(state="failed", finished_at=timezone.now().isoformat(),
+                           detail="Worker died while processing, rows up to the last finished chunk were saved.")
+                write_state(job)
+        finally:
+            discard(job_dir, marker.stem, job, marker, handle)
+        logger.warning("Import job %s abandoned by a dead worker", marker.stem)
+
+
+def claim_next():
+    """(job id, marker, handle pemegang lock) atau None kalau antrian kosong."""
+    job_dir = get_job_dir()
+    reap(job_dir)
+    for marker in sorted(job_dir.glob("*.queued"), key=lambda p: p.stat().st_mtime if p.exists() else 0):
+        # lock dulu baru rename, biar reaper tidak sempat lihat `.running` tanpa lock
+        handle = lock_file(marker)
+        if handle is None:
+            continue
+        target = marker.with_suffix(".running")
+        try:
+            marker.rename(target)
+        except FileNotFoundError:
+            handle.close()
+            continue
+        return marker.stem, target, handle
+    return None
+
+
+def process(job_id, marker, handle):
+    job = get_job(job_id)
+    if job is None:
+        # file state hilang: tidak ada yang bisa dikerjakan / dilaporkan
+        logger.warning("Import job %s has no state file, dropped", job_id)
+        discard(get_job_dir(), job_id, None, marker, handle)
+        return
+    upload = get_job_dir() / job["file"]
+    started = monotonic()
+    job.update(state="running", started_at=timezone.now().isoformat())
+    write_state(job)
+
+    def progress(report, changes):
+        for method, payload in changes:
+            audit.enqueue(user_id=job["created_by"], path=job["path"], method=method, payload=payload)
+        done = report["inserted"] + report["updated"] + report["unchanged"]
+        elapsed = monotonic() - started
+        job.update(
+            rows=done + report["failed_rows"],
+            inserted=report["inserted"],
+            updated=report["updated"],
+            unchanged=report["unchanged"],
+            failed_rows=report["failed_rows"],
+            rows_per_sec=round((done + report["failed_rows"]) / elapsed, 1) if elapsed else None,
+            errors=[c for c in report["chunks"] if c["status"] == "failed"][:MAX_ERRORS],
+        )
+        write_state(job)
+
+    try:
+        with open(upload, "rb") as f:
+            run_chunked(
+                apps.get_model(job["resource"]),
+                iter_upload(f, job["chunk_size"]),
+                progress=progress,
+                user_id=job["created_by"],
+                upsert_keys=job["upsert_keys"],
+                chunk_size=job["chunk_size"],
+            )
+        job["state"] = "done" if not job["failed_rows"] else ("partial" if job["rows"] > job["failed_rows"] else "failed")
+    except Exception as e:
+        logger.exception("Import job %s failed", job_id)
+        job.update(state="failed", detail=str(e))
+    finally:
+        job["finished_at"] = timezone.now().isoformat()
+        write_state(job)
+        discard(upload.parent, job_id, job, marker, handle)
+
+
+def run_pending():
+    """Kerjakan job di antrian sampai kosong. Return jumlah job."""
+    processed = 0
+    while True:
+        claimed = claim_next()
+        if claimed is None:
+            return processed
+        try:
+            process(*claimed)
+        finally:
+            for alias in connections:
+                connections[alias].close_if_unusable_or_obsolete()
+        processed += 1
+
+
+def purge(days=None):
+    """Hapus state job yang sudah selesai lebih dari IMPORT_JOB_TTL_DAYS."""
+    days = getattr(settings, "IMPORT_JOB_TTL_DAYS", 7) if days is None else days
+    cutoff = timezone.now() - datetime.timedelta(days=days)
+    removed = 0
+    for state in get_job_dir().glob("*.json"):
+        job = get_job(state.stem)
+        if job and job["finished_at"] and datetime.datetime.fromisoformat(job["finished_at"]) < cutoff:
+            state.unlink(missing_ok=True)
+            removed += 1
+    return removed
+
+
+def run_worker():
+    interval = getattr(settings, "IMPORT_JOB_POLL", 5)
+    while True:
+        _wake.wait(interval)
+        _wake.clear()
+        try:
+            run_pending()
+        except Exception:
+            logger.exception("Import job worker error")
+
+
+def start_workers():
+    pid = os.getpid()
+    if _state["pid"] == pid and _state["workers"]:
+        return
+    with _lock:
+        if _state["pid"] != pid:
+            _state.update(pid=pid, workers=[])  # thread tidak ikut ke child habis fork
+        if not _state["workers"]:
+            for i in range(getattr(settings, "IMPORT_JOB_WORKERS", 0)):
+                worker = threading.Thread(target=run_worker, name=f"import-job-{i}", daemon=True)
+                worker.start()
+                _state["workers"].append(worker)
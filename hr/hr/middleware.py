@@ -2,21 +2,101 @@ from django.contrib.auth import get_user_model
 from django.shortcuts import redirect
 import requests, jwt, threading
 from .thread_locals import *
+from . import http_client
 from django.http import JsonResponse
 from django.utils.deprecation import MiddlewareMixin
 from .local_settings import *
 from pathlib import Path
 from django.core.cache import cache
+from django.conf import settings
+from django.db import connections
+from django.urls import resolve, Resolver404
+from contextlib import ExitStack
+from random import random
+from . import timing
+from .query_profile import Profile
 from prometheus_client import Counter, Histogram
 from time import time
 
 # Thread-local storage untuk simpan user_id
 _thread_locals = threading.local()
     
-REQUEST_COUNT = Counter('request_count', 'Total request count', ['method', 'endpoint'])
+REQUEST_COUNT = Counter('request_count', 'Total request count', ['method', 'endpoint', 'status'])
 REQUEST_DURATION = Histogram('request_duration_seconds', 'Request duration in seconds', ['method', 'endpoint'])
+
+# label endpoint = nama route, bukan path mentah (lihat metric_endpoint)
+METRIC_METHODS = {"GET", "POST", "PUT", "PATCH", "DELETE", "HEAD", "OPTIONS"}
+UNMATCHED_ENDPOINT = "<unmatched>"
+OVERFLOW_ENDPOINT = "<other>"
+_metric_endpoints = set()
+_metric_endpoints_lock = threading.Lock()
 PUBLIC_KEY = Path(BASE_DIR, 'keys/public.pem').read_text()
 
+JWT_ALGORITHMS = ["RS256"]
+JWT_CACHE_MAX = 10000
+
+# token → (claims, exp), disimpan di memory proses sampai exp
+_jwt_claims = {}
+
+def verify_bearer_token(token):
+    """
+    Verify JWT lokal pakai keys/public.pem, tanpa nembak Auth Service.
+    Claims yang valid di-cache di memory sampai `exp`.
+    Raise jwt.InvalidTokenError kalau token tidak valid / expired.
+    """
+    now = time()
+    hit = _jwt_claims.get(token)
+    if hit and hit[1] > now:
+        return hit[0]
+
+    claims = jwt.decode(token, PUBLIC_KEY, algorithms=JWT_ALGORITHMS, options={"require": ["exp"]})
+
+    if len(_jwt_claims) >= JWT_CACHE_MAX:
+        for key, (_, exp) in list(_jwt_claims.items()):
+            if exp <= now:
+                _jwt_claims.pop(key, None)
+        if len(_jwt_claims) >= JWT_CACHE_MAX:
+            _jwt_claims.clear()
+
+    _jwt_claims[token] = (claims, claims["exp"])
+    return claims
+
+def claim_user_id(claims):
+    """user_id (atau sub) dari claims sebagai int, None kalau tidak ada / bukan angka."""
+    value = claims.get("user_id", claims.get("sub"))
+    if isinstance(value, bool) or not str(value).isdigit():
+        return None
+    return int(value) or None
+
+def authenticate_bearer(request, token):
+    """
+    Bearer JWT: verify lokal, tidak perlu network / Redis. Return JsonResponse
+    401 kalau ditolak, None kalau lolos.
+    JWT client tidak diteruskan ke service lain, internal_token untuk call
+    service-to-service pakai AUTH_INTERNAL_TOKEN.
+    """
+    try:
+        claims = verify_bearer_token(token)
+    except jwt.InvalidTokenError:
+        return JsonResponse({"detail": "Invalid token"}, status=401)
+
+    user_id = claim_user_id(claims)
+    if user_id is None:
+        return JsonResponse({"detail": "Token has no user id"}, status=401)
+
+    request.user_id = user_id
+    request.internal_token = getattr(settings, "AUTH_INTERNAL_TOKEN", None)
+    set_current_user_id(user_id)
+    return None
+
+def get_bearer_jwt(auth_header):
+    """Ambil token dari 'Bearer <jwt>', None kalau bukan JWT (opaque token)."""
+    scheme, _, token = auth_header.partition(" ")
+    token = token.strip()
+    if scheme.lower() != "bearer" or token.count(".") != 2:
+        return None
+    return token
+
 class VerifyAuthMiddleware(MiddlewareMixin):
     if not DEBUG_:
         def process_request(self, request):
@@ -24,6 +104,13 @@ class VerifyAuthMiddleware(MiddlewareMixin):
                 return None
 
             auth_header = request.headers.get("Authorization", "")
+
+            # Bearer JWT: verify lokal, tidak perlu network / Redis
+            token = get_bearer_jwt(auth_header)
+            if token:
+                return authenticate_bearer(request, token)
+
+            # Opaque session cookie: tetap verify ke Auth Service
             sessionid = request.COOKIES.get("sessionid")
 
             # fallback parse dari header Cookie
@@ -42,7 +129,7 @@ class VerifyAuthMiddleware(MiddlewareMixin):
                     return None
 
                 try:
-                    resp = requests.post(
+                    resp = http_client.post(
                         f"{AUTH_SERVICE}/api/auth/verify-session/",
                         cookies={"sessionid": sessionid},
                         timeout=10
@@ -66,7 +153,7 @@ User = get_user_model()
 class AuthServiceBackend:
     def authenticate(self, request, username=None, password=None):
         try:
-            login_res = requests.post(
+            login_res = http_client.post(
                 f"{AUTH_SERVICE}/api/auth/login/",
                 data={"username": username, "password": password},
                 timeout=5
@@ -116,7 +203,7 @@ class AuthServiceLogoutMiddleware:
 
             if token:
                 try:
-                    requests.post(
+                    http_client.post(
                         f"{AUTH_SERVICE}/api/auth/logout/",
                         headers={
                             'Authorization': f"Token {token}",
@@ -134,6 +221,29 @@ class AuthServiceLogoutMiddleware:
 
         return self.get_response(request)
 
+def metric_endpoint(request):
+    """
+    Label endpoint dari URL pattern yang match (view_name, mis. employee-detail),
+    jadi /employee/1/ dan /employee/2/ satu series. Path yang tidak match satu
+    bucket, dan jumlah endpoint dibatasi PROMETHEUS_MAX_ENDPOINTS.
+    """
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        # request yang berhenti di middleware (401, dll) belum di-resolve
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return UNMATCHED_ENDPOINT
+
+    endpoint = match.view_name or match.route
+    if endpoint in _metric_endpoints:
+        return endpoint
+    with _metric_endpoints_lock:
+        if len(_metric_endpoints) >= getattr(settings, "PROMETHEUS_MAX_ENDPOINTS", 300):
+            return OVERFLOW_ENDPOINT
+        _metric_endpoints.add(endpoint)
+    return endpoint
+
 class PrometheusMiddleware:
     def __init__(self, get_response):
         self.get_response = get_response
@@ -141,12 +251,48 @@ class PrometheusMiddleware:
     def __call__(self, request):
         # Start timing the request
         start_time = time()
+        timing.start()
 
-        # Process the request
-        response = self.get_response(request)
+        # Process the request, semua query DB ikut dihitung (lihat hr/timing.py)
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(timing.db_wrapper))
+                response = self.get_response(request)
+        finally:
+            timings = timing.stop()
+        duration = time() - start_time
 
         # Record metrics
-        REQUEST_COUNT.labels(method=request.method, endpoint=request.path).inc()
-        REQUEST_DURATION.labels(method=request.method, endpoint=request.path).observe(time() - start_time)
+        method = request.method if request.method in METRIC_METHODS else "OTHER"
+        endpoint = metric_endpoint(request)
+        REQUEST_COUNT.labels(method=method, endpoint=endpoint, status=str(response.status_code)).inc()
+        REQUEST_DURATION.labels(method=method, endpoint=endpoint).observe(duration)
+        timing.observe(endpoint, timings, duration)
+
+        if getattr(settings, "SERVER_TIMING", False):
+            response["Server-Timing"] = timing.server_timing(timings, duration)
+
+        return response
+
+class QueryProfileMiddleware:
+    """
+    Sampling SQL profiler (hr/query_profile.py): N+1 & slow query per route.
+    Request yang tidak ke-sample cuma bayar satu random().
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        rate = getattr(settings, "QUERY_PROFILE_SAMPLE_RATE", 0)
+        if not rate or random() >= rate:
+            return self.get_response(request)
+
+        profile = Profile()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(profile))
+            response = self.get_response(request)
 
-        return response
\ No newline at end of file
+        profile.report(metric_endpoint(request), request)
+        return response
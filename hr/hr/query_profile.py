@@ -0,0 +1,122 @@
+"""
+Sampled SQL profiler buat QueryProfileMiddleware.
+
+- Cuma QUERY_PROFILE_SAMPLE_RATE bagian request yang di-profile, sisanya cuma
+  satu random() (tidak ada wrapper / overhead lain)
+- Request yang di-sample: semua statement dicatat per fingerprint (literal,
+  placeholder, IN list → ?), jadi query yang sama beda id ketahuan berulang
+- Fingerprint yang jalan >= QUERY_PROFILE_N1_THRESHOLD kali = N+1,
+  statement >= QUERY_PROFILE_SLOW_MS = slow
+- Yang ketemu ditulis satu baris JSON per request ke QUERY_PROFILE_LOG
+  (rotating), diurut dari total waktu terbesar, plus counter Prometheus
+"""
+from django.conf import settings
+from prometheus_client import Counter
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+from time import perf_counter
+
+import re
+import json
+import logging
+import threading
+
+PROFILED_REQUESTS = Counter('query_profile_requests', 'Requests sampled by the query profiler', ['endpoint'])
+N_PLUS_ONE = Counter('query_n_plus_one', 'Repeated statements (N+1) found in sampled requests', ['endpoint'])
+SLOW_QUERIES = Counter('query_slow', 'Slow statements found in sampled requests', ['endpoint'])
+
+FINGERPRINT_RULES = [
+    (re.compile(r"'(?:[^']|'')*'"), "?"),                                  # string literal
+    (re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b"), "?"),                     # angka
+    (re.compile(r"%s"), "?"),                                              # placeholder
+    (re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)"), "(...)"),                  # IN (?, ?, ?)
+    (re.compile(r"\s+"), " "),
+]
+
+_logger = {"path": None, "logger": None}
+_lock = threading.Lock()
+
+
+def fingerprint(sql):
+    for pattern, replacement in FINGERPRINT_RULES:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+def get_logger():
+    path = Path(getattr(settings, "QUERY_PROFILE_LOG", Path(settings.BASE_DIR, "logs", "query_profile.log")))
+    if _logger["path"] != path:
+        with _lock:
+            if _logger["path"] != path:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                logger = logging.getLogger("hr.query_profile")
+                logger.propagate = False
+                logger.setLevel(logging.INFO)
+                for handler in logger.handlers[:]:
+                    logger.removeHandler(handler)
+                    handler.close()
+                logger.addHandler(RotatingFileHandler(
+                    path, maxBytes=getattr(settings, "QUERY_PROFILE_LOG_BYTES", 10 * 1024 * 1024),
+                    backupCount=getattr(settings, "QUERY_PROFILE_LOG_BACKUPS", 5), encoding="utf-8",
+                ))
+                _logger.update(path=path, logger=logger)
+    return _logger["logger"]
+
+
+class Profile:
+    """execute_wrapper: statement dikumpulin per fingerprint, bukan disimpan semua."""
+    def __init__(self):
+        self.statements = {}  # fingerprint → [count, seconds, contoh sql]
+        self.slow = []
+        self.slow_seconds = getattr(settings, "QUERY_PROFILE_SLOW_MS", 200) / 1000
+
+    def __call__(self, execute, sql, params, many, context):
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            seconds = perf_counter() - started
+            key = fingerprint(sql)
+            entry = self.statements.get(key)
+            if entry is None:
+                self.statements[key] = [1, seconds, sql]
+            else:
+                entry[0] += 1
+                entry[1] += seconds
+            if seconds >= self.slow_seconds:
+                self.slow.append((seconds, context["connection"].alias, sql))
+
+    def report(self, endpoint, request):
+        """Update counter + tulis log kalau ada N+1 / slow. Return entry log-nya (atau None)."""
+        PROFILED_REQUESTS.labels(endpoint=endpoint).inc()
+
+        threshold = getattr(settings, "QUERY_PROFILE_N1_THRESHOLD", 5)
+        top = getattr(settings, "QUERY_PROFILE_TOP", 5)
+        repeated = sorted(
+            (entry for entry in self.statements.items() if entry[1][0] >= threshold),
+            key=lambda entry: entry[1][1], reverse=True,
+        )
+        if repeated:
+            N_PLUS_ONE.labels(endpoint=endpoint).inc(len(repeated))
+        if self.slow:
+            SLOW_QUERIES.labels(endpoint=endpoint).inc(len(self.slow))
+        if not repeated and not self.slow:
+            return None
+
+        entry = {
+            "endpoint": endpoint,
+            "method": request.method,
+            "path": request.path,
+            "queries": sum(count for count, _, _ in self.statements.values()),
+            "db_ms": round(sum(seconds for _, seconds, _ in self.statements.values()) * 1000, 1),
+            "n_plus_one": [
+                {"count": count, "ms": round(seconds * 1000, 1), "fingerprint": key, "sample": sql}
+                for key, (count, seconds, sql) in repeated[:top]
+            ],
+            "slow": [
+                {"ms": round(seconds * 1000, 1), "db": alias, "sql": sql}
+                for seconds, alias, sql in sorted(self.slow, key=lambda s: s[0], reverse=True)[:top]
+            ],
+        }
+        get_logger().info(json.dumps(entry))
+        return entry
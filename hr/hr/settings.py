@@ -85,6 +85,8 @@ SPECTACULAR_EXTRAS_SETTINGS = {
 }
 
 MIDDLEWARE = [
+    'hr.middleware.PrometheusMiddleware',  # paling luar: durasi & timing termasuk auth
+    'hr.middleware.QueryProfileMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -94,7 +96,6 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'hr.middleware.VerifyAuthMiddleware',
     'hr.middleware.AuthServiceLogoutMiddleware',
-    'hr.middleware.PrometheusMiddleware',
 ]
 
 API_SERVICE_URL = AUTH_SERVICE
@@ -178,9 +179,46 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 CSRF_TRUSTED_ORIGINS = CSRF_SERVICE
 
+# Outbound HTTP (Auth / Finance Service), lihat hr/http_client.py
+HTTP_POOL_SIZE = int(os.environ.get("HTTP_POOL_SIZE", 10))
+HTTP_POOL_CONNECTIONS = int(os.environ.get("HTTP_POOL_CONNECTIONS", 4))
+HTTP_RETRIES = int(os.environ.get("HTTP_RETRIES", 2))
+HTTP_BACKOFF = float(os.environ.get("HTTP_BACKOFF", 0.2))
+HTTP_CIRCUIT_FAILURES = int(os.environ.get("HTTP_CIRCUIT_FAILURES", 5))
+HTTP_CIRCUIT_RESET = int(os.environ.get("HTTP_CIRCUIT_RESET", 30))
+
+# Token service-to-service ke Auth (request dengan bearer JWT tidak punya internal_token dari Auth)
+AUTH_INTERNAL_TOKEN = os.environ.get("AUTH_INTERNAL_TOKEN") or None
+
+# Write-behind audit trail ke hr_dump, lihat hr/audit.py
+AUDIT_SPOOL_DIR = os.environ.get("AUDIT_SPOOL_DIR", os.path.join(BASE_DIR, "spool", "audit"))
+AUDIT_BATCH_SIZE = int(os.environ.get("AUDIT_BATCH_SIZE", 500))
+AUDIT_FLUSH_INTERVAL = float(os.environ.get("AUDIT_FLUSH_INTERVAL", 2))
+AUDIT_FSYNC = os.environ.get("AUDIT_FSYNC", "0") in ("1", "true", "True")
+
+# Bulk import async (insert-bulk?async=true), lihat hr/import_jobs.py
+# Job dikerjakan proses terpisah (manage.py run_import_jobs, plus cron), bukan worker web.
+# IMPORT_JOB_WORKERS > 0 cuma buat dev: thread di proses web yang nerima upload
+IMPORT_JOB_DIR = os.environ.get("IMPORT_JOB_DIR", os.path.join(BASE_DIR, "spool", "jobs"))
+IMPORT_JOB_WORKERS = int(os.environ.get("IMPORT_JOB_WORKERS", 0))
+IMPORT_JOB_POLL = float(os.environ.get("IMPORT_JOB_POLL", 5))
+IMPORT_JOB_TTL_DAYS = int(os.environ.get("IMPORT_JOB_TTL_DAYS", 7))
+
+# Batas jumlah label endpoint di metric request_*, sisanya masuk "<other>"
+PROMETHEUS_MAX_ENDPOINTS = int(os.environ.get("PROMETHEUS_MAX_ENDPOINTS", 300))
+
+# Header Server-Timing (db / cache / http / app per request) buat debugging, lihat hr/timing.py
+SERVER_TIMING = os.environ.get("SERVER_TIMING", "0") in ("1", "true", "True")
+
+# Sampling N+1 / slow query detector, lihat hr/query_profile.py
+QUERY_PROFILE_SAMPLE_RATE = float(os.environ.get("QUERY_PROFILE_SAMPLE_RATE", 0.01))
+QUERY_PROFILE_N1_THRESHOLD = int(os.environ.get("QUERY_PROFILE_N1_THRESHOLD", 5))
+QUERY_PROFILE_SLOW_MS = float(os.environ.get("QUERY_PROFILE_SLOW_MS", 200))
+QUERY_PROFILE_LOG = os.environ.get("QUERY_PROFILE_LOG", os.path.join(BASE_DIR, "logs", "query_profile.log"))
+
 CACHES = {
     "default": {
-        "BACKEND": "django_redis.cache.RedisCache",
+        "BACKEND": "hr.timing.TimedRedisCache",  # RedisCache + timing per request
         "LOCATION": "redis://127.0.0.1:6379/1",
         "OPTIONS": {
             "CLIENT_CLASS": "django_redis.client.DefaultClient",
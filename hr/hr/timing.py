@@ -0,0 +1,116 @@
+"""
+Breakdown waktu per request: db / cache / http / app (sisanya: view,
+serializer, render).
+
+- DB: execute_wrapper di semua alias (hr_master, hr_dump, default), dipasang
+  PrometheusMiddleware selama request → jumlah query + waktu
+- Cache: backend TimedRedisCache (settings.CACHES), tiap call cache dihitung
+- HTTP: hr/http_client.request (Auth / Finance Service)
+- Export ke Prometheus per endpoint (label sama dengan request_count), plus
+  header Server-Timing kalau SERVER_TIMING=True
+- Di luar request (worker audit / import job) semua jadi no-op
+"""
+from django.core.cache.backends.locmem import LocMemCache
+from django_redis.cache import RedisCache
+from prometheus_client import Histogram
+from contextlib import contextmanager
+from time import perf_counter
+
+import threading
+
+PHASES = ("db", "cache", "http")
+
+PHASE_SECONDS = Histogram(
+    'request_phase_seconds', 'Time spent per phase (db, cache, http, app) in a request', ['endpoint', 'phase']
+)
+DB_QUERIES = Histogram(
+    'request_db_queries', 'DB queries per request', ['endpoint'],
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200, 500, float("inf")),
+)
+
+_local = threading.local()
+
+
+def start():
+    _local.timings = {phase: [0, 0.0] for phase in PHASES}
+    _local.active = None
+
+
+def stop():
+    timings = getattr(_local, "timings", None)
+    _local.timings = None
+    return timings
+
+
+@contextmanager
+def track(phase):
+    """Catat durasi blok ini ke phase. Call nested (get_many → get) cuma dihitung sekali."""
+    timings = getattr(_local, "timings", None)
+    if timings is None or _local.active is not None:
+        yield
+        return
+
+    _local.active = phase
+    started = perf_counter()
+    try:
+        yield
+    finally:
+        timings[phase][0] += 1
+        timings[phase][1] += perf_counter() - started
+        _local.active = None
+
+
+def db_wrapper(execute, sql, params, many, context):
+    with track("db"):
+        return execute(sql, params, many, context)
+
+
+def observe(endpoint, timings, total):
+    spent = 0.0
+    for phase in PHASES:
+        spent += timings[phase][1]
+        PHASE_SECONDS.labels(endpoint=endpoint, phase=phase).observe(timings[phase][1])
+    PHASE_SECONDS.labels(endpoint=endpoint, phase="app").observe(max(total - spent, 0.0))
+    DB_QUERIES.labels(endpoint=endpoint).observe(timings["db"][0])
+
+
+def server_timing(timings, total):
+    """db;dur=12.3;desc="5 calls", ..., total;dur=40.1 (ms)."""
+    parts = [
+        f'{phase};dur={seconds * 1000:.1f};desc="{count} calls"'
+        for phase, (count, seconds) in timings.items()
+    ]
+    app = total - sum(seconds for _, seconds in timings.values())
+    parts.append(f"app;dur={max(app, 0.0) * 1000:.1f}")
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+CACHE_METHODS = (
+    "get", "set", "add", "delete", "touch", "has_key", "incr", "decr",
+    "get_many", "set_many", "delete_many", "clear",
+)
+
+
+class TimedCacheMixin:
+    """Semua call cache (user:*, count:*, gen:*, auth:session:*) masuk phase cache."""
+
+
+def timed(name):
+    def method(self, *args, **kwargs):
+        with track("cache"):
+            return getattr(super(TimedCacheMixin, self), name)(*args, **kwargs)
+    method.__name__ = name
+    return method
+
+
+for _name in CACHE_METHODS:
+    setattr(TimedCacheMixin, _name, timed(_name))
+
+
+class TimedRedisCache(TimedCacheMixin, RedisCache):
+    pass
+
+
+class TimedLocMemCache(TimedCacheMixin, LocMemCache):
+    pass
@@ -20,7 +20,8 @@ from rest_framework.routers import DefaultRouter
 from hr_master.views import *
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
 from drf_spectacular_extras.views import SpectacularScalarView
-from hr_dump.views import metrics_view
+from hr_dump.views import metrics_view, AuditViewSet
+from hr.config import ImportJobViewSet
 
 router = DefaultRouter()
 
@@ -34,6 +35,12 @@ router.register(r'master/shift', ShiftViewSet)
 router.register(r'master/branch', BranchViewSet)
 router.register(r'master/employee', EmployeeViewSet)
 
+# HR_DUMP
+router.register(r'audit', AuditViewSet)
+
+# BULK IMPORT JOBS
+router.register(r'jobs', ImportJobViewSet, basename='jobs')
+
 # HR_TRANSACTION
 
 urlpatterns = [
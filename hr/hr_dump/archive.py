@@ -0,0 +1,156 @@
+"""
+Archive kolumnar HRDump (tanpa pyarrow, cukup numpy + pandas).
+
+Layout, dipartisi per bulan (hive style):
+
+    dumps/archive/year=2025/month=10/part-00000.npz
+                                     part-00001.npz
+
+Tiap part = satu chunk dump_data, disimpan pakai np.savez_compressed. Tiap kolom
+jadi member zip sendiri yang di-compress terpisah, dan np.load cuma baca member
+yang diakses. Jadi filter user_id/path/method tidak ikut decompress payload.
+
+Kolom:
+- id, user_id       int64
+- created_at        datetime64[us] (UTC)
+- path, method      dictionary encoded: `<col>_dict` (unik) + `<col>_codes` (int32)
+- payload           JSON utf-8 digabung di `payload_data` + `payload_offsets`
+"""
+from django.conf import settings
+
+from pathlib import Path
+
+import os
+import json
+import numpy as np
+import pandas as pd
+
+COLUMNS = ("id", "user_id", "path", "method", "payload", "created_at")
+DICT_COLUMNS = ("path", "method")
+
+
+def get_archive_dir():
+    return Path(getattr(settings, "DUMP_DIR", Path(settings.BASE_DIR) / "dumps")) / "archive"
+
+
+def partition_dir(root, year, month):
+    return Path(root) / f"year={int(year)}" / f"month={int(month):02d}"
+
+
+def encode_part(rows):
+    arrays = {
+        "id": np.array([row["id"] for row in rows], dtype=np.int64),
+        "user_id": np.array([row["user_id"] for row in rows], dtype=np.int64),
+        "created_at": pd.to_datetime([row["created_at"] for row in rows], utc=True)
+                        .tz_localize(None).values.astype("datetime64[us]"),
+    }
+
+    for column in DICT_COLUMNS:
+        uniques, codes = np.unique(np.array([row[column] for row in rows], dtype=str), return_inverse=True)
+        arrays[f"{column}_dict"] = uniques
+        arrays[f"{column}_codes"] = codes.astype(np.int32)
+
+    blobs = [json.dumps(row["payload"], ensure_ascii=False).encode("utf-8") for row in rows]
+    arrays["payload_offsets"] = np.concatenate(([0], np.cumsum([len(b) for b in blobs]))).astype(np.int64)
+    arrays["payload_data"] = np.frombuffer(b"".join(blobs), dtype=np.uint8)
+    return arrays
+
+
+class ColumnarWriter:
+    """
+    Interface sama dengan DumpWriter (write / sync / close): row di-buffer,
+    sync() nulis buffer jadi satu part file (tmp → fsync → rename).
+    """
+    def __init__(self, root, year, month):
+        self.path = partition_dir(root, year, month)
+        self.path.mkdir(parents=True, exist_ok=True)
+        # lanjut dari part terakhir, dump ulang bulan yang sama tidak nimpa
+        self.seq = len(list(self.path.glob("part-*.npz")))
+        self.rows = []
+
+    def write(self, row):
+        self.rows.append(row)
+
+    def sync(self):
+        if not self.rows:
+            return
+        target = self.path / f"part-{self.seq:05d}.npz"
+        tmp = target.with_suffix(".tmp")
+        with open(tmp, "wb") as f:
+            np.savez_compressed(f, **encode_part(self.rows))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, target)
+        self.seq += 1
+        self.rows = []
+
+    def close(self):
+        self.sync()
+
+
+def iter_parts(root=None, year=None, month=None):
+    root = Path(root or get_archive_dir())
+    year_glob = f"year={int(year)}" if year else "year=*"
+    month_glob = f"month={int(month):02d}" if month else "month=*"
+    return sorted(root.glob(f"{year_glob}/{month_glob}/part-*.npz"))
+
+
+def match_dict(part, column, value):
+    """Mask dari kolom dictionary, None kalau value tidak ada sama sekali di part ini."""
+    uniques = part[f"{column}_dict"]
+    hit = np.nonzero(uniques == value)[0]
+    if not len(hit):
+        return None
+    return part[f"{column}_codes"] == hit[0]
+
+
+def read_archive(root=None, year=None, month=None, user_id=None, path=None, method=None, columns=COLUMNS):
+    """
+    Baca archive jadi DataFrame. Filter dicek dulu (user_id / path / method),
+    kolom lain (terutama payload) cuma di-decompress buat part yang ada hasilnya.
+    """
+    frames = []
+    for part_file in iter_parts(root, year, month):
+        with np.load(part_file) as part:
+            mask = None
+            skip = False
+            for column, value in (("path", path), ("method", method)):
+                if value is None:
+                    continue
+                column_mask = match_dict(part, column, value)
+                if column_mask is None:
+                    skip = True
+                    break
+                mask = column_mask if mask is None else mask & column_mask
+            if skip:
+                continue
+
+            if user_id is not None:
+                column_mask = part["user_id"] == int(user_id)
+                mask = column_mask if mask is None else mask & column_mask
+
+            index = np.nonzero(mask)[0] if mask is not None else None
+            if index is not None and not len(index):
+                continue
+
+            data = {}
+            for column in columns:
+                if column in DICT_COLUMNS:
+                    codes = part[f"{column}_codes"]
+                    values = part[f"{column}_dict"][codes if index is None else codes[index]]
+                elif column == "payload":
+                    offsets = part["payload_offsets"]
+                    blob = part["payload_data"].tobytes()
+                    rows = range(len(offsets) - 1) if index is None else index
+                    values = [json.loads(blob[offsets[i]:offsets[i + 1]]) for i in rows]
+                else:
+                    values = part[column] if index is None else part[column][index]
+                data[column] = values
+            frames.append(pd.DataFrame(data, columns=list(columns)))
+
+    if not frames:
+        return pd.DataFrame(columns=list(columns))
+    frame = pd.concat(frames, ignore_index=True)
+    if "created_at" in frame:
+        frame["created_at"] = pd.to_datetime(frame["created_at"]).dt.tz_localize("UTC")
+    return frame
@@ -0,0 +1,59 @@
+import django_filters
+from django.db.models import Q
+from .models import *
+from hr.config import *
+
+MASTER_PREFIX = '/api/hr/master/'
+
+
+def resource_path(value):
+    """`employee` → `/api/hr/master/employee/`, path lengkap dibiarkan."""
+    value = value.strip()
+    if not value.startswith('/'):
+        value = f"{MASTER_PREFIX}{value.strip('/')}/"
+    return value if value.endswith('/') else f"{value}/"
+
+
+class HRDumpFilter(FilterSet) :
+    """
+    Semua filter di sini kena index (user_id, created_at) / (path, created_at) / (created_at),
+    kecuali object_id tanpa resource.
+    """
+    user_id = django_filters.NumberFilter(field_name='user_id', lookup_expr='exact')
+    method = django_filters.CharFilter(method='filter_method')
+    path = django_filters.CharFilter(field_name='path', lookup_expr='exact')
+    resource = django_filters.CharFilter(method='filter_resource')
+    object_id = django_filters.NumberFilter(method='filter_object_id')
+
+    created_at__gte = django_filters.IsoDateTimeFilter(field_name='created_at', lookup_expr='gte')
+    created_at__lte = django_filters.IsoDateTimeFilter(field_name='created_at', lookup_expr='lte')
+
+    class Meta:
+        model = HRDump
+        fields = []
+
+    def filter_method(self, queryset, name, value):
+        return queryset.filter(method=value.upper())
+
+    def filter_resource(self, queryset, name, value):
+        return queryset.filter(path__startswith=resource_path(value))
+
+    def filter_object_id(self, queryset, name, value):
+        """
+        Semua perubahan satu object: update/delete/restore ada id-nya di path,
+        create cuma ada di payload (path-nya list endpoint).
+        """
+        value = int(value)
+        resource = self.data.get('resource')
+        if resource:
+            prefix = resource_path(resource)
+            return queryset.filter(
+                Q(path__startswith=f"{prefix}{value}/")
+                | Q(path=prefix, method='POST', payload__id=value)
+            )
+        # tanpa resource tidak bisa pakai index path, full scan
+        return queryset.filter(
+            Q(path__endswith=f"/{value}/")
+            | Q(path__endswith=f"/{value}/restore/")
+            | Q(method='POST', payload__id=value)
+        )
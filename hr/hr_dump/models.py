@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 
 # Create your models here.
 class HRDump(models.Model):
@@ -6,7 +7,14 @@ class HRDump(models.Model):
     path = models.CharField(max_length=255)
     method = models.CharField(max_length=12)
     payload = models.JSONField()
-    created_at = models.DateTimeField(auto_now_add=True)
+    # diisi waktu enqueue (hr/audit.py), bukan waktu flush
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
 
     class Meta:
-        db_table = 'hr_dump'
\ No newline at end of file
+        db_table = 'hr_dump'
+        # di MySQL tabel ini range-partitioned per bulan, lihat partition_hr_dump
+        indexes = [
+            models.Index(fields=['created_at']),
+            models.Index(fields=['user_id', 'created_at']),
+            models.Index(fields=['path', 'created_at']),
+        ]
\ No newline at end of file
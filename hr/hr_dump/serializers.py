@@ -0,0 +1,11 @@
+from hr_master.serializers import DynamicModelSerializer, UserField
+from .models import *
+
+
+class HRDumpSerializer(DynamicModelSerializer) :
+    # user_id di-resolve lewat users_map, sama kayak *_by di hr_master
+    user = UserField(source='user_id', read_only=True)
+
+    class Meta:
+        model = HRDump
+        fields = '__all__'
@@ -1,3 +1,399 @@
-from django.test import TestCase
+from django.core.cache import cache
+from django.core.management import call_command, CommandError
+from django.db import connections
+from django.test import TestCase, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse, NoReverseMatch
+from django.utils import timezone
 
-# Create your tests here.
+from datetime import datetime, timedelta
+from unittest import mock
+from io import StringIO
+from pathlib import Path
+
+from hr import middleware, query_profile
+from hr.core.management.commands.dump_data import Command as DumpData
+from hr.core.management.commands.partition_hr_dump import plan_partitions, closed_month
+from .archive import read_archive
+from .models import HRDump
+
+from prometheus_client import REGISTRY
+
+import os
+import sys
+import gzip
+import json
+import tempfile
+import subprocess
+
+LOCMEM_CACHE = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+class DumpDataTest(TestCase):
+    """dump_data: NDJSON per chunk, delete per batch PK, bulan lain tidak kesentuh."""
+    databases = {"default", "hr_dump"}
+
+    def setUp(self):
+        dumps = tempfile.TemporaryDirectory()
+        self.addCleanup(dumps.cleanup)
+        self.dumps_dir = dumps.name
+        override = override_settings(DUMP_DIR=dumps.name, AUDIT_SPOOL_DIR=dumps.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        now = timezone.now()
+        HRDump.objects.bulk_create(
+            [HRDump(user_id=i % 5, path=f"/api/hr/master/{'unit' if i % 2 else 'level'}/",
+                    method="POST" if i % 3 else "DELETE", payload={"i": i}, created_at=now)
+             for i in range(25)]
+            + [HRDump(user_id=0, path="/old/", method="POST", payload={}, created_at=now - timedelta(days=40))
+               for _ in range(3)]
+        )
+
+    def test_streams_month_and_deletes_in_batches(self):
+        with CaptureQueriesContext(connections["hr_dump"]) as queries:
+            filepath = DumpData.run_dump(compress="gzip", chunk_size=10, delete_batch=4)
+
+        with gzip.open(filepath, "rt", encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f]
+        self.assertEqual(sorted(row["payload"]["i"] for row in rows), list(range(25)))
+
+        self.assertEqual(HRDump.objects.count(), 3)
+        self.assertFalse(HRDump.objects.exclude(path="/old/").exists())
+
+        # 25 row, chunk 10 → 10/10/5, tiap chunk dihapus per 4 PK → 3 + 3 + 2
+        deletes = [q for q in queries if q["sql"].startswith("DELETE")]
+        self.assertEqual(len(deletes), 8)
+
+    def test_plain_ndjson(self):
+        filepath = DumpData.run_dump(compress="none", chunk_size=7)
+        self.assertTrue(filepath.name.endswith(".ndjson"))
+        with open(filepath, encoding="utf-8") as f:
+            self.assertEqual(sum(1 for _ in f), 25)
+
+    def test_second_dump_never_overwrites_first(self):
+        first = DumpData.run_dump(compress="gzip", chunk_size=10)
+        HRDump.objects.create(user_id=9, path="/x/", method="POST", payload={"i": 99})
+        second = DumpData.run_dump(compress="gzip", chunk_size=10)
+
+        self.assertNotEqual(first, second)
+        self.assertTrue(second.name.endswith(".1.ndjson.gz"))
+        with gzip.open(first, "rt", encoding="utf-8") as f:
+            self.assertEqual(sum(1 for _ in f), 25)
+        with gzip.open(second, "rt", encoding="utf-8") as f:
+            self.assertEqual([json.loads(line)["payload"]["i"] for line in f], [99])
+
+    def test_columnar_archive_round_trip(self):
+        now = timezone.now()
+        partition = DumpData.run_dump(fmt="columnar", chunk_size=10)
+        self.assertEqual(partition.name, f"month={now.month:02d}")
+        self.assertEqual(len(list(partition.glob("part-*.npz"))), 3)
+        self.assertEqual(HRDump.objects.count(), 3)
+
+        frame = read_archive(year=now.year, month=now.month)
+        self.assertEqual(sorted(p["i"] for p in frame["payload"]), list(range(25)))
+
+        frame = read_archive(user_id=2, path="/api/hr/master/unit/", method="POST")
+        expected = [i for i in range(25) if i % 5 == 2 and i % 2 and i % 3]
+        self.assertEqual(sorted(p["i"] for p in frame["payload"]), expected)
+        self.assertTrue((frame["path"] == "/api/hr/master/unit/").all())
+
+        out = StringIO()
+        call_command("read_archive", "--user-id", "2", "--columns", "id,path,payload", stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 5)
+
+        self.assertTrue(read_archive(path="/nope/").empty)
+        self.assertEqual(list(read_archive(method="DELETE", columns=("id",)).columns), ["id"])
+
+    def test_columnar_dump_appends_parts(self):
+        DumpData.run_dump(fmt="columnar", chunk_size=100)
+        HRDump.objects.create(user_id=9, path="/x/", method="POST", payload={"i": 99})
+        partition = DumpData.run_dump(fmt="columnar", chunk_size=100)
+
+        self.assertEqual(len(list(partition.glob("part-*.npz"))), 2)
+        self.assertEqual(len(read_archive(root=f"{self.dumps_dir}/archive")), 26)
+
+
+class PartitionPlanTest(TestCase):
+    """partition_hr_dump: SQL partisi bulanan (MySQL only)."""
+    databases = {"default", "hr_dump"}
+
+    def test_initial_partitioning_covers_history_and_ahead(self):
+        statements = plan_partitions([], datetime(2025, 8, 1), datetime(2025, 10, 18), ahead=2)
+        self.assertEqual(statements[0], "ALTER TABLE hr_dump DROP PRIMARY KEY, ADD PRIMARY KEY (id, created_at)")
+        self.assertEqual(
+            statements[1],
+            "ALTER TABLE hr_dump PARTITION BY RANGE COLUMNS(created_at) ("
+            "PARTITION p202508 VALUES LESS THAN ('2025-09-01'), "
+            "PARTITION p202509 VALUES LESS THAN ('2025-10-01'), "
+            "PARTITION p202510 VALUES LESS THAN ('2025-11-01'), "
+            "PARTITION p202511 VALUES LESS THAN ('2025-12-01'), "
+            "PARTITION p202512 VALUES LESS THAN ('2026-01-01'), "
+            "PARTITION p_future VALUES LESS THAN (MAXVALUE))"
+        )
+
+    def test_adds_only_missing_months(self):
+        existing = ["p202510", "p202511", "p_future"]
+        statements = plan_partitions(existing, datetime(2025, 10, 1), datetime(2025, 11, 3), ahead=2)
+        self.assertEqual(statements, [
+            "ALTER TABLE hr_dump REORGANIZE PARTITION p_future INTO ("
+            "PARTITION p202512 VALUES LESS THAN ('2026-01-01'), "
+            "PARTITION p202601 VALUES LESS THAN ('2026-02-01'), "
+            "PARTITION p_future VALUES LESS THAN (MAXVALUE))"
+        ])
+        self.assertEqual(plan_partitions(existing, datetime(2025, 10, 1), datetime(2025, 10, 3), ahead=1), [])
+
+    def test_closed_month(self):
+        self.assertEqual(closed_month(datetime(2025, 11, 1, 0, 5)), datetime(2025, 10, 1))
+        # cron jam 00:05 WIB = masih 31 Okt UTC, Oktober belum selesai
+        self.assertEqual(closed_month(datetime(2025, 10, 31, 17, 5)), datetime(2025, 9, 1))
+
+    def test_cron_archives_by_partition_on_mysql(self):
+        commands = "hr.core.management.commands"
+        clock = mock.Mock()
+        clock.datetime.now.return_value = datetime(2025, 11, 1, 0, 5)
+        with mock.patch(f"{commands}.cron.datetime", clock), \
+                mock.patch(f"{commands}.flush_audit.Command.run_flush"), \
+                mock.patch(f"{commands}.run_import_jobs.Command.run_once"), \
+                mock.patch(f"{commands}.partition_hr_dump.Command.ensure"), \
+                mock.patch(f"{commands}.partition_hr_dump.Command.archive_closed") as archive_closed, \
+                mock.patch(f"{commands}.dump_data.Command.run_dump") as run_dump:
+            with mock.patch.object(connections["hr_dump"], "vendor", "mysql"):
+                call_command("cron", stdout=StringIO())
+            archive_closed.assert_called_once()
+            run_dump.assert_not_called()
+
+            call_command("cron", stdout=StringIO())  # SQLite / tidak dipartisi
+            run_dump.assert_called_once()
+            archive_closed.assert_called_once()
+
+    def test_requires_mysql(self):
+        with self.assertRaises(CommandError):
+            call_command("partition_hr_dump", "--dry-run")
+
+
+def fake_auth_users(*args, **kwargs):
+    ids = [int(i) for i in kwargs["params"]["id__in"].split(",")]
+    resp = mock.Mock(status_code=200)
+    resp.json.return_value = [{"id": i, "username": f"user{i}"} for i in ids]
+    return resp
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class AuditApiTest(TestCase):
+    """/api/hr/audit/: read-only, filter user / resource / object / waktu."""
+    databases = {"default", "hr_dump"}
+    url = "/api/hr/audit/"
+
+    def setUp(self):
+        cache.clear()
+        now = timezone.now()
+        employee = "/api/hr/master/employee/"
+        HRDump.objects.bulk_create([
+            HRDump(user_id=1, path=employee, method="POST", payload={"id": 5}, created_at=now - timedelta(days=3)),
+            HRDump(user_id=2, path=f"{employee}5/", method="PATCH", payload={"before": {}, "after": {}}, created_at=now - timedelta(days=2)),
+            HRDump(user_id=2, path=f"{employee}55/", method="PATCH", payload={}, created_at=now - timedelta(days=2)),
+            HRDump(user_id=3, path=f"{employee}5/", method="DELETE", payload={"deleted": {}}, created_at=now - timedelta(days=1)),
+            HRDump(user_id=3, path=f"{employee}5/restore/", method="RESTORE", payload={}, created_at=now),
+            HRDump(user_id=1, path="/api/hr/master/unit/5/", method="PATCH", payload={}, created_at=now),
+        ])
+        self.now = now
+
+    def get(self, params):
+        with mock.patch("hr.http_client.get", side_effect=fake_auth_users):
+            resp = self.client.get(self.url, params)
+        self.assertEqual(resp.status_code, 200)
+        return resp.json()
+
+    def test_object_history(self):
+        data = self.get({"resource": "employee", "object_id": 5})
+        self.assertEqual([row["method"] for row in data["results"]], ["RESTORE", "DELETE", "PATCH", "POST"])
+        self.assertEqual(data["results"][0]["user"], {"id": 3, "username": "user3"})
+
+        # tanpa resource: semua object id 5 (employee + unit)
+        self.assertEqual(self.get({"object_id": 5})["count"], 5)
+
+    def test_filters(self):
+        self.assertEqual(self.get({"user_id": 2})["count"], 2)
+        self.assertEqual(self.get({"method": "patch"})["count"], 3)
+        self.assertEqual(self.get({"path": "/api/hr/master/unit/5/"})["count"], 1)
+        since = (self.now - timedelta(days=1, hours=1)).isoformat()
+        self.assertEqual(self.get({"created_at__gte": since})["count"], 3)
+
+    def test_cursor_and_read_only(self):
+        data = self.get({"cursor": "", "page_size": 4, "fields": "id,method"})
+        self.assertEqual(len(data["results"]), 4)
+        self.assertEqual(set(data["results"][0]), {"id", "method"})
+        self.assertIsNotNone(data["next"])
+
+        self.assertEqual(self.client.post(self.url, {}).status_code, 405)
+        row = HRDump.objects.first()
+        self.assertEqual(self.client.delete(f"{self.url}{row.pk}/").status_code, 405)
+
+    def test_base_actions_not_routed(self):
+        for name in ("hrdump-export", "hrdump-insert-bulk"):
+            with self.assertRaises(NoReverseMatch):
+                reverse(name)
+        with self.assertRaises(NoReverseMatch):
+            reverse("hrdump-restore", args=[1])
+        self.assertEqual(self.client.get(f"{self.url}export/").status_code, 404)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class PrometheusLabelTest(TestCase):
+    """request_* metric: label dari route, bukan path mentah."""
+    databases = {"default", "hr_master", "hr_dump"}
+
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch.object(middleware, "_metric_endpoints", set())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def count(self, endpoint, status="200", method="GET"):
+        return REGISTRY.get_sample_value(
+            "request_count_total", {"method": method, "endpoint": endpoint, "status": status}
+        ) or 0
+
+    def series(self):
+        return {
+            (sample.labels["endpoint"], sample.labels["status"])
+            for metric in REGISTRY.collect() if metric.name == "request_count"
+            for sample in metric.samples if sample.name == "request_count_total"
+        }
+
+    def test_ids_share_one_series(self):
+        before = self.count("company-detail", "404")
+        for pk in range(1, 21):
+            self.client.get(f"/api/hr/master/company/{pk}/")
+        self.assertEqual(self.count("company-detail", "404") - before, 20)
+        self.assertFalse(any("/company/" in endpoint for endpoint, _ in self.series()))
+
+    def test_unmatched_paths_and_cap(self):
+        before = self.count(middleware.UNMATCHED_ENDPOINT, "404")
+        for i in range(5):
+            self.client.get(f"/nope/{i}/")
+        self.assertEqual(self.count(middleware.UNMATCHED_ENDPOINT, "404") - before, 5)
+
+        with override_settings(PROMETHEUS_MAX_ENDPOINTS=1):
+            self.client.get("/api/hr/master/unit/")
+            before = self.count(middleware.OVERFLOW_ENDPOINT)
+            self.client.get("/api/hr/master/level/")
+        self.assertEqual(self.count(middleware.OVERFLOW_ENDPOINT) - before, 1)
+
+
+class MultiprocessMetricsTest(TestCase):
+    """/metrics/ di gunicorn: jumlah dari semua worker, bukan satu worker."""
+
+    def test_metrics_view_aggregates_workers(self):
+        metrics_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(metrics_dir.cleanup)
+        env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": metrics_dir.name}
+        worker = (
+            "from prometheus_client import Counter\n"
+            "c = Counter('request_count', 'Total request count', ['method', 'endpoint', 'status'])\n"
+            "c.labels('GET', 'employee-list', '200').inc(3)\n"
+        )
+        for _ in range(2):  # dua proses = dua worker gunicorn
+            subprocess.run([sys.executable, "-c", worker], env=env, check=True)
+
+        with mock.patch.dict(os.environ, {"PROMETHEUS_MULTIPROC_DIR": metrics_dir.name}):
+            body = self.client.get("/metrics/").content.decode()
+        self.assertIn('request_count_total{endpoint="employee-list",method="GET",status="200"} 6.0', body)
+
+
+@override_settings(
+    SERVER_TIMING=True,
+    CACHES={"default": {"BACKEND": "hr.timing.TimedLocMemCache"}},
+)
+class RequestTimingTest(TestCase):
+    """Breakdown db / cache / http per request (hr/timing.py)."""
+    databases = {"default", "hr_master", "hr_dump"}
+
+    def phases(self, response):
+        parts = {}
+        for part in response["Server-Timing"].split(", "):
+            name, *params = part.split(";")
+            parts[name] = dict(param.split("=", 1) for param in params)
+        return parts
+
+    def test_server_timing_and_histograms(self):
+        before = REGISTRY.get_sample_value("request_db_queries_count", {"endpoint": "company-list"}) or 0
+        with CaptureQueriesContext(connections["hr_master"]) as queries:
+            resp = self.client.get("/api/hr/master/company/")
+        self.assertEqual(resp.status_code, 200)
+
+        phases = self.phases(resp)
+        self.assertEqual(set(phases), {"db", "cache", "http", "app", "total"})
+        self.assertEqual(phases["db"]["desc"], f'"{len(queries)} calls"')
+        self.assertNotEqual(phases["cache"]["desc"], '"0 calls"')  # count cache
+        self.assertEqual(phases["http"]["desc"], '"0 calls"')
+        self.assertEqual(
+            REGISTRY.get_sample_value("request_db_queries_count", {"endpoint": "company-list"}), before + 1
+        )
+        self.assertIsNotNone(
+            REGISTRY.get_sample_value("request_phase_seconds_count", {"endpoint": "company-list", "phase": "app"})
+        )
+
+    def test_outside_request_is_noop(self):
+        from hr import timing
+
+        with timing.track("db"):
+            pass
+        self.assertIsNone(timing.stop())
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class QueryProfileTest(TestCase):
+    """Sampling N+1 detector (hr/query_profile.py)."""
+    databases = {"default", "hr_master", "hr_dump"}
+
+    def setUp(self):
+        cache.clear()
+        logs = tempfile.TemporaryDirectory()
+        self.addCleanup(logs.cleanup)
+        self.log = Path(logs.name) / "query_profile.log"
+        override = override_settings(QUERY_PROFILE_LOG=str(self.log))
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_fingerprint_collapses_values(self):
+        self.assertEqual(
+            query_profile.fingerprint('SELECT "a"."id" FROM "a" WHERE ("a"."id" = %s AND "a"."code" IN (%s, %s)) LIMIT 21'),
+            'SELECT "a"."id" FROM "a" WHERE ("a"."id" = ? AND "a"."code" IN (...)) LIMIT ?',
+        )
+        self.assertEqual(
+            query_profile.fingerprint("SELECT * FROM t2 WHERE x IN (1, 2,3) AND y = 'it''s'"),
+            query_profile.fingerprint("SELECT * FROM t2 WHERE x IN (4) AND y = 'b'"),
+        )
+
+    def test_repeated_statements_are_logged(self):
+        from hr_master.models import Company
+
+        profile = query_profile.Profile()
+        with connections["hr_master"].execute_wrapper(profile):
+            Company.objects.count()
+            for pk in range(6):
+                Company.objects.filter(pk=pk).first()
+
+        before = REGISTRY.get_sample_value("query_n_plus_one_total", {"endpoint": "company-list"}) or 0
+        entry = profile.report("company-list", RequestFactory().get("/api/hr/master/company/"))
+        self.assertEqual(entry["queries"], 7)
+        self.assertEqual([n["count"] for n in entry["n_plus_one"]], [6])
+        self.assertEqual(REGISTRY.get_sample_value("query_n_plus_one_total", {"endpoint": "company-list"}), before + 1)
+        self.assertEqual(json.loads(self.log.read_text().splitlines()[-1])["n_plus_one"][0]["count"], 6)
+
+    def test_middleware_only_profiles_sampled_requests(self):
+        def sampled():
+            return REGISTRY.get_sample_value("query_profile_requests_total", {"endpoint": "unit-list"}) or 0
+
+        before = sampled()
+        with override_settings(QUERY_PROFILE_SAMPLE_RATE=0):
+            self.client.get("/api/hr/master/unit/")
+        self.assertEqual(sampled(), before)
+
+        cache.clear()  # count dari request pertama ke-cache
+        with override_settings(QUERY_PROFILE_SAMPLE_RATE=1, QUERY_PROFILE_SLOW_MS=0):
+            self.client.get("/api/hr/master/unit/")
+        self.assertEqual(sampled(), before + 1)
+        self.assertTrue(json.loads(self.log.read_text().splitlines()[-1])["slow"])
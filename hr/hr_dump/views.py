@@ -1,5 +1,87 @@
 from django.http import HttpResponse
-from prometheus_client import generate_latest, REGISTRY
+from prometheus_client import generate_latest, CollectorRegistry, REGISTRY, CONTENT_TYPE_LATEST
+from prometheus_client import multiprocess
+from drf_spectacular.utils import extend_schema, OpenApiParameter
+
+from .models import *
+from .serializers import *
+from .filters import *
+from hr.config import *
+
+import os
 
 def metrics_view(request):
-    return HttpResponse(generate_latest(REGISTRY), content_type="text/plain; charset=utf-8")
\ No newline at end of file
+    """
+    Gunicorn (PROMETHEUS_MULTIPROC_DIR di-set, lihat gunicorn.conf.py): gabungan
+    semua worker dari file mmap, bukan cuma worker yang kebetulan nerima scrape.
+    """
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY  # runserver / satu proses
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
+
+
+AUDIT_PARAMS = [
+    OpenApiParameter("user_id", OpenApiTypes.INT, OpenApiParameter.QUERY,
+                     description="Who made the change."),
+    OpenApiParameter("method", OpenApiTypes.STR, OpenApiParameter.QUERY,
+                     description="POST, PUT, PATCH, DELETE or RESTORE."),
+    OpenApiParameter("path", OpenApiTypes.STR, OpenApiParameter.QUERY,
+                     description="Exact request path, e.g. /api/hr/master/employee/5/"),
+    OpenApiParameter("resource", OpenApiTypes.STR, OpenApiParameter.QUERY,
+                     description="Master resource name (employee, unit, ...) or path prefix."),
+    OpenApiParameter("object_id", OpenApiTypes.INT, OpenApiParameter.QUERY,
+                     description="Every change of one object. Send it with resource so the path index is used\n\nexample:\n\n?resource=employee&object_id=5"),
+    OpenApiParameter("created_at__gte", OpenApiTypes.DATETIME, OpenApiParameter.QUERY,
+                     description="Changes at or after this time (ISO 8601)."),
+    OpenApiParameter("created_at__lte", OpenApiTypes.DATETIME, OpenApiParameter.QUERY,
+                     description="Changes at or before this time (ISO 8601)."),
+    OpenApiParameter("page", OpenApiTypes.INT, OpenApiParameter.QUERY,
+                     description="Return which page you want to return."),
+    OpenApiParameter("page_size", OpenApiTypes.INT, OpenApiParameter.QUERY,
+                     description="Return the count of data each page."),
+    OpenApiParameter("cursor", OpenApiTypes.STR, OpenApiParameter.QUERY,
+                     description="Keyset pagination (recommended here). Send it empty (?cursor=) for the first page, then follow the next/previous links."),
+    OpenApiParameter("ordering", OpenApiTypes.STR, OpenApiParameter.QUERY,
+                     description="Ordering for cursor mode: -id (default), id, -created_at or created_at."),
+    OpenApiParameter("count", OpenApiTypes.STR, OpenApiParameter.QUERY,
+                     description="exact (default, cached briefly), estimate or none."),
+    OpenApiParameter("fields", OpenApiTypes.STR, OpenApiParameter.QUERY,
+                     description="Only get the fields you want\n\nexample:\n\n?fields=id,user,method,path,created_at"),
+    OpenApiParameter("exclude", OpenApiTypes.STR, OpenApiParameter.QUERY,
+                     description="Remove the fields you want\n\nexample:\n\n?exclude=payload"),
+]
+
+# ==============================
+# AUDIT TRAIL
+# ==============================
+@extend_schema(tags=["Audit"])
+class AuditViewSet(BaseViewSet):
+    """
+    Read-only audit trail (hr_dump), pagination & users_map sama dengan BaseViewSet.
+    """
+    queryset = HRDump.objects.all().order_by('-id')
+    serializer_class = HRDumpSerializer
+    filterset_class = HRDumpFilter
+    filter_backends = [DjangoFilterBackend]
+    http_method_names = ['get', 'head', 'options']
+
+    @classmethod
+    def get_extra_actions(cls):
+        # export / insert-bulk / restore dari BaseViewSet tidak di-route: audit
+        # read-only dan tidak boleh di-dump utuh (payload ikut)
+        return []
+
+    def get_queryset(self):
+        # HRDump bukan BaseModel, tidak ada include_deleted / only_deleted
+        return self.plan_queryset(self.queryset)
+
+    @extend_schema(
+        description="Audit trail master data (create, update, delete, restore) dengan pagination & filter.",
+        parameters=AUDIT_PARAMS,
+        responses={200: HRDumpSerializer}
+    )
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
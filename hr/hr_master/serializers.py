@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from drf_spectacular.utils import extend_schema_field
+from django.db.models import prefetch_related_objects
 from .models import *
 
 """
@@ -117,6 +118,49 @@ class BaseTreeSerializer(DynamicModelSerializer):
 
         return fields
 
+    def to_representation(self, instance):
+        # retrieve (bukan list): prefetch tree buat satu instance ini
+        self.prefetch_tree([instance])
+        return super().to_representation(instance)
+
+    def tree_lookups(self):
+        """
+        Lookup prefetch children & parent chain sampai max_depth + 1 (level
+        stub {id, name}). Cuma di root (node rekursif sudah ke-load dari
+        root-nya) dan cuma buat field yang aktif (?fields / ?exclude).
+        """
+        if self.context.get('_mode'):
+            return []
+
+        levels = max(SmartRecursive.get_max_depth(self.context), 0) + 1
+        return [
+            "__".join([name] * levels)
+            for name in (self.TREE_CHILDREN_FIELD, self.TREE_PARENT_FIELD)
+            if name in self.fields
+        ]
+
+    def prefetch_tree(self, instances):
+        """
+        Load tree semua instance sekaligus, satu query per level (bukan per
+        node). Hasilnya masuk relation cache Django, jadi SmartRecursive tidak
+        query lagi. Yang sudah di-prefetch queryset (plan_related) di-skip.
+        """
+        lookups = self.tree_lookups()
+        if instances and lookups:
+            prefetch_related_objects(instances, *lookups)
+
+
+class TreeListSerializer(serializers.ListSerializer):
+    """
+    ListSerializer buat BaseTreeSerializer: tree satu page di-prefetch
+    sekaligus sebelum tiap item di-render.
+    """
+    def to_representation(self, data):
+        iterable = data.all() if hasattr(data, 'all') else data
+        instances = list(iterable)
+        self.child.prefetch_tree(instances)
+        return super().to_representation(instances)
+
 
 class SmartRecursive(serializers.Serializer):
     """
@@ -147,6 +191,16 @@ class SmartRecursive(serializers.Serializer):
 
         return None
 
+    @staticmethod
+    def get_max_depth(context):
+        # Ambil max_depth dari query_params jika ada
+        if 'request' in context:
+            try:
+                return int(context['request'].query_params.get('max_depth', 10))
+            except ValueError:
+                return 10
+        return int(context.get('_max_depth', 10))
+
     def to_representation(self, value):
         serializer_class = self.get_serializer_class()
         if serializer_class is None:
@@ -155,18 +209,13 @@ class SmartRecursive(serializers.Serializer):
                 'name': getattr(value, 'name', None)
             }
 
+        # serializer per (class, mode, depth) dipakai ulang buat semua node
+        # di level yang sama, bukan bikin serializer baru per node
+        tree_serializers = self.context.setdefault('_tree_serializers', {})
+
         context = dict(self.context or {})
         context['_mode'] = self.mode
-
-        # Ambil max_depth dari query_params jika ada
-        if 'request' in context:
-            try:
-                query_depth = int(context['request'].query_params.get('max_depth', 10))
-            except ValueError:
-                query_depth = 10
-            context['_max_depth'] = query_depth
-        else:
-            context['_max_depth'] = context.get('_max_depth', 10)
+        context['_max_depth'] = self.get_max_depth(context)
 
         # Depth guard
         depth = int(context.get('_depth', 0))
@@ -178,11 +227,15 @@ class SmartRecursive(serializers.Serializer):
             }
         context['_depth'] = depth + 1
 
-        kwargs = {'context': context}
-        if 'fields' in context and hasattr(serializer_class, 'get_fields'):
-            kwargs['fields'] = context['fields']
+        key = (serializer_class, self.mode, context['_depth'], max_depth)
+        serializer = tree_serializers.get(key)
+        if serializer is None:
+            kwargs = {'context': context}
+            if 'fields' in context and hasattr(serializer_class, 'get_fields'):
+                kwargs['fields'] = context['fields']
+            serializer = tree_serializers[key] = serializer_class(**kwargs)
 
-        return serializer_class(value, **kwargs).data
+        return serializer.to_representation(value)
 
 
 class CompanySerializer(BaseTreeSerializer):
@@ -192,6 +245,7 @@ class CompanySerializer(BaseTreeSerializer):
     class Meta:
         model = Company
         fields = '__all__'
+        list_serializer_class = TreeListSerializer
 
 class UnitSerializer(BaseTreeSerializer) :
     children = SmartRecursive(many=True, read_only=True, mode='children')
@@ -200,6 +254,7 @@ class UnitSerializer(BaseTreeSerializer) :
     class Meta:
         model = Unit
         fields = '__all__'
+        list_serializer_class = TreeListSerializer
 
 class LevelSerializer(BaseTreeSerializer) :
     children = SmartRecursive(many=True, read_only=True, mode='children')
@@ -208,6 +263,7 @@ class LevelSerializer(BaseTreeSerializer) :
     class Meta:
         model = Level
         fields = '__all__'
+        list_serializer_class = TreeListSerializer
 
 class EmploymentTypeSerializer(serializers.ModelSerializer) :
     class Meta:
@@ -239,4 +295,5 @@ class EmployeeSerializer(BaseTreeSerializer) :
 
     class Meta:
         model = Employee
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+        list_serializer_class = TreeListSerializer
\ No newline at end of file
@@ -1,3 +1,949 @@
-from django.test import TestCase
+from django.core.cache import cache
+from django.db import connections, OperationalError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 
-# Create your tests here.
\ No newline at end of file
+from unittest import mock
+from pathlib import Path
+from time import monotonic, time
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from .models import *
+from hr.config import get_users, fetch_external_data, USER_NOT_FOUND
+from hr import audit, http_client, middleware, import_jobs
+from hr.bulk_import import BulkImporter, BulkImportError
+from hr.thread_locals import set_current_user_id
+from hr_dump.models import HRDump
+
+import csv
+import jwt
+import json
+import pandas as pd
+import requests
+import tempfile
+import threading
+
+LOCMEM_CACHE = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+def fake_auth_users(*args, **kwargs):
+    """Stub GET /api/users/ Auth Service: balikin user sesuai id__in."""
+    ids = [int(i) for i in kwargs["params"]["id__in"].split(",")]
+    resp = mock.Mock(status_code=200)
+    resp.json.return_value = [{"id": i, "username": f"user{i}"} for i in ids]
+    return resp
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class AuditUserResolutionTest(TestCase):
+    """
+    users_map cuma di-resolve dari object yang di-serialize (setelah pagination),
+    jadi jumlah query & latency list tidak ikut naik waktu tabel membesar.
+    """
+    databases = {"default", "hr_master", "hr_dump"}
+    url = "/api/hr/master/level/"
+
+    def seed(self, total):
+        with self.captureOnCommitCallbacks(using="hr_master", execute=True):
+            Level.all_objects.all().hard_delete()
+            Level.objects.bulk_create([
+                Level(name=f"Level {i}", code=f"LV{i:06d}", created_by=i, updated_by=i)
+                for i in range(1, total + 1)
+            ])
+
+    def get_list(self):
+        with mock.patch("hr.http_client.get", side_effect=fake_auth_users) as auth_get:
+            with CaptureQueriesContext(connections["hr_master"]) as queries:
+                resp = self.client.get(self.url, {"page_size": 10})
+        self.assertEqual(resp.status_code, 200)
+        return resp, auth_get, len(queries)
+
+    def test_list_resolves_only_page_users(self):
+        self.seed(50)
+        resp, auth_get, _ = self.get_list()
+
+        self.assertEqual(auth_get.call_count, 1)
+        requested = {int(i) for i in auth_get.call_args.kwargs["params"]["id__in"].split(",")}
+        page_ids = {row["created_by"]["id"] for row in resp.json()["results"]}
+        self.assertEqual(requested, page_ids)
+        self.assertEqual(len(requested), 10)
+
+        row = resp.json()["results"][0]
+        self.assertEqual(row["created_by"]["username"], f"user{row['created_by']['id']}")
+
+    def test_retrieve_resolves_single_object(self):
+        self.seed(50)
+        obj = Level.objects.get(code="LV000007")
+
+        with mock.patch("hr.http_client.get", side_effect=fake_auth_users) as auth_get:
+            resp = self.client.get(f"{self.url}{obj.pk}/")
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(auth_get.call_args.kwargs["params"]["id__in"], "7")
+        self.assertEqual(resp.json()["updated_by"]["username"], "user7")
+
+    def test_list_query_count_flat_as_table_grows(self):
+        """Query count list page harus flat berapa pun jumlah row-nya (latency: scripts/bench_level_list.py)."""
+        query_counts = set()
+        for total in (100, 1000, 10000):
+            self.seed(total)
+            _, _, query_count = self.get_list()
+            query_counts.add(query_count)
+
+        self.assertEqual(len(query_counts), 1)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class UserDirectoryTest(TestCase):
+    """get_users: 1x get_many, miss diambil sekaligus, id asing di-negative cache."""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_get_users_batches_and_caches_misses(self):
+        with mock.patch("hr.http_client.get", side_effect=fake_auth_users) as auth_get:
+            first = get_users([1, 2, 3])
+            second = get_users([1, 2, 3])
+
+        self.assertEqual(auth_get.call_count, 1)
+        self.assertEqual(first, second)
+        self.assertEqual(second[2], {"id": 2, "username": "user2"})
+
+    def test_get_users_negative_cache(self):
+        resp = mock.Mock(status_code=200)
+        resp.json.return_value = [{"id": 1, "username": "user1"}]
+
+        with mock.patch("hr.http_client.get", return_value=resp) as auth_get:
+            get_users([1, 404])
+            users = get_users([1, 404])
+
+        self.assertEqual(auth_get.call_count, 1)
+        self.assertEqual(users[404], {"id": 404})
+
+    def test_get_users_follows_pagination(self):
+        first = mock.Mock(status_code=200)
+        first.json.return_value = {"results": [{"id": 1, "username": "user1"}], "next": "http://auth/api/users/?page=2"}
+        last = mock.Mock(status_code=200)
+        last.json.return_value = {"results": [{"id": 2, "username": "user2"}], "next": None}
+
+        with mock.patch("hr.http_client.get", side_effect=[first, last]) as auth_get:
+            users = get_users([1, 2, 404])
+
+        self.assertEqual(auth_get.call_count, 2)
+        self.assertEqual(users[2]["username"], "user2")
+        self.assertTrue(cache.get("user:404")[USER_NOT_FOUND])
+
+    def test_get_users_incomplete_page_not_negative_cached(self):
+        resp = mock.Mock(status_code=200)
+        resp.json.return_value = {"results": [{"id": 1, "username": "user1"}], "next": "http://auth/api/users/?page=2"}
+
+        with mock.patch("hr.config.USER_MAX_PAGES", 1), mock.patch("hr.http_client.get", return_value=resp):
+            users = get_users([1, 2])
+
+        self.assertEqual(users[2], {"id": 2})
+        self.assertIsNotNone(cache.get("user:1"))
+        self.assertIsNone(cache.get("user:2"))
+
+    def test_get_users_auth_down_not_cached(self):
+        with mock.patch("hr.http_client.get", side_effect=requests.ConnectionError):
+            users = get_users([5])
+        self.assertEqual(users, {5: {"id": 5}})
+
+        with mock.patch("hr.http_client.get", side_effect=fake_auth_users) as auth_get:
+            users = get_users([5])
+        self.assertEqual(auth_get.call_count, 1)
+        self.assertEqual(users[5]["username"], "user5")
+
+
+class CircuitBreakerTest(TestCase):
+    databases = set()
+
+    def test_opens_after_failures_and_half_opens(self):
+        breaker = http_client.CircuitBreaker(failure_threshold=2, reset_timeout=30)
+        breaker.record_failure()
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        self.assertFalse(breaker.allow())
+
+        # lewat reset_timeout: satu request percobaan boleh lewat
+        breaker.opened_at -= 31
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+
+        breaker.record_success()
+        self.assertTrue(breaker.allow())
+
+    def test_request_short_circuits_when_open(self):
+        session = http_client.get_session()
+        breaker = http_client.get_breaker("http://auth.test/api/users/")
+        breaker.failures = breaker.failure_threshold
+        breaker.opened_at = monotonic()
+        try:
+            with mock.patch.object(session, "request") as session_request:
+                with self.assertRaises(http_client.CircuitOpenError):
+                    http_client.get("http://auth.test/api/users/")
+            session_request.assert_not_called()
+        finally:
+            breaker.record_success()
+
+
+class BearerTokenTest(TestCase):
+    """JWT bearer di-verify lokal pakai public key, claims di-cache sampai exp."""
+    databases = set()
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        cls.public_pem = cls.private_key.public_key().public_bytes(
+            serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+        ).decode()
+
+    def setUp(self):
+        middleware._jwt_claims.clear()
+        patcher = mock.patch.object(middleware, "PUBLIC_KEY", self.public_pem)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def make_token(self, exp_in=300, key=None):
+        payload = {"user_id": 7, "exp": int(time()) + exp_in}
+        return jwt.encode(payload, key or self.private_key, algorithm="RS256")
+
+    def test_valid_token_cached_until_exp(self):
+        token = self.make_token()
+        self.assertEqual(middleware.verify_bearer_token(token)["user_id"], 7)
+
+        with mock.patch.object(middleware.jwt, "decode") as decode:
+            self.assertEqual(middleware.verify_bearer_token(token)["user_id"], 7)
+        decode.assert_not_called()
+
+    def test_expired_and_foreign_tokens_rejected(self):
+        with self.assertRaises(jwt.ExpiredSignatureError):
+            middleware.verify_bearer_token(self.make_token(exp_in=-10))
+
+        other_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        with self.assertRaises(jwt.InvalidSignatureError):
+            middleware.verify_bearer_token(self.make_token(key=other_key))
+
+    def test_claim_user_id(self):
+        self.assertEqual(middleware.claim_user_id({"user_id": 7}), 7)
+        self.assertEqual(middleware.claim_user_id({"sub": "12"}), 12)
+        self.assertIsNone(middleware.claim_user_id({"sub": "alice"}))
+        self.assertIsNone(middleware.claim_user_id({"user_id": True}))
+        self.assertIsNone(middleware.claim_user_id({}))
+
+    @override_settings(AUTH_INTERNAL_TOKEN="service-token")
+    def test_bearer_does_not_forward_client_jwt(self):
+        self.addCleanup(set_current_user_id, None)
+        token = self.make_token()
+        request = RequestFactory().get("/api/hr/master/unit/")
+        self.assertIsNone(middleware.authenticate_bearer(request, token))
+        self.assertEqual(request.user_id, 7)
+        self.assertEqual(request.internal_token, "service-token")
+
+        no_user = jwt.encode({"sub": "alice", "exp": int(time()) + 300}, self.private_key, algorithm="RS256")
+        self.assertEqual(middleware.authenticate_bearer(RequestFactory().get("/"), no_user).status_code, 401)
+
+    def test_get_bearer_jwt(self):
+        self.assertEqual(middleware.get_bearer_jwt("Bearer a.b.c"), "a.b.c")
+        self.assertIsNone(middleware.get_bearer_jwt("Bearer opaque-token"))
+        self.assertIsNone(middleware.get_bearer_jwt("Token a.b.c"))
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class TreeSerializationTest(TestCase):
+    """Tree satu page di-load per level, bukan per node."""
+    databases = {"default", "hr_master", "hr_dump"}
+    url = "/api/hr/master/unit/"
+
+    def seed(self, roots):
+        with self.captureOnCommitCallbacks(using="hr_master", execute=True):
+            Unit.all_objects.all().hard_delete()
+            for r in range(roots):
+                root = Unit.objects.create(name=f"Root {r}", code=f"R{r}")
+                for c in range(3):
+                    child = Unit.objects.create(name=f"Child {r}.{c}", code=f"C{r}.{c}", parent=root)
+                    for g in range(2):
+                        Unit.objects.create(name=f"Leaf {r}.{c}.{g}", code=f"L{r}.{c}.{g}", parent=child)
+
+    def count_queries(self, params):
+        with mock.patch("hr.http_client.get", side_effect=fake_auth_users):
+            with CaptureQueriesContext(connections["hr_master"]) as queries:
+                resp = self.client.get(self.url, params)
+        self.assertEqual(resp.status_code, 200)
+        return resp, len(queries)
+
+    def test_query_count_constant_per_page(self):
+        params = {"page_size": 100}
+        self.seed(2)
+        _, small = self.count_queries(params)
+        self.seed(8)
+        resp, large = self.count_queries(params)
+
+        self.assertEqual(small, large)
+        root = next(row for row in resp.json()["results"] if row["code"] == "R0")
+        self.assertEqual(len(root["children"]), 3)
+        self.assertEqual({len(child["children"]) for child in root["children"]}, {2})
+
+    def test_parent_chain_and_max_depth(self):
+        self.seed(1)
+        leaf = Unit.objects.get(code="L0.0.0")
+        resp = self.client.get(f"{self.url}{leaf.pk}/", {"max_depth": 1})
+
+        parent = resp.json()["parent"]
+        self.assertEqual(parent["code"], "C0.0")
+        self.assertNotIn("children", parent)
+        self.assertEqual(parent["parent"], {"id": leaf.parent.parent_id, "name": "Root 0"})
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class EmployeeQueryPlanTest(TestCase):
+    """select_related / prefetch_related dari nested EmployeeSerializer."""
+    databases = {"default", "hr_master", "hr_dump"}
+    url = "/api/hr/master/employee/"
+
+    def setUp(self):
+        self.company = Company.objects.create(name="Company", code="CMP")
+        self.unit = Unit.objects.create(name="Unit", code="UNT")
+        self.level = Level.objects.create(name="Level", code="LVL")
+        self.branch = Branch.objects.create(name="Branch", code="BRC")
+        self.branch.company.add(self.company)
+        self.shift = Shift.objects.create(code="SHF", start_day=1, start_time="08:00", end_day=1, end_time="17:00")
+        self.employment_type = EmploymentType.objects.create(name="Tetap", code="TTP")
+
+    def seed(self, total):
+        start = Employee.objects.count()
+        with self.captureOnCommitCallbacks(using="hr_master", execute=True):
+            for i in range(start, start + total):
+                employee = Employee.objects.create(
+                    user_id=i, nik=i, code=f"EMP{i}", full_name=f"Employee {i}",
+                    branch=self.branch, level=self.level, shift=self.shift,
+                    employment_type=self.employment_type, created_by=1,
+                )
+                employee.company.add(self.company)
+                employee.unit.add(self.unit)
+
+    def get(self, params):
+        with mock.patch("hr.http_client.get", side_effect=fake_auth_users):
+            with CaptureQueriesContext(connections["hr_master"]) as queries:
+                resp = self.client.get(self.url, params)
+        self.assertEqual(resp.status_code, 200)
+        return resp, queries
+
+    def test_query_count_constant_per_page(self):
+        self.seed(3)
+        _, small = self.get({"page_size": 50})
+        self.seed(12)
+        resp, large = self.get({"page_size": 50})
+
+        self.assertEqual(len(small), len(large))
+        row = resp.json()["results"][0]
+        self.assertEqual(row["branch"]["company"][0]["code"], "CMP")
+        self.assertEqual(row["unit"][0]["code"], "UNT")
+        self.assertEqual(row["level"]["code"], "LVL")
+
+    def test_sparse_fields_skip_relations(self):
+        self.seed(5)
+        _, full = self.get({"page_size": 50})
+        resp, sparse = self.get({"page_size": 50, "fields": "id,code,full_name"})
+
+        self.assertLess(len(sparse), len(full))
+        self.assertFalse(any("JOIN" in q["sql"] for q in sparse.captured_queries))
+        self.assertEqual(set(resp.json()["results"][0]), {"id", "code", "full_name"})
+
+    def test_sparse_fields_prune_columns(self):
+        self.seed(5)
+        resp, queries = self.get({"page_size": 50, "fields": "id,code,full_name"})
+
+        select = next(q["sql"] for q in queries.captured_queries if q["sql"].startswith('SELECT "employee"."id"'))
+        columns = select.split(" FROM ")[0]
+        self.assertNotIn("address", columns)
+        self.assertNotIn("description", columns)
+        self.assertEqual(columns.count('"employee".'), 3)
+        self.assertEqual(resp.json()["results"][0]["full_name"], "Employee 4")
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class KeysetPaginationTest(TestCase):
+    """?cursor= : keyset pagination tanpa OFFSET / COUNT(*), envelope tetap sama."""
+    databases = {"default", "hr_master", "hr_dump"}
+    url = "/api/hr/master/shift/"
+
+    def setUp(self):
+        cache.clear()
+        Shift.objects.bulk_create([
+            Shift(code=f"S{i:03d}", start_day=1, start_time="08:00", end_day=1, end_time="17:00")
+            for i in range(25)
+        ])
+
+    def walk(self, params):
+        codes, url, pages = [], self.url, 0
+        while url:
+            with CaptureQueriesContext(connections["hr_master"]) as queries:
+                resp = self.client.get(url, params if pages == 0 else None)
+            body = resp.json()
+            self.assertEqual(resp.status_code, 200)
+            self.assertIsNone(body["count"])
+            self.assertFalse(any("COUNT(" in q["sql"] for q in queries.captured_queries))
+            self.assertFalse(any("OFFSET" in q["sql"] for q in queries.captured_queries))
+            codes += [row["code"] for row in body["results"]]
+            url, pages = body["next"], pages + 1
+        return codes, pages
+
+    def test_walk_all_pages_by_id(self):
+        codes, pages = self.walk({"cursor": "", "page_size": 10})
+        self.assertEqual(pages, 3)
+        self.assertEqual(codes, [f"S{i:03d}" for i in reversed(range(25))])
+
+    def test_walk_indexed_ordering(self):
+        codes, _ = self.walk({"cursor": "", "page_size": 7, "ordering": "code"})
+        self.assertEqual(codes, [f"S{i:03d}" for i in range(25)])
+
+    def test_page_number_mode_unchanged(self):
+        body = self.client.get(self.url, {"page": 2}).json()
+        self.assertEqual((body["count"], body["total_pages"], body["current_page"]), (25, 3, 2))
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class CountCacheTest(TestCase):
+    """COUNT(*) di-cache per filter, invalidate waktu ada write, ?count=none skip count."""
+    databases = {"default", "hr_master", "hr_dump"}
+    url = "/api/hr/master/shift/"
+
+    def setUp(self):
+        cache.clear()
+        Shift.objects.bulk_create([
+            Shift(code=f"S{i:03d}", start_day=i % 2, start_time="08:00", end_day=1, end_time="17:00")
+            for i in range(15)
+        ])
+
+    def get(self, params):
+        with CaptureQueriesContext(connections["hr_master"]) as queries:
+            body = self.client.get(self.url, params).json()
+        counts = [q for q in queries.captured_queries if "COUNT(" in q["sql"]]
+        return body, len(counts)
+
+    def test_count_cached_per_filter(self):
+        self.assertEqual(self.get({"start_day": 1}), (mock.ANY, 1))
+        body, count_queries = self.get({"start_day": 1, "page": 1, "fields": "id,code"})
+        self.assertEqual((body["count"], count_queries), (7, 0))
+
+        body, count_queries = self.get({"start_day": 0})
+        self.assertEqual((body["count"], count_queries), (8, 1))
+
+    def test_write_invalidates_count(self):
+        self.get({})
+        with self.captureOnCommitCallbacks(using="hr_master", execute=True):
+            Shift.objects.create(code="NEW", start_day=1, start_time="08:00", end_day=1, end_time="17:00")
+
+        body, count_queries = self.get({})
+        self.assertEqual((body["count"], count_queries), (16, 1))
+
+    def test_count_none(self):
+        body, count_queries = self.get({"count": "none", "page_size": 10})
+        self.assertEqual(count_queries, 0)
+        self.assertIsNone(body["count"])
+        self.assertIsNone(body["total_pages"])
+        self.assertEqual(len(body["results"]), 10)
+        self.assertIsNotNone(body["next"])
+
+        body, _ = self.get({"count": "none", "page_size": 10, "page": 2})
+        self.assertEqual(len(body["results"]), 5)
+        self.assertIsNone(body["next"])
+
+    def test_count_estimate_falls_back_to_exact(self):
+        body, _ = self.get({"count": "estimate"})
+        self.assertEqual(body["count"], 15)
+
+
+@override_settings(CACHES=LOCMEM_CACHE, AUDIT_WORKER=False)
+class AuditWriteBehindTest(TestCase):
+    """Audit masuk spool dulu, baru ke hr_dump waktu flush (worker dimatikan di test)."""
+    databases = {"default", "hr_master", "hr_dump"}
+    url = "/api/hr/master/employment-type/"
+
+    def setUp(self):
+        cache.clear()
+        spool = tempfile.TemporaryDirectory()
+        self.addCleanup(spool.cleanup)
+        self.spool_dir = spool.name
+        override = override_settings(AUDIT_SPOOL_DIR=self.spool_dir)
+        override.enable()
+        self.addCleanup(override.disable)
+        set_current_user_id(7)
+        self.addCleanup(set_current_user_id, None)
+
+    def create(self, code):
+        resp = self.client.post(self.url, {"name": "Permanent", "code": code, "created_by": 1, "updated_by": 1}, content_type="application/json")
+        self.assertEqual(resp.status_code, 201)
+        return resp
+
+    def test_create_does_not_write_hr_dump_in_request(self):
+        with CaptureQueriesContext(connections["hr_dump"]) as queries:
+            self.create("ET1")
+
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(HRDump.objects.count(), 0)
+
+        self.assertEqual(audit.flush(), 1)
+        dump = HRDump.objects.get()
+        self.assertEqual(dump.user_id, 7)
+        self.assertEqual(dump.method, "POST")
+        self.assertEqual(dump.payload["code"], "ET1")
+
+    def test_flush_batches_into_single_insert(self):
+        for i in range(5):
+            self.create(f"ET{i}")
+
+        with CaptureQueriesContext(connections["hr_dump"]) as queries:
+            self.assertEqual(audit.flush(), 5)
+        inserts = [q for q in queries if q["sql"].startswith("INSERT")]
+        self.assertEqual(len(inserts), 1)
+
+    def test_hr_dump_outage_keeps_spool(self):
+        self.create("ET1")
+        down = OperationalError("hr_dump down")
+        with mock.patch("django.db.models.QuerySet.bulk_create", side_effect=down), self.assertLogs("hr.audit"):
+            self.assertEqual(audit.flush(), 0)
+
+        self.assertEqual(HRDump.objects.count(), 0)
+        self.assertEqual(audit.flush(), 1)
+        self.assertEqual(HRDump.objects.count(), 1)
+
+    def test_replays_spool_of_dead_process(self):
+        # pid di atas pid_max, pasti sudah tidak ada
+        record = {"user_id": 1, "path": self.url, "method": "POST", "payload": {"code": "X"},
+                  "created_at": "2025-01-01T00:00:00+00:00"}
+        with open(f"{self.spool_dir}/audit-99999999.jsonl", "w") as f:
+            f.write(json.dumps(record) + "\n")
+            f.write('{"user_id": 1, "pa')  # baris kepotong waktu crash
+
+        self.assertEqual(audit.flush(), 1)
+        self.assertEqual(HRDump.objects.get().created_at.year, 2025)
+
+    def test_rejected_segment_does_not_block_others(self):
+        set_current_user_id(None)
+        self.create("ET1")
+        with self.assertLogs("hr.audit"):
+            self.assertEqual(audit.flush(), 0)
+
+        set_current_user_id(7)
+        self.create("ET2")
+        self.assertEqual(audit.flush(), 1)
+        self.assertEqual(len(list(Path(self.spool_dir).glob("*.dead"))), 1)
+
+    def test_rejected_record_does_not_drop_its_segment(self):
+        for code in ("ET1", "ET2"):
+            self.create(code)
+        set_current_user_id(None)
+        self.create("ET3")
+        set_current_user_id(7)
+        self.create("ET4")
+
+        with self.assertLogs("hr.audit"):
+            self.assertEqual(audit.flush(), 3)
+
+        self.assertEqual(sorted(d.payload["code"] for d in HRDump.objects.all()), ["ET1", "ET2", "ET4"])
+        dead = list(Path(self.spool_dir).glob("*.dead"))
+        self.assertEqual(len(dead), 1)
+        self.assertEqual([json.loads(line)["payload"]["code"] for line in dead[0].open()], ["ET3"])
+
+    def test_spool_locked_by_live_writer_not_claimed(self):
+        # writer di container / host lain: pid-nya tidak kelihatan, tapi flock-nya masih dipegang
+        spool = Path(self.spool_dir, "audit-otherhost-1.jsonl")
+        spool.write_text(json.dumps({"user_id": 1, "path": self.url, "method": "POST", "payload": {},
+                                     "created_at": "2025-01-01T00:00:00+00:00"}) + "\n")
+        writer = audit.lock_file(spool, "a")
+        self.assertEqual(audit.flush(), 0)
+        self.assertTrue(spool.exists())
+
+        writer.close()  # writer mati → lock lepas
+        self.assertEqual(audit.flush(), 1)
+        self.assertFalse(spool.exists())
+
+
+@override_settings(CACHES=LOCMEM_CACHE, AUDIT_WORKER=False)
+class BulkImportTest(TestCase):
+    """insert_bulk: validasi per kolom, FK/M2M by code, bulk_create per chunk."""
+    databases = {"default", "hr_master", "hr_dump"}
+    url = "/api/hr/master/employee/insert-bulk/"
+    header = "code,nik,user_id,full_name,birthdate,branch_code,level_code,shift_code,employment_type_code,company_code,unit_code,parent_code"
+
+    def setUp(self):
+        cache.clear()
+        for code in ("C1", "C2"):
+            Company.objects.create(name=code, code=code)
+        Unit.objects.create(name="Unit", code="U1")
+        Level.objects.create(name="Level", code="L1")
+        Branch.objects.create(name="Branch", code="B1")
+        Shift.objects.create(code="S1", start_day=1, start_time="08:00", end_day=1, end_time="17:00")
+        EmploymentType.objects.create(name="Tetap", code="T1")
+        set_current_user_id(9)
+        self.addCleanup(set_current_user_id, None)
+        spool = tempfile.TemporaryDirectory()
+        self.addCleanup(spool.cleanup)
+        override = override_settings(AUDIT_SPOOL_DIR=spool.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def upload(self, rows, mode=None, query=""):
+        body = "\n".join([self.header, *rows]).encode()
+        url = f"{self.url}?mode={mode or 'insert'}{query}"
+        return self.client.post(url, {"file": SimpleUploadedFile("employees.csv", body)})
+
+    def row(self, i, parent=""):
+        return f"E{i:05d},{i},{i},Employee {i},1990-01-0{i % 9 + 1},B1,L1,S1,T1,\"C1, C2\",U1,{parent}"
+
+    def test_imports_rows_with_codes_and_m2m(self):
+        resp = self.upload([self.row(1), self.row(2, parent="E00001"), self.row(3, parent="E00001")])
+        self.assertEqual(resp.status_code, 201, resp.json())
+
+        boss = Employee.objects.get(code="E00001")
+        self.assertEqual(set(boss.company.values_list("code", flat=True)), {"C1", "C2"})
+        self.assertEqual(list(boss.unit.values_list("code", flat=True)), ["U1"])
+        self.assertEqual(boss.created_by, 9)
+        self.assertEqual(str(boss.birthdate), "1990-01-02")
+        self.assertEqual(set(boss.children.values_list("code", flat=True)), {"E00002", "E00003"})
+
+    def test_refetch_ids_without_returning_insert(self):
+        # MySQL: bulk_create tidak balikin id, diambil lagi lewat kolom unique
+        features = type(connections["hr_master"].features)
+        with mock.patch.object(features, "can_return_rows_from_bulk_insert", new_callable=mock.PropertyMock, return_value=False):
+            resp = self.upload([self.row(1), self.row(2, parent="E00001")])
+        self.assertEqual(resp.status_code, 201, resp.json())
+        self.assertEqual(Employee.objects.get(code="E00002").parent.code, "E00001")
+        self.assertEqual(Employee.objects.get(code="E00002").company.count(), 2)
+
+        # model tanpa kolom unique ditolak sebelum ada yang ditulis
+        df = pd.DataFrame({"user_id": ["1"], "path": ["/x/"], "method": ["POST"], "payload": ["{}"]})
+        importer = BulkImporter(HRDump, using="hr_dump")
+        importer.returns_pks = False
+        with self.assertRaises(BulkImportError):
+            importer.run(df)
+        self.assertFalse(HRDump.objects.exists())
+
+    def test_lookups_once_per_table(self):
+        selects = []
+        for start, total in ((0, 10), (100, 200)):
+            rows = [self.row(i) for i in range(start, start + total)]
+            with CaptureQueriesContext(connections["hr_master"]) as queries:
+                resp = self.upload(rows)
+            self.assertEqual(resp.status_code, 201, resp.json())
+            selects.append(sum(q["sql"].startswith("SELECT") for q in queries))
+            # INSERT per batch (SQLite dibatasi jumlah parameter), bukan per row
+            self.assertLess(len(queries), total // 5 + 15)
+        self.assertEqual(selects[0], selects[1])
+        self.assertEqual(Employee.objects.count(), 210)
+
+    def test_invalid_rows_rejected_without_writes(self):
+        resp = self.upload([
+            self.row(1),
+            "E00002,abc,2,Employee 2,not-a-date,B1,L1,S1,T1,C9,U1,",
+            self.row(1),
+        ])
+        self.assertEqual(resp.status_code, 400)
+        errors = {(e["row"], e["column"], e["error"]) for e in resp.json()["errors"]}
+        self.assertIn((3, "nik", "Invalid value."), errors)
+        self.assertIn((3, "birthdate", "Invalid value."), errors)
+        self.assertIn((3, "company_code", "Company not found."), errors)
+        self.assertIn((2, "code", "Duplicate value in file."), errors)
+        self.assertEqual(Employee.all_objects.count(), 0)
+
+    def test_upsert_updates_only_changed_rows(self):
+        self.assertEqual(self.upload([self.row(1), self.row(2), self.row(3)]).status_code, 201)
+        before = Employee.objects.get(code="E00001").updated_at
+
+        changed_name = self.row(2).replace("Employee 2", "Employee Two")
+        changed_company = self.row(3).replace('"C1, C2"', "C2")
+        with CaptureQueriesContext(connections["hr_master"]) as queries:
+            resp = self.upload([self.row(1), changed_name, changed_company, self.row(4)], mode="upsert")
+
+        self.assertEqual(resp.status_code, 200, resp.json())
+        self.assertEqual(resp.json()["data"], {"inserted": 1, "updated": 2, "unchanged": 1})
+        self.assertEqual(Employee.objects.get(code="E00001").updated_at, before)
+        self.assertEqual(Employee.objects.get(code="E00002").full_name, "Employee Two")
+        self.assertEqual(list(Employee.objects.get(code="E00003").company.values_list("code", flat=True)), ["C2"])
+
+        updates = [q["sql"] for q in queries if q["sql"].startswith("UPDATE")]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('"full_name"', updates[0])
+        self.assertNotIn('"birthdate"', updates[0])
+
+        self.assertEqual(audit.flush(), 3)
+        patch = HRDump.objects.get(method="PATCH", payload__id=Employee.objects.get(code="E00002").pk)
+        self.assertEqual(patch.payload["after"], {"full_name": "Employee Two"})
+
+    def test_upsert_m2m_only_change_invalidates_response_cache(self):
+        branch = Branch.objects.get(code="B1")
+        with self.captureOnCommitCallbacks(using="hr_master", execute=True):
+            branch.company.add(Company.objects.get(code="C1"))
+        url = "/api/hr/master/branch/"
+        codes = lambda: sorted(c["code"] for c in self.client.get(url).json()["results"][0]["company"])
+        self.assertEqual(codes(), ["C1"])
+
+        body = b'name,code,company_code\nBranch,B1,"C1, C2"'
+        with self.captureOnCommitCallbacks(using="hr_master", execute=True):
+            resp = self.client.post(f"{url}insert-bulk/?mode=upsert", {"file": SimpleUploadedFile("branches.csv", body)})
+        self.assertEqual(resp.json()["data"], {"inserted": 0, "updated": 1, "unchanged": 0})
+        self.assertEqual(codes(), ["C1", "C2"])
+
+    def test_upsert_matches_employee_by_nik(self):
+        self.upload([self.row(1)])
+        renamed = self.row(1).replace("E00001", "NEW001")
+        resp = self.upload([renamed], mode="upsert")
+
+        self.assertEqual(resp.json()["data"], {"inserted": 0, "updated": 1, "unchanged": 0})
+        self.assertEqual(list(Employee.objects.values_list("code", flat=True)), ["NEW001"])
+
+    def test_upsert_restores_soft_deleted_row(self):
+        self.upload([self.row(1)])
+        Employee.objects.get(code="E00001").delete()
+        audit.flush()
+
+        resp = self.upload([self.row(1)], mode="upsert")
+        self.assertEqual(resp.json()["data"], {"inserted": 0, "updated": 1, "unchanged": 0})
+        employee = Employee.objects.get(code="E00001")
+        self.assertIsNone(employee.deleted_by)
+        self.assertEqual(employee.updated_by, 9)
+
+        self.assertEqual(audit.flush(), 1)
+        restore = HRDump.objects.get(method="RESTORE", payload__id=employee.pk)
+        self.assertEqual(restore.payload["after"], {"deleted_at": None, "deleted_by": None})
+
+    def test_insert_mode_still_rejects_existing_code(self):
+        self.upload([self.row(1)])
+        resp = self.upload([self.row(1)])
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(resp.json()["errors"][0]["error"], "Already exists.")
+
+    def test_chunked_upload_error_keeps_committed_chunks_audited(self):
+        real_run = BulkImporter.run
+
+        def flaky_run(importer, df):
+            if int(df.index[0]) >= 2:
+                raise RuntimeError("hr_master gone")
+            return real_run(importer, df)
+
+        rows = [self.row(i) for i in range(1, 5)]
+        with mock.patch.object(BulkImporter, "run", flaky_run):
+            resp = self.upload(rows, mode="upsert", query="&chunked=true&chunk_size=2")
+
+        self.assertEqual(resp.status_code, 207, resp.json())
+        self.assertIn("hr_master gone", resp.json()["detail"])
+        self.assertEqual(resp.json()["data"]["inserted"], 2)
+        self.assertEqual(Employee.objects.count(), 2)
+        self.assertEqual(audit.flush(), 2)
+
+    def test_chunked_upload_skips_only_failed_chunks(self):
+        rows = [self.row(i) for i in range(1, 6)]
+        rows[3] = rows[3].replace(",B1,", ",B9,")  # row 5 di file, chunk kedua
+        with mock.patch("hr.config.read_upload") as read_upload:
+            resp = self.upload(rows, query="&chunked=true&chunk_size=2")
+        read_upload.assert_not_called()
+
+        self.assertEqual(resp.status_code, 207, resp.json())
+        report = resp.json()["data"]
+        self.assertEqual((report["inserted"], report["failed_rows"]), (3, 2))
+        self.assertEqual([c["rows"] for c in report["chunks"]], [[2, 3], [4, 5], [6, 6]])
+        self.assertEqual([c["status"] for c in report["chunks"]], ["ok", "failed", "ok"])
+        self.assertEqual(report["chunks"][1]["errors"][0]["row"], 5)
+        self.assertEqual(
+            sorted(Employee.objects.values_list("code", flat=True)), ["E00001", "E00002", "E00005"]
+        )
+
+        resp = self.upload([self.row(6)], query="&chunked=1")
+        self.assertEqual(resp.status_code, 201, resp.json())
+
+    def test_async_upload_is_queued_then_processed(self):
+        jobs = tempfile.TemporaryDirectory()
+        self.addCleanup(jobs.cleanup)
+        rows = [self.row(i) for i in range(1, 6)]
+        rows[3] = rows[3].replace(",B1,", ",B9,")
+        with override_settings(IMPORT_JOB_DIR=jobs.name, IMPORT_JOB_WORKERS=0):
+            resp = self.upload(rows, query="&async=true&chunk_size=2")
+            self.assertEqual(resp.status_code, 202, resp.json())
+            job_url = resp["Location"]
+            self.assertEqual(self.client.get(job_url).json()["data"]["state"], "queued")
+            self.assertEqual(Employee.objects.count(), 0)
+
+            self.assertEqual(import_jobs.run_pending(), 1)
+            job = self.client.get(job_url).json()["data"]
+
+        self.assertEqual(job["state"], "partial")
+        self.assertEqual((job["rows"], job["inserted"], job["failed_rows"]), (5, 3, 2))
+        self.assertEqual(job["errors"][0]["rows"], [4, 5])
+        self.assertIsNotNone(job["rows_per_sec"])
+        self.assertEqual(sorted(p.suffix for p in Path(jobs.name).iterdir()), [".json"])
+        self.assertEqual(self.client.get("/api/hr/jobs/0123/").status_code, 404)
+
+    def test_reap_only_jobs_whose_worker_is_gone(self):
+        jobs = tempfile.TemporaryDirectory()
+        self.addCleanup(jobs.cleanup)
+        with override_settings(IMPORT_JOB_DIR=jobs.name):
+            job_id = "0" * 32
+            import_jobs.write_state({"id": job_id, "state": "running", "file": f"{job_id}.csv"})
+            marker = Path(jobs.name, f"{job_id}.running")
+            marker.touch()
+            upload = Path(jobs.name, f"{job_id}.csv")
+            upload.touch()
+
+            # worker di node lain masih hidup: lock-nya masih dipegang
+            worker = audit.lock_file(marker)
+            import_jobs.reap(Path(jobs.name))
+            self.assertEqual(import_jobs.get_job(job_id)["state"], "running")
+
+            worker.close()
+            with self.assertLogs("hr.import_jobs"):
+                import_jobs.reap(Path(jobs.name))
+            self.assertEqual(import_jobs.get_job(job_id)["state"], "failed")
+            self.assertFalse(marker.exists())
+            self.assertFalse(upload.exists())
+
+    def test_job_without_state_file_is_dropped(self):
+        jobs = tempfile.TemporaryDirectory()
+        self.addCleanup(jobs.cleanup)
+        with override_settings(IMPORT_JOB_DIR=jobs.name):
+            job_id = "1" * 32
+            Path(jobs.name, f"{job_id}.csv").touch()
+            Path(jobs.name, f"{job_id}.queued").touch()
+
+            with self.assertLogs("hr.import_jobs"):
+                self.assertEqual(import_jobs.run_pending(), 1)
+            self.assertEqual(list(Path(jobs.name).iterdir()), [])
+
+    def test_export_streams_import_layout_in_one_query(self):
+        self.upload([self.row(i) for i in range(1, 31)])
+        Employee.objects.filter(code="E00030").delete()
+
+        resp = self.client.get("/api/hr/master/employee/export/?fields=code,full_name,branch,company,parent_code")
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.streaming)
+        with CaptureQueriesContext(connections["hr_master"]) as queries:
+            body = b"".join(resp.streaming_content).decode()
+        self.assertEqual(len(queries), 1)
+
+        lines = body.splitlines()
+        self.assertEqual(lines[0], "code,full_name,branch_code,parent_code,company_code")
+        self.assertEqual(len(lines), 30)
+        code, name, branch, parent, companies = next(csv.reader(lines[1:2]))
+        self.assertEqual((code, name, branch, parent), ("E00001", "Employee 1", "B1", ""))
+        self.assertEqual(set(companies.split(",")), {"C1", "C2"})
+
+        resp = self.client.get("/api/hr/master/employee/export/?file_type=ndjson&fields=code&search=E00002")
+        self.assertEqual(b"".join(resp.streaming_content), b'{"code": "E00002"}\n')
+        self.assertEqual(self.client.get("/api/hr/master/employee/export/?file_type=pdf").status_code, 400)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class ResponseCacheTest(TestCase):
+    """BaseViewSet.response_cache: hit tanpa query DB, ETag / 304, invalidasi lewat generation."""
+    databases = {"default", "hr_master", "hr_dump"}
+    url = "/api/hr/master/company/"
+
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(using="hr_master", execute=True):
+            Company.objects.create(name="Alpha", code="A")
+
+    def test_hit_skips_database_and_supports_etag(self):
+        first = self.client.get(self.url, {"page_size": 5})
+        self.assertEqual(first.status_code, 200)
+        etag = first["ETag"]
+
+        with CaptureQueriesContext(connections["hr_master"]) as queries:
+            second = self.client.get(self.url, {"page_size": 5})
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(second["ETag"], etag)
+
+        not_modified = self.client.get(self.url, {"page_size": 5}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified.content, b"")
+
+        # query param beda = key beda
+        with CaptureQueriesContext(connections["hr_master"]) as queries:
+            self.client.get(self.url, {"page_size": 5, "fields": "code"})
+        self.assertGreater(len(queries), 0)
+
+    def test_write_invalidates(self):
+        self.assertEqual(self.client.get(self.url).json()["count"], 1)
+        with self.captureOnCommitCallbacks(using="hr_master", execute=True):
+            Company.objects.create(name="Beta", code="B")
+        resp = self.client.get(self.url)
+        self.assertEqual(resp.json()["count"], 2)
+
+        company = Company.objects.get(code="A")
+        detail = self.client.get(f"{self.url}{company.pk}/")
+        with self.captureOnCommitCallbacks(using="hr_master", execute=True):
+            company.name = "Alpha 2"
+            company.save()
+        fresh = self.client.get(f"{self.url}{company.pk}/", HTTP_IF_NONE_MATCH=detail["ETag"])
+        self.assertEqual(fresh.status_code, 200)
+        self.assertEqual(fresh.json()["name"], "Alpha 2")
+
+    def test_employee_is_not_cached(self):
+        for _ in range(2):
+            self.assertNotIn("ETag", self.client.get("/api/hr/master/employee/"))
+        self.assertFalse([key for key in cache._cache if ":resp:" in key])
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class ExternalDataCacheTest(TestCase):
+    """fetch_external_data: stale-while-revalidate, satu refresher per key."""
+    url = "http://finance.local/api/coa/"
+
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+    def upstream(self, value, delay=0.0, fail=False):
+        def get(*args, **kwargs):
+            self.calls += 1
+            if delay:
+                threading.Event().wait(delay)
+            if fail:
+                raise requests.ConnectionError("down")
+            resp = mock.Mock(status_code=200)
+            resp.json.return_value = {"v": value}
+            return resp
+        return mock.patch.object(http_client, "get", side_effect=get)
+
+    def test_concurrent_cold_miss_calls_upstream_once(self):
+        results = []
+        with self.upstream(1, delay=0.2):
+            workers = [
+                threading.Thread(target=lambda: results.append(fetch_external_data("fin", self.url, "coa")))
+                for _ in range(8)
+            ]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            self.assertEqual(fetch_external_data("fin", self.url, "coa"), {"v": 1})
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results, [{"v": 1}] * 8)
+
+    def test_stale_is_served_while_refreshing(self):
+        cache.set("fin:coa", {"data": {"v": 1}, "fresh_until": 0}, timeout=None)
+        with self.upstream(2, delay=0.3):
+            started = monotonic()
+            self.assertEqual(fetch_external_data("fin", self.url, "coa"), {"v": 1})
+            self.assertEqual(fetch_external_data("fin", self.url, "coa"), {"v": 1})
+            self.assertLess(monotonic() - started, 0.2)
+
+            deadline = monotonic() + 3
+            while cache.get("fin:coa")["data"] != {"v": 2} and monotonic() < deadline:
+                threading.Event().wait(0.02)
+        self.assertEqual(fetch_external_data("fin", self.url, "coa"), {"v": 2})
+        self.assertEqual(self.calls, 1)
+
+    def test_upstream_down_does_not_stampede(self):
+        with self.upstream(None, fail=True):
+            self.assertIsNone(fetch_external_data("fin", self.url, "coa", retries=1))
+            started = monotonic()
+            self.assertIsNone(fetch_external_data("fin", self.url, "coa", retries=1))
+            self.assertLess(monotonic() - started, 0.2)
+        self.assertEqual(self.calls, 1)
@@ -19,6 +19,12 @@ BASE_PARAMS = [
                      description="Return the count of data each page."),
     OpenApiParameter("page_size", OpenApiTypes.STR, OpenApiParameter.QUERY,
                      description="Return the count of data each page."),
+    OpenApiParameter("cursor", OpenApiTypes.STR, OpenApiParameter.QUERY,
+                     description="Keyset pagination. Send it empty (?cursor=) for the first page, then follow the next/previous links.\n\nNo OFFSET and no COUNT(*), so count, total_pages and current_page are null."),
+    OpenApiParameter("ordering", OpenApiTypes.STR, OpenApiParameter.QUERY,
+                     description="Ordering for cursor mode, indexed fields only (default -id)\n\nexample:\n\n?cursor=&ordering=code"),
+    OpenApiParameter("count", OpenApiTypes.STR, OpenApiParameter.QUERY,
+                     description="How to count the total rows: exact (default, cached briefly), estimate (table statistics for unfiltered lists) or none (count and total_pages are null, use next)."),
     OpenApiParameter("search", OpenApiTypes.STR, OpenApiParameter.QUERY,
                      description="Search based on name (WHERE LIKE %<value>%) and Code (WHERE = <value>)"),
     OpenApiParameter("fields", OpenApiTypes.STR, OpenApiParameter.QUERY,
@@ -34,6 +40,7 @@ BASE_PARAMS = [
 class CompanyViewSet(BaseViewSet):
     queryset = Company.objects.all()
     serializer_class = CompanySerializer
+    response_cache = True
     filterset_class = CompanyFilter
 
     @extend_schema(
@@ -54,6 +61,7 @@ class CompanyViewSet(BaseViewSet):
 class UnitViewSet(BaseViewSet):
     queryset = Unit.objects.all()
     serializer_class = UnitSerializer
+    response_cache = True
     filterset_class = UnitFilter
 
     @extend_schema(
@@ -75,6 +83,7 @@ class UnitViewSet(BaseViewSet):
 class LevelViewSet(BaseViewSet):
     queryset = Level.objects.all()
     serializer_class = LevelSerializer
+    response_cache = True
     filterset_class = LevelFilter
 
     @extend_schema(
@@ -96,6 +105,7 @@ class LevelViewSet(BaseViewSet):
 class EmploymentTypeViewSet(BaseViewSet):
     queryset = EmploymentType.objects.all()
     serializer_class = EmploymentTypeSerializer
+    response_cache = True
     filterset_class = EmploymentTypeFilter
 
     @extend_schema(
@@ -117,6 +127,7 @@ class EmploymentTypeViewSet(BaseViewSet):
 class ShiftViewSet(BaseViewSet):
     queryset = Shift.objects.all()
     serializer_class = ShiftSerializer
+    response_cache = True
     filterset_class = ShiftFilter
 
     @extend_schema(
@@ -138,6 +149,7 @@ class ShiftViewSet(BaseViewSet):
 class BranchViewSet(BaseViewSet):
     queryset = Branch.objects.all()
     serializer_class = BranchSerializer
+    response_cache = True
     filterset_class = BranchFilter
 
     @extend_schema(
@@ -160,6 +172,7 @@ class EmployeeViewSet(BaseViewSet):
     queryset = Employee.objects.all()
     serializer_class = EmployeeSerializer
     filterset_class = EmployeeFilter
+    upsert_keys = ("code", "talenta_id", "nik")
 
     @extend_schema(
         description=f"{inspect.getdoc(BaseViewSet)}\n\nAmbil daftar karyawan dengan filter identitas, lokasi, atau status kerja.",
@@ -0,0 +1,107 @@
+"""
+Benchmark p50/p99 verify-session Auth call: requests.post vs pooled
+http_client, terhadap stub Auth lokal (bukan Auth Service beneran).
+
+    cd hr && python scripts/bench_auth_client.py --requests 500
+
+Cache pakai KEY_PREFIX sekali pakai, jadi key auth:session:* hasil benchmark
+tidak kebaca / nimpa cache live (dan expire sendiri setelah 5 menit).
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from time import perf_counter
+from unittest import mock
+
+import os
+import sys
+import json
+import uuid
+import argparse
+import statistics
+import threading
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "hr.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.test import RequestFactory, override_settings  # noqa: E402
+
+from hr import http_client, middleware  # noqa: E402
+
+import requests  # noqa: E402
+
+
+class StubAuthHandler(BaseHTTPRequestHandler):
+    """Stub Auth Service: POST /api/auth/verify-session/ selalu sukses."""
+    protocol_version = "HTTP/1.1"  # keep-alive
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        self.rfile.read(length)
+        body = json.dumps({"user_id": 1, "internal_token": "stub"}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def run_variant(stub_url, total):
+    verify = getattr(middleware.VerifyAuthMiddleware, "process_request", None)
+    factory = RequestFactory()
+    timings = []
+
+    for _ in range(total):
+        # sessionid baru tiap request biar tidak kena cache auth:session:*
+        sessionid = uuid.uuid4().hex
+        start = perf_counter()
+        if verify is not None:
+            request = factory.get("/api/hr/master/unit/", HTTP_COOKIE=f"sessionid={sessionid}")
+            verify(middleware.VerifyAuthMiddleware(lambda r: None), request)
+        else:
+            # DEBUG_ = True: middleware tidak verify, ukur call Auth-nya langsung
+            middleware.http_client.post(
+                f"{stub_url}/api/auth/verify-session/",
+                cookies={"sessionid": sessionid},
+                timeout=10
+            )
+        timings.append(perf_counter() - start)
+
+    return timings
+
+
+def report(label, timings):
+    cuts = statistics.quantiles(timings, n=100)
+    print(f"[bench] {label:<18} n={len(timings)} p50={cuts[49] * 1000:.2f}ms p99={cuts[98] * 1000:.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500, help="Jumlah request per varian")
+    options = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubAuthHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    stub_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    prefix = f"bench-{uuid.uuid4().hex}"
+    caches = {alias: {**config, "KEY_PREFIX": prefix} for alias, config in settings.CACHES.items()}
+    try:
+        with override_settings(CACHES=caches), mock.patch.object(middleware, "AUTH_SERVICE", stub_url):
+            for label, post in (("requests.post", requests.post), ("http_client.post", http_client.post)):
+                with mock.patch.object(middleware.http_client, "post", post):
+                    report(label, run_variant(stub_url, options.requests))
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Benchmark latency list page (GET /api/hr/master/level/?page_size=10) waktu
+tabel membesar: median per ukuran tabel + jumlah query, harus flat.
+
+    cd hr && python scripts/bench_level_list.py --sizes 100,1000,10000 --runs 5
+
+Jalan di test database (dibuat & dihapus sendiri, data live tidak kesentuh),
+cache pakai LocMemCache dan dikosongkan tiap request biar yang diukur jalur DB,
+Auth Service di-stub.
+"""
+from pathlib import Path
+from time import perf_counter
+from unittest import mock
+
+import os
+import sys
+import argparse
+import statistics
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "hr.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.core.cache import cache  # noqa: E402
+from django.db import connections  # noqa: E402
+from django.test import Client, override_settings  # noqa: E402
+from django.test.utils import CaptureQueriesContext, setup_test_environment, setup_databases, teardown_databases  # noqa: E402
+
+from hr_master.models import Level  # noqa: E402
+
+DATABASES = {"default", "hr_master", "hr_dump"}
+URL = "/api/hr/master/level/"
+
+
+def fake_auth_users(*args, **kwargs):
+    """Stub GET /api/users/ Auth Service: balikin user sesuai id__in."""
+    ids = [int(i) for i in kwargs["params"]["id__in"].split(",")]
+    resp = mock.Mock(status_code=200)
+    resp.json.return_value = [{"id": i, "username": f"user{i}"} for i in ids]
+    return resp
+
+
+def seed(total):
+    Level.all_objects.all().hard_delete()
+    Level.objects.bulk_create([
+        Level(name=f"Level {i}", code=f"LV{i:06d}", created_by=i, updated_by=i)
+        for i in range(1, total + 1)
+    ], batch_size=1000)
+
+
+def measure(client, runs):
+    timings, query_counts = [], set()
+    for _ in range(runs):
+        cache.clear()
+        with CaptureQueriesContext(connections["hr_master"]) as queries:
+            start = perf_counter()
+            resp = client.get(URL, {"page_size": 10})
+            timings.append(perf_counter() - start)
+        assert resp.status_code == 200, resp.content
+        query_counts.add(len(queries))
+    return statistics.median(timings), query_counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="100,1000,10000", help="Jumlah row Level, dipisah koma")
+    parser.add_argument("--runs", type=int, default=5, help="Request per ukuran tabel")
+    options = parser.parse_args()
+
+    setup_test_environment()
+    old_config = setup_databases(verbosity=0, interactive=False, aliases=DATABASES)
+    try:
+        locmem = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+        with override_settings(CACHES=locmem), mock.patch("hr.http_client.get", side_effect=fake_auth_users):
+            client = Client()
+            for total in (int(size) for size in options.sizes.split(",")):
+                seed(total)
+                median, query_counts = measure(client, options.runs)
+                queries = ",".join(map(str, sorted(query_counts)))
+                print(f"[bench] level rows={total:>6} queries={queries} median={median * 1000:.2f}ms")
+    finally:
+        teardown_databases(old_config, verbosity=0)
+
+
+if __name__ == "__main__":
+    main()